@@ -1,11 +1,55 @@
 from django.contrib import admin
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.html import format_html
 
 from controle_estoque.core import models
 
 
-class ArmazemInLine(admin.StackedInline):
-    model = models.Armazem
+class RecentesFormSet(BaseInlineFormSet):
+    def get_queryset(self):
+        if not hasattr(self, '_recentes'):
+            self._recentes = super().get_queryset()[:self.limite]
+        return self._recentes
+
+
+class InLineRecentes(admin.TabularInline):
+    limite = 20
     extra = 0
+    max_num = 0
+    can_delete = False
+    show_change_link = True
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, formset=RecentesFormSet, **kwargs)
+        formset.limite = self.limite
+        return formset
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+def link_lista(modelo, filtro, objeto, texto):
+    if objeto._state.adding:
+        return '-'
+    url = reverse(f'admin:core_{modelo}_changelist')
+    return format_html('<a href="{}?{}={}">{}</a>', url, filtro, objeto.pk, texto)
+
+
+class ArmazemInLine(InLineRecentes):
+    model = models.Armazem
+    fields = ['nome', 'municipio', 'cep', 'ativo']
+    ordering = ['nome']
+    verbose_name_plural = 'Armazéns (primeiros 20)'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('empresa', 'municipio')
 
 
 @admin.register(models.Empresa)
@@ -13,66 +57,158 @@ class EmpresaAdmin(admin.ModelAdmin):
     list_display = [
         'nome', 'get_cnpj_formatado', 'criado_em', 'atualizado_em', 'ativo'
     ]
-    list_filter = ['nome']
+    search_fields = ['nome', 'cnpj']
+    ordering = ['nome']
+    readonly_fields = ['get_armazens']
     inlines = [ArmazemInLine]
+    show_full_result_count = False
 
     def get_cnpj_formatado(self, obj):
         return obj.cnpj_formatado
-    
+
     get_cnpj_formatado.short_description = 'CNPJ'
 
+    def get_armazens(self, obj):
+        return link_lista('armazem', 'empresa__uuid__exact', obj, 'Ver todos os armazéns')
+
+    get_armazens.short_description = 'Armazéns'
+
 
 @admin.register(models.TipoPerfil)
 class TipoPerfilAdmin(admin.ModelAdmin):
     list_display = ['nome', 'sigla']
+    search_fields = ['nome', 'sigla']
+    ordering = ['nome']
 
 
 @admin.register(models.Perfil)
 class PerfilAdmin(admin.ModelAdmin):
     list_display = ['usuario', 'empresa', 'tipo']
-    list_filter = ['empresa']
+    list_filter = ['tipo']
+    list_select_related = ['usuario', 'empresa', 'tipo']
+    search_fields = ['usuario__username', 'empresa__nome']
+    autocomplete_fields = ['usuario', 'empresa', 'tipo']
+    show_full_result_count = False
 
 
 @admin.register(models.Municipio)
 class MunicipioAdmin(admin.ModelAdmin):
     list_display = ['nome', 'uf']
+    list_filter = ['uf']
+    search_fields = ['nome']
+    ordering = ['nome']
+    show_full_result_count = False
 
 
 @admin.register(models.UnidadeMedida)
 class UnidadeMedidaAdmin(admin.ModelAdmin):
     list_display = ['nome', 'sigla']
+    search_fields = ['nome', 'sigla']
+    ordering = ['nome']
 
 
 @admin.register(models.Marca)
 class MarcaAdmin(admin.ModelAdmin):
     list_display = ['nome']
+    search_fields = ['nome']
+    ordering = ['nome']
+    show_full_result_count = False
 
 
 @admin.register(models.Produto)
 class ProdutoAdmin(admin.ModelAdmin):
     list_display = ['nome', 'unidade_medida', 'marca']
+    list_select_related = ['unidade_medida', 'marca']
+    search_fields = ['nome', 'marca__nome']
+    ordering = ['nome']
+    autocomplete_fields = ['unidade_medida', 'marca']
+    show_full_result_count = False
 
 
-class EstoqueInLine(admin.TabularInline):
+class EstoqueInLine(InLineRecentes):
     model = models.Estoque
-    extra = 0
+    fields = ['produto', 'quantidade', 'preco', 'ativo']
+    ordering = ['produto__nome']
+    verbose_name_plural = 'Itens de estoque (primeiros 20)'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'armazem', 'armazem__empresa', 'produto'
+        )
 
 
 @admin.register(models.Armazem)
 class ArmazemAdmin(admin.ModelAdmin):
     list_display = ['nome', 'empresa']
+    list_select_related = ['empresa']
+    search_fields = ['nome', 'empresa__nome']
+    ordering = ['nome']
+    autocomplete_fields = ['empresa', 'municipio']
+    readonly_fields = ['get_itens']
     inlines = [EstoqueInLine]
+    show_full_result_count = False
 
+    def get_itens(self, obj):
+        return link_lista('estoque', 'armazem__uuid__exact', obj, 'Ver todos os itens')
 
-class MovimentoInLine(admin.TabularInline):
-    readonly_fields = ['criado_em']
+    get_itens.short_description = 'Itens de estoque'
+
+
+class MovimentoInLine(InLineRecentes):
     model = models.Movimento
-    extra = 0
+    fields = ['criado_em', 'tipo', 'quantidade', 'preco', 'responsavel']
+    readonly_fields = ['criado_em']
     ordering = ['-criado_em']
+    verbose_name_plural = 'Movimentos (20 mais recentes)'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'estoque', 'estoque__produto', 'responsavel', 'responsavel__empresa',
+            'responsavel__usuario', 'responsavel__tipo'
+        )
 
 
 @admin.register(models.Estoque)
 class EstoqueAdmin(admin.ModelAdmin):
     list_display = ['armazem', 'produto', 'quantidade', 'preco']
-    list_filter = ['armazem', 'produto']
+    list_select_related = ['armazem', 'armazem__empresa', 'produto']
+    list_filter = ['ativo']
+    search_fields = ['produto__nome', 'armazem__nome']
+    autocomplete_fields = ['armazem', 'produto']
+    readonly_fields = ['get_movimentos']
     inlines = [MovimentoInLine]
+    show_full_result_count = False
+
+    def get_movimentos(self, obj):
+        return link_lista('movimento', 'estoque__uuid__exact', obj, 'Ver todos os movimentos')
+
+    get_movimentos.short_description = 'Movimentos'
+
+
+@admin.register(models.Movimento)
+class MovimentoAdmin(admin.ModelAdmin):
+    list_display = ['criado_em', 'estoque', 'tipo', 'quantidade', 'preco', 'responsavel']
+    list_select_related = [
+        'estoque', 'estoque__armazem', 'estoque__produto', 'responsavel', 'responsavel__empresa',
+        'responsavel__usuario', 'responsavel__tipo'
+    ]
+    list_filter = ['tipo']
+    raw_id_fields = ['estoque', 'responsavel']
+    ordering = ['-criado_em']
+    show_full_result_count = False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(models.Tarefa)
+class TarefaAdmin(admin.ModelAdmin):
+    list_display = ['nome', 'chave', 'situacao', 'tentativas', 'executar_em', 'atualizado_em']
+    list_filter = ['situacao', 'nome']
+    search_fields = ['chave']
+    readonly_fields = ['erro']
+    ordering = ['executar_em']
+    show_full_result_count = False
@@ -1,39 +1,55 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Max, Q
 from django.db.models.deletion import ProtectedError
 from django.db.utils import IntegrityError
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from ninja.errors import AuthenticationError, HttpError
-from ninja_extra import NinjaExtraAPI
-from ninja_jwt.authentication import JWTAuth
 from ninja_jwt.controller import NinjaJWTDefaultController
 
-from controle_estoque.core import models, schemas
-from controle_estoque.core.utils import valida_permissao_empresa
-
-api = NinjaExtraAPI()
+from controle_estoque.core import (
+    campos, classificacao, cobertura, disponibilidade, exportacao, importacao, metricas, models,
+    referencias, reservas, schemas
+)
+from controle_estoque.core.desempenho import (
+    JSONRendererCronometrado, JWTAuthCronometrada, NinjaExtraAPICacheada
+)
+from controle_estoque.core.utils import (
+    empresas_permitidas, resposta_condicional, valida_permissao_empresa
+)
+
+api = NinjaExtraAPICacheada(renderer=JSONRendererCronometrado())
 api.register_controllers(NinjaJWTDefaultController)
 
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MARGEM_SINCRONIZACAO = timedelta(seconds=5)
+
 
-@api.get('/unidades_de_medida', auth=JWTAuth(), response=schemas.ListaSchema)
+@api.get('/unidades_de_medida', auth=JWTAuthCronometrada(), response=schemas.ListaSchema)
 def unidade_medida_lista(request):
-    unidades = models.UnidadeMedida.objects.order_by('nome')
+    unidades = referencias.lista('unidades_de_medida')
     
-    lista_unidades = [schemas.UnidadeMedidaSchema(**u) for u in unidades.values()] 
-    response = schemas.ListaSchema(quantidade=unidades.count(), lista=lista_unidades)
+    lista_unidades = [schemas.UnidadeMedidaSchema(**u) for u in unidades] 
+    response = schemas.ListaSchema(quantidade=len(unidades), lista=lista_unidades)
     return response
 
 
-@api.get('/marcas', auth=JWTAuth(), response=schemas.ListaSchema)
+@api.get('/marcas', auth=JWTAuthCronometrada(), response=schemas.ListaSchema)
 def marca_lista(request):
-    marcas = models.Marca.objects.order_by('nome')
+    marcas = referencias.lista('marcas')
     
-    lista_marcas = [schemas.MarcaSchema(**m) for m in marcas.values()] 
-    response = schemas.ListaSchema(quantidade=marcas.count(), lista=lista_marcas)
+    lista_marcas = [schemas.MarcaSchema(**m) for m in marcas] 
+    response = schemas.ListaSchema(quantidade=len(marcas), lista=lista_marcas)
     return response
 
 
-@api.post('/marca/nova', auth=JWTAuth(), response=schemas.MarcaSchema)
+@api.post('/marca/nova', auth=JWTAuthCronometrada(), response=schemas.MarcaSchema)
 def marca_nova(request, payload: schemas.MarcaNovaSchema):
     marca = models.Marca(**payload.dict())
     try:
@@ -43,8 +59,17 @@ def marca_nova(request, payload: schemas.MarcaNovaSchema):
     return marca
 
 
-@api.get('/marca/{marca_id}', auth=JWTAuth(), response=schemas.MarcaSchema)
-def marca(request, marca_id: str):
+@api.get('/marca/{marca_id}', auth=JWTAuthCronometrada(), response=schemas.MarcaSchema)
+def marca(request, marca_id: str, response: HttpResponse):
+    versao = get_object_or_404(
+        models.Marca.objects.values('uuid', 'atualizado_em'), uuid=marca_id
+    )
+    nao_modificado = resposta_condicional(
+        request, response, versao['uuid'], versao['atualizado_em']
+    )
+    if nao_modificado is not None:
+        return nao_modificado
+
     marca = get_object_or_404(models.Marca, uuid=marca_id)
     
     response = schemas.MarcaSchema(
@@ -54,7 +79,7 @@ def marca(request, marca_id: str):
     return response
 
 
-@api.patch('/marca/{marca_id}', auth=JWTAuth(), response=schemas.MarcaSchema)
+@api.patch('/marca/{marca_id}', auth=JWTAuthCronometrada(), response=schemas.MarcaSchema)
 def marca_edita(request, marca_id: str, payload: schemas.MarcaNovaSchema):
     marca = get_object_or_404(models.Marca, uuid=marca_id)
     
@@ -72,7 +97,7 @@ def marca_edita(request, marca_id: str, payload: schemas.MarcaNovaSchema):
     return response
 
 
-@api.delete('/marca/{marca_id}', auth=JWTAuth())
+@api.delete('/marca/{marca_id}', auth=JWTAuthCronometrada())
 def marca_exclui(request, marca_id: str):
     marca = get_object_or_404(models.Marca, uuid=marca_id)
     
@@ -84,15 +109,15 @@ def marca_exclui(request, marca_id: str):
     return {'successo': f'A marca {marca.nome} - {uuid_str} foi excluída.'}
 
 
-@api.get('/municipios', auth=JWTAuth(), response=schemas.ListaSchema)
+@api.get('/municipios', auth=JWTAuthCronometrada(), response=schemas.ListaSchema)
 def municipios_lista(request):
-    municipios = models.Municipio.objects.order_by('uf', 'nome')
-    lista_municipios = [schemas.MunicipioSchema(**m) for m in municipios.values()] 
-    response = schemas.ListaSchema(quantidade=municipios.count(), lista=lista_municipios)
+    municipios = referencias.lista('municipios')
+    lista_municipios = [schemas.MunicipioSchema(**m) for m in municipios] 
+    response = schemas.ListaSchema(quantidade=len(municipios), lista=lista_municipios)
     return response
 
 
-@api.post('/armazem/novo', auth=JWTAuth(), response=schemas.ArmazemSchema)
+@api.post('/armazem/novo', auth=JWTAuthCronometrada(), response=schemas.ArmazemSchema)
 def armazem_novo(request, payload: schemas.ArmazemNovoSchema):
     perfil = request.user.perfil_set.all().first()
     if perfil is None:
@@ -116,10 +141,34 @@ def armazem_novo(request, payload: schemas.ArmazemNovoSchema):
     return response
 
 
-@api.get('/armazem/{armazem_id}', auth=JWTAuth(), response=schemas.ArmazemSchema)
-def armazem(request, armazem_id: str):
-    armazem = get_object_or_404(models.Armazem, uuid=armazem_id)
-    valida_permissao_empresa(request.user, armazem.empresa)
+@api.get('/armazem/{armazem_id}', auth=JWTAuthCronometrada(), response=schemas.ArmazemSchema)
+def armazem(request, armazem_id: str, response: HttpResponse, fields: str | None = None):
+    versao = get_object_or_404(
+        models.Armazem.objects.values(
+            'uuid', 'empresa_id', 'atualizado_em',
+            'empresa__atualizado_em', 'municipio__atualizado_em'
+        ),
+        uuid=armazem_id
+    )
+    valida_permissao_empresa(request.user, versao['empresa_id'])
+    nao_modificado = resposta_condicional(
+        request, response, f"{versao['uuid']}:{fields or ''}", versao['atualizado_em'],
+        versao['empresa__atualizado_em'], versao['municipio__atualizado_em']
+    )
+    if nao_modificado is not None:
+        return nao_modificado
+
+    if fields is not None:
+        nomes = campos.seleciona(campos.CAMPOS_ARMAZEM, fields)
+        linha = models.Armazem.objects.filter(uuid=armazem_id).values(
+            *campos.colunas(campos.CAMPOS_ARMAZEM, nomes)
+        ).first()
+        dados = campos.serializa(campos.CAMPOS_ARMAZEM, nomes, linha)
+        return api.create_response(request, dados, temporal_response=response)
+
+    armazem = get_object_or_404(
+        models.Armazem.objects.select_related('empresa', 'municipio'), uuid=armazem_id
+    )
     response = schemas.ArmazemSchema(
         uuid=armazem.uuid,
         nome=armazem.nome,
@@ -134,7 +183,7 @@ def armazem(request, armazem_id: str):
     return response
 
 
-@api.patch('/armazem/{armazem_id}', auth=JWTAuth(), response=schemas.ArmazemSchema)
+@api.patch('/armazem/{armazem_id}', auth=JWTAuthCronometrada(), response=schemas.ArmazemSchema)
 def armazem_edita(request, armazem_id: str, payload: schemas.ArmazemEditaSchema):
     armazem = get_object_or_404(models.Armazem, uuid=armazem_id)
     valida_permissao_empresa(request.user, armazem.empresa)
@@ -154,7 +203,7 @@ def armazem_edita(request, armazem_id: str, payload: schemas.ArmazemEditaSchema)
     return response
 
 
-@api.delete('/armazem/{armazem_id}', auth=JWTAuth())
+@api.delete('/armazem/{armazem_id}', auth=JWTAuthCronometrada())
 def armazem_exclui(request, armazem_id: str):
     armazem = get_object_or_404(models.Armazem, uuid=armazem_id)
     valida_permissao_empresa(request.user, armazem.empresa)
@@ -166,8 +215,8 @@ def armazem_exclui(request, armazem_id: str):
     return {'successo': f'O armazém {armazem.nome} - {uuid_str} foi excluído.'}
 
 
-@api.get('/armazens', auth=JWTAuth(), response=schemas.ListaSchema)
-def armazem_lista(request, empresa_id: str | None = None):
+@api.get('/armazens', auth=JWTAuthCronometrada(), response=schemas.ListaSchema)
+def armazem_lista(request, empresa_id: str | None = None, fields: str | None = None):
     armazens = models.Armazem.objects.select_related(
         'empresa', 'municipio'
     ).order_by('nome')
@@ -177,8 +226,12 @@ def armazem_lista(request, empresa_id: str | None = None):
         valida_permissao_empresa(request.user, empresa)
         armazens = armazens.filter(empresa=empresa)
 
-    elif not request.user.is_superuser:
-        armazens = armazens.filter(empresa__perfil__usuario=request.user).distinct()
+    else:
+        armazens = armazens.para_usuario(request.user)
+
+    if fields is not None:
+        lista_armazens = campos.lista(armazens, campos.CAMPOS_ARMAZEM, fields)
+        return schemas.ListaSchema(quantidade=len(lista_armazens), lista=lista_armazens)
     
     lista_armazens = [
         schemas.ArmazemSchema(
@@ -197,7 +250,40 @@ def armazem_lista(request, empresa_id: str | None = None):
     return response
 
 
-@api.post('/produto/novo', auth=JWTAuth(), response=schemas.ProdutoSchema)
+@api.post('/armazens/lote', auth=JWTAuthCronometrada(), response=schemas.ListaLoteSchema)
+def armazem_lote(request, payload: schemas.LoteSchema):
+    armazens = models.Armazem.objects.select_related(
+        'empresa', 'municipio'
+    ).in_bulk(payload.ids)
+    permitidas = empresas_permitidas(
+        request.user, {a.empresa_id for a in armazens.values()}
+    )
+
+    lista_armazens = [
+        schemas.ArmazemSchema(
+            uuid=a.uuid,
+            empresa=a.empresa.nome,
+            nome=a.nome,
+            logradouro=a.logradouro,
+            numero=a.numero,
+            complemento=a.complemento,
+            cep=a.cep,
+            municipio=f'{a.municipio.nome}/{a.municipio.uf}' if a.municipio is not None else '',
+            municipio_id=a.municipio_id
+        )
+        for a in (armazens.get(i) for i in dict.fromkeys(payload.ids))
+        if a is not None and a.empresa_id in permitidas
+    ]
+    encontrados = {a.uuid for a in lista_armazens}
+    response = schemas.ListaLoteSchema(
+        quantidade=len(lista_armazens),
+        lista=lista_armazens,
+        nao_encontrados=[i for i in dict.fromkeys(payload.ids) if i not in encontrados]
+    )
+    return response
+
+
+@api.post('/produto/novo', auth=JWTAuthCronometrada(), response=schemas.ProdutoSchema)
 def produto_novo(request, payload: schemas.ProdutoNovoSchema):
     produto = models.Produto(**payload.dict())
     try:
@@ -216,9 +302,33 @@ def produto_novo(request, payload: schemas.ProdutoNovoSchema):
     return response
 
 
-@api.get('/produto/{produto_id}', auth=JWTAuth(), response=schemas.ProdutoSchema)
-def produto(request, produto_id: str):
-    produto = get_object_or_404(models.Produto, uuid=produto_id)
+@api.get('/produto/{produto_id}', auth=JWTAuthCronometrada(), response=schemas.ProdutoSchema)
+def produto(request, produto_id: str, response: HttpResponse, fields: str | None = None):
+    versao = get_object_or_404(
+        models.Produto.objects.values(
+            'uuid', 'atualizado_em',
+            'unidade_medida__atualizado_em', 'marca__atualizado_em'
+        ),
+        uuid=produto_id
+    )
+    nao_modificado = resposta_condicional(
+        request, response, f"{versao['uuid']}:{fields or ''}", versao['atualizado_em'],
+        versao['unidade_medida__atualizado_em'], versao['marca__atualizado_em']
+    )
+    if nao_modificado is not None:
+        return nao_modificado
+
+    if fields is not None:
+        nomes = campos.seleciona(campos.CAMPOS_PRODUTO, fields)
+        linha = models.Produto.objects.filter(uuid=produto_id).values(
+            *campos.colunas(campos.CAMPOS_PRODUTO, nomes)
+        ).first()
+        dados = campos.serializa(campos.CAMPOS_PRODUTO, nomes, linha)
+        return api.create_response(request, dados, temporal_response=response)
+
+    produto = get_object_or_404(
+        models.Produto.objects.select_related('unidade_medida', 'marca'), uuid=produto_id
+    )
     response = schemas.ProdutoSchema(
         uuid=produto.uuid,
         nome=produto.nome,
@@ -230,7 +340,7 @@ def produto(request, produto_id: str):
     return response
 
 
-@api.patch('/produto/{produto_id}', auth=JWTAuth(), response=schemas.ProdutoSchema)
+@api.patch('/produto/{produto_id}', auth=JWTAuthCronometrada(), response=schemas.ProdutoSchema)
 def produto_edita(request, produto_id: str, payload: schemas.ProdutoEditaSchema):
     produto = get_object_or_404(models.Produto, uuid=produto_id)
     for attr, value in payload.dict(exclude_unset=True).items():
@@ -251,7 +361,7 @@ def produto_edita(request, produto_id: str, payload: schemas.ProdutoEditaSchema)
     return response
 
 
-@api.delete('/produto/{produto_id}', auth=JWTAuth())
+@api.delete('/produto/{produto_id}', auth=JWTAuthCronometrada())
 def produto_exclui(request, produto_id: str):
     produto = get_object_or_404(models.Produto, uuid=produto_id)
     uuid_str = produto.uuid
@@ -262,11 +372,15 @@ def produto_exclui(request, produto_id: str):
     return {'successo': f'O produto {produto.nome} - {uuid_str} foi excluído.'}
 
 
-@api.get('/produtos', auth=JWTAuth(), response=schemas.ListaSchema)
-def produto_lista(request):
+@api.get('/produtos', auth=JWTAuthCronometrada(), response=schemas.ListaSchema)
+def produto_lista(request, fields: str | None = None):
     produtos = models.Produto.objects.select_related(
         'unidade_medida'
     ).order_by('nome')
+
+    if fields is not None:
+        lista_produtos = campos.lista(produtos, campos.CAMPOS_PRODUTO, fields)
+        return schemas.ListaSchema(quantidade=len(lista_produtos), lista=lista_produtos)
     
     lista_produtos = [
         schemas.ProdutoSchema(
@@ -283,13 +397,67 @@ def produto_lista(request):
     return response
     
 
-@api.post('/estoque/novo', auth=JWTAuth(), response=schemas.EstoqueSchema)
+@api.get('/produtos/disponibilidade', auth=JWTAuthCronometrada(), response=schemas.ListaSchema)
+def produto_disponibilidade(request, produto_id: str, empresa_id: str | None = None):
+    produtos = disponibilidade.interpreta_produtos(produto_id)
+    estoques = models.Estoque.objects.all()
+    if empresa_id is not None:
+        empresa = get_object_or_404(models.Empresa, uuid=empresa_id)
+        valida_permissao_empresa(request.user, empresa)
+        estoques = estoques.filter(armazem__empresa=empresa)
+    else:
+        estoques = estoques.para_usuario(request.user)
+
+    lista_produtos = [
+        schemas.DisponibilidadeSchema(**d)
+        for d in disponibilidade.disponibilidade(estoques, produtos)
+    ]
+    response = schemas.ListaSchema(quantidade=len(lista_produtos), lista=lista_produtos)
+    return response
+
+
+@api.post('/produtos/lote', auth=JWTAuthCronometrada(), response=schemas.ListaLoteSchema)
+def produto_lote(request, payload: schemas.LoteSchema):
+    produtos = models.Produto.objects.select_related(
+        'unidade_medida', 'marca'
+    ).in_bulk(payload.ids)
+
+    lista_produtos = [
+        schemas.ProdutoSchema(
+            uuid=p.uuid,
+            nome=p.nome,
+            unidade_medida_sigla=p.unidade_medida.sigla,
+            unidade_medida_id=p.unidade_medida.id,
+            marca=p.marca.nome if p.marca is not None else '',
+            marca_id=p.marca.uuid if p.marca is not None else None
+        )
+        for p in (produtos.get(i) for i in dict.fromkeys(payload.ids))
+        if p is not None
+    ]
+    response = schemas.ListaLoteSchema(
+        quantidade=len(lista_produtos),
+        lista=lista_produtos,
+        nao_encontrados=[i for i in dict.fromkeys(payload.ids) if i not in produtos]
+    )
+    return response
+
+
+@api.post('/produtos/importar', auth=JWTAuthCronometrada(), response=schemas.ImportacaoSchema)
+def produto_importa(request, payload: list[schemas.ProdutoImportacaoSchema]):
+    resultado = importacao.importa_produtos(p.dict() for p in payload)
+    return schemas.ImportacaoSchema(**resultado)
+
+
+@api.post('/estoque/novo', auth=JWTAuthCronometrada(), response=schemas.EstoqueSchema)
 def estoque_novo(request, payload: schemas.EstoqueNovoSchema):
     armazem = models.Armazem.objects.filter(uuid=payload.armazem_id).first()
     valida_permissao_empresa(request.user, armazem.empresa)
 
     estoque = models.Estoque(**payload.dict())
-    estoque.save()
+    try:
+        estoque.save()
+    except IntegrityError:
+        raise HttpError(400, 'Já existe um item de estoque deste produto neste armazém.')
     response = schemas.EstoqueSchema(
         uuid=estoque.uuid,
         armazem_uuid=estoque.armazem.uuid,
@@ -299,15 +467,57 @@ def estoque_novo(request, payload: schemas.EstoqueNovoSchema):
         produto_unidade_medida=estoque.produto.unidade_medida.sigla,
         produto_marca=estoque.produto.marca.nome if estoque.produto.marca is not None else '',
         quantidade=estoque.quantidade,
-        preco=estoque.preco
+        preco=estoque.preco,
+        classe=estoque.classe
     )
     return response
 
 
-@api.get('/estoque/{estoque_id}', auth=JWTAuth(), response=schemas.EstoqueSchema)
-def estoque(request, estoque_id: str):
-    estoque = get_object_or_404(models.Estoque, uuid=estoque_id)
-    valida_permissao_empresa(request.user, estoque.armazem.empresa)
+@api.get('/estoque/{estoque_id}', auth=JWTAuthCronometrada(), response=schemas.EstoqueSchema)
+def estoque(request, estoque_id: str, response: HttpResponse, fields: str | None = None):
+    versao = get_object_or_404(
+        models.Estoque.objects.filter(uuid=estoque_id).values(
+            'uuid', 'armazem__empresa_id', 'atualizado_em',
+            'armazem__atualizado_em', 'produto__atualizado_em',
+            'produto__unidade_medida__atualizado_em', 'produto__marca__atualizado_em'
+        ).annotate(ultimo_movimento=Max('movimentos__atualizado_em'))
+    )
+    valida_permissao_empresa(request.user, versao['armazem__empresa_id'])
+    nao_modificado = resposta_condicional(
+        request, response, f"{versao['uuid']}:{fields or ''}", versao['atualizado_em'],
+        versao['armazem__atualizado_em'], versao['produto__atualizado_em'],
+        versao['produto__unidade_medida__atualizado_em'],
+        versao['produto__marca__atualizado_em'], versao['ultimo_movimento']
+    )
+    if nao_modificado is not None:
+        return nao_modificado
+
+    if fields is not None:
+        nomes = campos.seleciona(campos.CAMPOS_ESTOQUE, fields, extras=['movimentos'])
+        dados = {}
+        colunas = campos.colunas(campos.CAMPOS_ESTOQUE, nomes)
+        if colunas:
+            linha = models.Estoque.objects.filter(uuid=estoque_id).values(*colunas).first()
+            dados = campos.serializa(campos.CAMPOS_ESTOQUE, nomes, linha)
+        if 'movimentos' in nomes:
+            dados['movimentos'] = [
+                {
+                    'tipo': m['tipo'],
+                    'quantidade': m['quantidade'],
+                    'preco': m['preco'],
+                    'data': m['criado_em']
+                } for m in models.Movimento.objects.filter(estoque_id=versao['uuid']).order_by(
+                    '-criado_em'
+                ).values('tipo', 'quantidade', 'preco', 'criado_em')
+            ]
+        return api.create_response(request, dados, temporal_response=response)
+
+    estoque = get_object_or_404(
+        models.Estoque.objects.select_related(
+            'armazem', 'produto', 'produto__unidade_medida', 'produto__marca'
+        ),
+        uuid=estoque_id
+    )
     movimentos = [
         {
             'tipo': m.tipo,
@@ -326,12 +536,13 @@ def estoque(request, estoque_id: str):
         produto_marca=estoque.produto.marca.nome if estoque.produto.marca is not None else '',
         quantidade=estoque.quantidade,
         preco=estoque.preco,
+        classe=estoque.classe,
         movimentos=movimentos
     )
     return response
 
 
-@api.patch('/estoque/{estoque_id}', auth=JWTAuth(), response=schemas.EstoqueSchema)
+@api.patch('/estoque/{estoque_id}', auth=JWTAuthCronometrada(), response=schemas.EstoqueSchema)
 def estoque_edita(request, estoque_id: str, payload: schemas.EstoqueEditaSchema):
     estoque = get_object_or_404(models.Estoque, uuid=estoque_id)
     valida_permissao_empresa(request.user, estoque.armazem.empresa)
@@ -347,12 +558,13 @@ def estoque_edita(request, estoque_id: str, payload: schemas.EstoqueEditaSchema)
         produto_unidade_medida=estoque.produto.unidade_medida.sigla,
         produto_marca=estoque.produto.marca.nome if estoque.produto.marca is not None else '',
         quantidade=estoque.quantidade,
-        preco=estoque.preco
+        preco=estoque.preco,
+        classe=estoque.classe
     )
     return response
 
 
-@api.delete('/estoque/{estoque_id}', auth=JWTAuth())
+@api.delete('/estoque/{estoque_id}', auth=JWTAuthCronometrada())
 def estoque_exclui(request, estoque_id: str):
     estoque = get_object_or_404(models.Estoque, uuid=estoque_id)
     valida_permissao_empresa(request.user, estoque.armazem.empresa)
@@ -364,23 +576,19 @@ def estoque_exclui(request, estoque_id: str):
     return {'successo': f'O item de estoque {estoque.produto.nome} - {uuid_str} foi excluído.'}
 
 
-@api.get('/itens_estoque', auth=JWTAuth(), response=schemas.ListaSchema)
+@api.get('/itens_estoque', auth=JWTAuthCronometrada(), response=schemas.ListaSchema)
 def estoque_lista(
-    request, empresa_id: str | None = None, armazem_id: str | None = None, produto_id: str | None = None
+    request, empresa_id: str | None = None, armazem_id: str | None = None, produto_id: str | None = None,
+    classe: str | None = None, fields: str | None = None
 ):
-    estoques = models.Estoque.objects.select_related(
-        'armazem', 'armazem__empresa', 'produto', 
-        'produto__unidade_medida', 'produto__marca'
-    ).order_by('produto__nome')
+    estoques = models.EstoqueResumo.objects.order_by('produto_nome')
     if empresa_id is not None:
         empresa = models.Empresa.objects.filter(uuid=empresa_id).first()
         valida_permissao_empresa(request.user, empresa)
-        estoques = estoques.filter(armazem__empresa=empresa)
+        estoques = estoques.filter(empresa=empresa)
 
-    elif not request.user.is_superuser:
-        estoques = estoques.filter(
-            armazem__empresa__perfil__usuario=request.user
-        ).distinct()
+    else:
+        estoques = estoques.para_usuario(request.user)
 
     if armazem_id is not None:
         armazem = models.Armazem.objects.filter(
@@ -394,6 +602,83 @@ def estoque_lista(
         ).first()
         estoques = estoques.filter(produto=produto)
 
+    if classe is not None:
+        if classe not in dict(models.Estoque.CLASSES):
+            raise HttpError(400, 'Classe inválida, use A, B ou C.')
+        estoques = estoques.filter(classe=classe)
+
+    if fields is not None:
+        lista_estoques = campos.lista(estoques, campos.CAMPOS_RESUMO_ESTOQUE, fields)
+        return schemas.ListaSchema(quantidade=len(lista_estoques), lista=lista_estoques)
+
+    lista_estoques = [
+        schemas.EstoqueSchema(
+            uuid=e['estoque_id'],
+            armazem_uuid=e['armazem_id'],
+            armazem_nome=e['armazem_nome'],
+            produto_uuid=e['produto_id'],
+            produto_nome=e['produto_nome'],
+            produto_unidade_medida=e['produto_unidade_medida'],
+            produto_marca=e['produto_marca'],
+            quantidade=e['quantidade'],
+            preco=e['preco'],
+            classe=e['classe']
+        )
+        for e in estoques.values(
+            'estoque_id', 'armazem_id', 'armazem_nome', 'produto_id', 'produto_nome',
+            'produto_unidade_medida', 'produto_marca', 'quantidade', 'preco', 'classe'
+        )
+    ]
+    
+    response = schemas.ListaSchema(quantidade=len(lista_estoques), lista=lista_estoques)
+    return response
+
+
+@api.get('/itens_estoque/cobertura', auth=JWTAuthCronometrada(), response=schemas.ListaSchema)
+def estoque_cobertura(request, empresa_id: str | None = None, dias: int = 90):
+    if not 1 <= dias <= cobertura.DIAS_MAXIMO:
+        raise HttpError(400, f'O período deve ter entre 1 e {cobertura.DIAS_MAXIMO} dias.')
+
+    if empresa_id is not None:
+        empresa = get_object_or_404(models.Empresa, uuid=empresa_id)
+        valida_permissao_empresa(request.user, empresa)
+        empresas = [empresa.uuid]
+    else:
+        empresas = models.Empresa.objects.para_usuario(request.user).values_list('uuid', flat=True)
+
+    itens = cobertura.ordena(
+        item for e in empresas for item in cobertura.cobertura_empresa(e, dias)
+    )
+    lista_itens = [schemas.CoberturaSchema(**i) for i in itens]
+    response = schemas.ListaSchema(quantidade=len(lista_itens), lista=lista_itens)
+    return response
+
+
+@api.post('/itens_estoque/abc', auth=JWTAuthCronometrada(), response=schemas.ClassificacaoSchema)
+def estoque_classifica(request, payload: schemas.ClassificacaoNovaSchema):
+    empresa = get_object_or_404(models.Empresa, uuid=payload.empresa_id)
+    valida_permissao_empresa(request.user, empresa)
+
+    itens, alterados = classificacao.classifica(empresa.uuid, payload.dias)
+    lista_itens = [
+        schemas.ItemClassificacaoSchema(**i)
+        for i in sorted(itens, key=lambda i: -i['valor_consumo'])
+    ]
+    response = schemas.ClassificacaoSchema(
+        quantidade=len(lista_itens), lista=lista_itens, alterados=alterados
+    )
+    return response
+
+
+@api.post('/itens_estoque/lote', auth=JWTAuthCronometrada(), response=schemas.ListaLoteSchema)
+def estoque_lote(request, payload: schemas.LoteSchema):
+    estoques = models.Estoque.objects.select_related(
+        'armazem', 'produto', 'produto__unidade_medida', 'produto__marca'
+    ).in_bulk(payload.ids)
+    permitidas = empresas_permitidas(
+        request.user, {e.armazem.empresa_id for e in estoques.values()}
+    )
+
     lista_estoques = [
         schemas.EstoqueSchema(
             uuid=e.uuid,
@@ -404,48 +689,53 @@ def estoque_lista(
             produto_unidade_medida=e.produto.unidade_medida.sigla,
             produto_marca=e.produto.marca.nome if e.produto.marca is not None else '',
             quantidade=e.quantidade,
-            preco=e.preco
-        ) 
-        for e in estoques
-    ] 
-    
-    response = schemas.ListaSchema(quantidade=estoques.count(), lista=lista_estoques)
+            preco=e.preco,
+            classe=e.classe
+        )
+        for e in (estoques.get(i) for i in dict.fromkeys(payload.ids))
+        if e is not None and e.armazem.empresa_id in permitidas
+    ]
+    encontrados = {e.uuid for e in lista_estoques}
+    response = schemas.ListaLoteSchema(
+        quantidade=len(lista_estoques),
+        lista=lista_estoques,
+        nao_encontrados=[i for i in dict.fromkeys(payload.ids) if i not in encontrados]
+    )
     return response
 
 
-@api.get('/empresas', auth=JWTAuth(), response=schemas.ListaSchema)
+@api.get('/empresas', auth=JWTAuthCronometrada(), response=schemas.ListaSchema)
 def empresa_lista(request):
-    empresas = models.Empresa.objects.order_by('nome')
-    
-    if not request.user.is_superuser:
-        empresas = empresas.filter(perfil__usuario=request.user).distinct()
+    empresas = models.Empresa.objects.para_usuario(request.user).order_by('nome')
     
     lista_empresas = [schemas.EmpresaSchema(**e) for e in empresas.values()]
     response = schemas.ListaSchema(quantidade=empresas.count(), lista=lista_empresas)
     return response
 
 
-@api.get('/perfis', auth=JWTAuth(), response=schemas.ListaSchema)
+@api.get('/perfis', auth=JWTAuthCronometrada(), response=schemas.ListaSchema)
 def perfil_lista(request, empresa_id: str | None = None):
     perfis = models.Perfil.objects.select_related(
-        'tipo'
+        'tipo', 'usuario', 'empresa'
     ).order_by('empresa__nome', 'usuario__username')
     if empresa_id is not None:
         empresa = models.Empresa.objects.filter(uuid=empresa_id).first()
         valida_permissao_empresa(request.user, empresa)
         perfis = perfis.filter(empresa=empresa)
 
-    elif not request.user.is_superuser:
-        perfis = perfis.filter(empresa__perfil__usuario=request.user).distinct()
+    else:
+        perfis = perfis.para_usuario(request.user)
     
     lista_perfis = [
         schemas.PerfilSchema(
+            id=p.usuario.id,
             usuario=p.usuario.username,
             nome=p.usuario.first_name,
             empresa_uuid=p.empresa.uuid,
             empresa_nome=p.empresa.nome,            
             empresa_cnpj=p.empresa.cnpj,                        
-            tipo=p.tipo.nome
+            tipo=p.tipo.nome,
+            logado=p.usuario_id == request.user.id
         ) 
         for p in perfis
     ]
@@ -453,14 +743,12 @@ def perfil_lista(request, empresa_id: str | None = None):
     return response
 
 
-@api.post('{estoque_id}/movimento/novo', auth=JWTAuth(), response=schemas.EstoqueSchema)
+@api.post('{estoque_id}/movimento/novo', auth=JWTAuthCronometrada(), response=schemas.EstoqueSchema)
 def movimento_novo(request, estoque_id, payload: schemas.MovimentoNovoSchema):
     estoque = get_object_or_404(models.Estoque, pk=estoque_id)
     valida_permissao_empresa(request.user, estoque.armazem.empresa)
 
     movimento = models.Movimento(**payload.dict())
-    if movimento.tipo == models.Movimento.SAIDA and movimento.quantidade > estoque.quantidade:
-        raise HttpError(400, 'A quantidade da saída é superior ao estocado.')
     if movimento.quantidade == 0:
         raise HttpError(400, 'A quantidade movimentada deve ser maior que zero.')
     movimento.estoque = estoque
@@ -469,7 +757,17 @@ def movimento_novo(request, estoque_id, payload: schemas.MovimentoNovoSchema):
     ).first()
     movimento.criado_em = datetime.now()
 
-    movimento.save()
+    if movimento.tipo == models.Movimento.SAIDA:
+        reservas.expira(estoque.pk)
+    with transaction.atomic():
+        if movimento.tipo == models.Movimento.SAIDA:
+            bloqueado = models.Estoque.objects.select_for_update().only(
+                'quantidade', 'reservado'
+            ).get(pk=estoque.pk)
+            if movimento.quantidade > bloqueado.disponivel:
+                metricas.saidas_rejeitadas.inc()
+                raise HttpError(400, 'A quantidade da saída é superior ao estocado.')
+        movimento.save()
     response = schemas.EstoqueSchema(
         uuid=estoque.uuid,
         armazem_uuid=movimento.estoque.armazem.uuid,
@@ -479,12 +777,64 @@ def movimento_novo(request, estoque_id, payload: schemas.MovimentoNovoSchema):
         produto_unidade_medida=estoque.produto.unidade_medida.sigla,
         produto_marca=estoque.produto.marca.nome if estoque.produto.marca is not None else '',
         quantidade=movimento.estoque.quantidade,
-        preco=movimento.estoque.preco
+        preco=movimento.estoque.preco,
+        classe=movimento.estoque.classe
+    )
+    return response
+
+
+def resposta_reserva(reserva):
+    disponivel = models.Estoque.objects.filter(pk=reserva.estoque_id).values_list(
+        'quantidade', 'reservado'
+    ).first()
+    response = schemas.ReservaSchema(
+        uuid=reserva.uuid,
+        estoque_uuid=reserva.estoque_id,
+        quantidade=reserva.quantidade,
+        situacao=reserva.situacao,
+        expira_em=reserva.expira_em,
+        movimento_uuid=reserva.movimento_id,
+        disponivel=disponivel[0] - disponivel[1]
     )
     return response
 
 
-@api.get('/usuario', auth=JWTAuth(), response=schemas.PerfilSchema)
+def reserva_permitida(request, reserva_id):
+    reserva = get_object_or_404(
+        models.Reserva.objects.select_related('estoque__armazem'), uuid=reserva_id
+    )
+    valida_permissao_empresa(request.user, reserva.estoque.armazem.empresa_id)
+    return reserva
+
+
+@api.post('{estoque_id}/reserva/nova', auth=JWTAuthCronometrada(), response=schemas.ReservaSchema)
+def reserva_nova(request, estoque_id, payload: schemas.ReservaNovaSchema):
+    estoque = get_object_or_404(models.Estoque.objects.select_related('armazem'), pk=estoque_id)
+    valida_permissao_empresa(request.user, estoque.armazem.empresa_id)
+    responsavel = request.user.perfil_set.filter(empresa=estoque.armazem.empresa_id).first()
+
+    reserva = reservas.cria_reserva(estoque, payload.quantidade, payload.minutos, responsavel)
+    return resposta_reserva(reserva)
+
+
+@api.get('/reserva/{reserva_id}', auth=JWTAuthCronometrada(), response=schemas.ReservaSchema)
+def reserva(request, reserva_id: str):
+    return resposta_reserva(reserva_permitida(request, reserva_id))
+
+
+@api.post('/reserva/{reserva_id}/confirmar', auth=JWTAuthCronometrada(), response=schemas.ReservaSchema)
+def reserva_confirma(request, reserva_id: str):
+    reserva = reserva_permitida(request, reserva_id)
+    responsavel = request.user.perfil_set.filter(empresa=reserva.estoque.armazem.empresa_id).first()
+    return resposta_reserva(reservas.confirma(reserva, responsavel))
+
+
+@api.post('/reserva/{reserva_id}/liberar', auth=JWTAuthCronometrada(), response=schemas.ReservaSchema)
+def reserva_libera(request, reserva_id: str):
+    return resposta_reserva(reservas.libera(reserva_permitida(request, reserva_id)))
+
+
+@api.get('/usuario', auth=JWTAuthCronometrada(), response=schemas.PerfilSchema)
 def usuario(request):
     perfil = request.user.perfil_set.all().first()
     response = schemas.PerfilSchema(
@@ -498,3 +848,165 @@ def usuario(request):
         logado=True
     )
     return response
+
+
+@api.get('/sync', auth=JWTAuthCronometrada(), response=schemas.SincronizacaoSchema)
+def sincronizacao(request, desde: str | None = None):
+    agora = timezone.now()
+    data_inicial = None
+    if desde:
+        try:
+            data_inicial = EPOCA + timedelta(microseconds=int(desde)) - MARGEM_SINCRONIZACAO
+        except (ValueError, OverflowError):
+            raise HttpError(400, 'Token de sincronização inválido.')
+
+    produtos = models.Produto.objects.select_related('unidade_medida', 'marca')
+    armazens = models.Armazem.objects.select_related('empresa', 'municipio')
+    estoques = models.Estoque.objects.select_related(
+        'armazem', 'produto', 'produto__unidade_medida', 'produto__marca'
+    )
+    exclusoes = models.Exclusao.objects.all()
+
+    armazens = armazens.para_usuario(request.user)
+    estoques = estoques.para_usuario(request.user)
+    if not request.user.is_superuser:
+        empresas = models.Perfil.objects.filter(
+            usuario=request.user
+        ).values('empresa_id')
+        exclusoes = exclusoes.filter(Q(empresa__isnull=True) | Q(empresa__in=empresas))
+
+    if data_inicial is None:
+        produtos = produtos.filter(ativo=True)
+        armazens = armazens.filter(ativo=True)
+        estoques = estoques.filter(ativo=True)
+        exclusoes = exclusoes.none()
+    else:
+        produtos = produtos.filter(atualizado_em__gte=data_inicial)
+        armazens = armazens.filter(atualizado_em__gte=data_inicial)
+        estoques = estoques.filter(atualizado_em__gte=data_inicial)
+        exclusoes = exclusoes.filter(criado_em__gte=data_inicial)
+
+    removidos = {
+        models.Exclusao.PRODUTO: [],
+        models.Exclusao.ARMAZEM: [],
+        models.Exclusao.ESTOQUE: [],
+    }
+    for modelo, objeto_uuid in exclusoes.values_list('modelo', 'objeto_uuid'):
+        removidos[modelo].append(objeto_uuid)
+
+    produtos_alterados = []
+    for p in produtos:
+        if not p.ativo:
+            removidos[models.Exclusao.PRODUTO].append(p.uuid)
+            continue
+        produtos_alterados.append(
+            schemas.ProdutoSchema(
+                uuid=p.uuid,
+                nome=p.nome,
+                unidade_medida_sigla=p.unidade_medida.sigla,
+                unidade_medida_id=p.unidade_medida.id,
+                marca=p.marca.nome if p.marca is not None else '',
+                marca_id=p.marca.uuid if p.marca is not None else None
+            )
+        )
+
+    armazens_alterados = []
+    for a in armazens:
+        if not a.ativo:
+            removidos[models.Exclusao.ARMAZEM].append(a.uuid)
+            continue
+        armazens_alterados.append(
+            schemas.ArmazemSchema(
+                uuid=a.uuid,
+                empresa=a.empresa.nome,
+                nome=a.nome,
+                logradouro=a.logradouro,
+                numero=a.numero,
+                complemento=a.complemento,
+                cep=a.cep,
+                municipio=f'{a.municipio.nome}/{a.municipio.uf}' if a.municipio is not None else '',
+                municipio_id=a.municipio_id
+            )
+        )
+
+    estoques_alterados = []
+    for e in estoques:
+        if not e.ativo:
+            removidos[models.Exclusao.ESTOQUE].append(e.uuid)
+            continue
+        estoques_alterados.append(
+            schemas.EstoqueSchema(
+                uuid=e.uuid,
+                armazem_uuid=e.armazem.uuid,
+                armazem_nome=e.armazem.nome,
+                produto_uuid=e.produto.uuid,
+                produto_nome=e.produto.nome,
+                produto_unidade_medida=e.produto.unidade_medida.sigla,
+                produto_marca=e.produto.marca.nome if e.produto.marca is not None else '',
+                quantidade=e.quantidade,
+                preco=e.preco,
+                classe=e.classe
+            )
+        )
+
+    response = schemas.SincronizacaoSchema(
+        token=str((agora - EPOCA) // timedelta(microseconds=1)),
+        produtos=schemas.AlteracoesSchema(
+            alterados=produtos_alterados, removidos=removidos[models.Exclusao.PRODUTO]
+        ),
+        armazens=schemas.AlteracoesSchema(
+            alterados=armazens_alterados, removidos=removidos[models.Exclusao.ARMAZEM]
+        ),
+        itens_estoque=schemas.AlteracoesSchema(
+            alterados=estoques_alterados, removidos=removidos[models.Exclusao.ESTOQUE]
+        ),
+    )
+    return response
+
+
+def resposta_exportacao(request, nome, blocos, compactar):
+    if compactar:
+        blocos = exportacao.compacta(blocos)
+    if isinstance(request, ASGIRequest):
+        blocos = exportacao.assincrono(blocos)
+    if compactar:
+        response = StreamingHttpResponse(blocos, content_type='application/gzip')
+        response['Content-Disposition'] = f'attachment; filename="{nome}.csv.gz"'
+    else:
+        response = StreamingHttpResponse(blocos, content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{nome}.csv"'
+    return response
+
+
+@api.get('/exportar/movimentos', auth=JWTAuthCronometrada())
+def exportar_movimentos(
+    request, empresa_id: str | None = None, data_inicial: date | None = None,
+    data_final: date | None = None, compactar: bool = False
+):
+    if empresa_id is not None:
+        empresa = get_object_or_404(models.Empresa, uuid=empresa_id)
+        valida_permissao_empresa(request.user, empresa)
+
+    movimentos = exportacao.movimentos(request.user, empresa_id, data_inicial, data_final)
+    blocos = exportacao.linhas_csv(exportacao.CABECALHO_MOVIMENTOS, movimentos)
+    return resposta_exportacao(request, 'movimentos', blocos, compactar)
+
+
+@api.get('/exportar/estoque', auth=JWTAuthCronometrada())
+def exportar_estoque(request, empresa_id: str | None = None, compactar: bool = False):
+    if empresa_id is not None:
+        empresa = get_object_or_404(models.Empresa, uuid=empresa_id)
+        valida_permissao_empresa(request.user, empresa)
+
+    estoques = exportacao.estoques(request.user, empresa_id)
+    blocos = exportacao.linhas_csv(exportacao.CABECALHO_ESTOQUE, estoques)
+    return resposta_exportacao(request, 'estoque', blocos, compactar)
+
+
+@api.get('/metricas', include_in_schema=False)
+def metricas_exporta(request):
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not settings.METRICAS_TOKEN or not constant_time_compare(token, settings.METRICAS_TOKEN):
+        raise HttpError(403, 'Acesso às métricas não autorizado.')
+    conteudo, content_type = metricas.exporta()
+    return HttpResponse(conteudo, content_type=content_type)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'controle_estoque.core'
+
+    def ready(self):
+        from controle_estoque.core import sinais, verificacoes
@@ -0,0 +1,89 @@
+from ninja.errors import HttpError
+
+
+def _texto_ou_vazio(coluna):
+    return lambda linha: linha[coluna] if linha[coluna] is not None else ''
+
+
+def _municipio(linha):
+    if linha['municipio__nome'] is None:
+        return ''
+    return f"{linha['municipio__nome']}/{linha['municipio__uf']}"
+
+
+CAMPOS_ESTOQUE = {
+    'uuid': (['uuid'], None),
+    'armazem_uuid': (['armazem_id'], None),
+    'armazem_nome': (['armazem__nome'], None),
+    'produto_uuid': (['produto_id'], None),
+    'produto_nome': (['produto__nome'], None),
+    'produto_unidade_medida': (['produto__unidade_medida__sigla'], None),
+    'produto_marca': (['produto__marca__nome'], _texto_ou_vazio('produto__marca__nome')),
+    'quantidade': (['quantidade'], None),
+    'preco': (['preco'], None),
+    'classe': (['classe'], None),
+}
+
+CAMPOS_RESUMO_ESTOQUE = {
+    'uuid': (['estoque_id'], None),
+    'armazem_uuid': (['armazem_id'], None),
+    'armazem_nome': (['armazem_nome'], None),
+    'produto_uuid': (['produto_id'], None),
+    'produto_nome': (['produto_nome'], None),
+    'produto_unidade_medida': (['produto_unidade_medida'], None),
+    'produto_marca': (['produto_marca'], None),
+    'quantidade': (['quantidade'], None),
+    'preco': (['preco'], None),
+    'classe': (['classe'], None),
+}
+
+CAMPOS_PRODUTO = {
+    'uuid': (['uuid'], None),
+    'nome': (['nome'], None),
+    'unidade_medida_sigla': (['unidade_medida__sigla'], None),
+    'unidade_medida_id': (['unidade_medida_id'], None),
+    'marca': (['marca__nome'], _texto_ou_vazio('marca__nome')),
+    'marca_id': (['marca_id'], None),
+}
+
+CAMPOS_ARMAZEM = {
+    'uuid': (['uuid'], None),
+    'nome': (['nome'], None),
+    'logradouro': (['logradouro'], None),
+    'numero': (['numero'], None),
+    'complemento': (['complemento'], None),
+    'cep': (['cep'], None),
+    'empresa': (['empresa__nome'], None),
+    'municipio': (['municipio__nome', 'municipio__uf'], _municipio),
+    'municipio_id': (['municipio_id'], None),
+}
+
+
+def seleciona(disponiveis, fields, extras=()):
+    nomes = list(dict.fromkeys(f.strip() for f in fields.split(',') if f.strip()))
+    invalidos = [n for n in nomes if n not in disponiveis and n not in extras]
+    if invalidos or not nomes:
+        validos = ', '.join([*disponiveis, *extras])
+        raise HttpError(400, f'Campos inválidos: {", ".join(invalidos)}. Disponíveis: {validos}.')
+    return nomes
+
+
+def colunas(disponiveis, nomes):
+    return list(dict.fromkeys(
+        coluna for nome in nomes if nome in disponiveis for coluna in disponiveis[nome][0]
+    ))
+
+
+def serializa(disponiveis, nomes, linha):
+    dados = {}
+    for nome in nomes:
+        if nome not in disponiveis:
+            continue
+        cols, valor = disponiveis[nome]
+        dados[nome] = valor(linha) if valor is not None else linha[cols[0]]
+    return dados
+
+
+def lista(queryset, disponiveis, fields):
+    nomes = seleciona(disponiveis, fields)
+    return [serializa(disponiveis, nomes, linha) for linha in queryset.values('pk', *colunas(disponiveis, nomes))]
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from controle_estoque.core import models
+
+LIMITE_A = 0.8
+LIMITE_B = 0.95
+
+
+def valores_consumo(empresa_id, inicio, estoques=None):
+    movimentos = models.Movimento.objects.filter(
+        estoque__armazem__empresa=empresa_id,
+        tipo=models.Movimento.SAIDA,
+        criado_em__gte=inicio,
+    )
+    if estoques is not None:
+        movimentos = movimentos.filter(estoque__in=estoques)
+    return dict(
+        movimentos.order_by().values('estoque').annotate(
+            valor=Sum(
+                F('quantidade') * Coalesce('preco', 'estoque__preco'),
+                output_field=DecimalField(),
+            )
+        ).values_list('estoque', 'valor')
+    )
+
+
+def classes(valores):
+    total = valores.sum()
+    resultado = np.full(len(valores), models.Estoque.CLASSE_C, dtype='<U1')
+    participacao = np.zeros(len(valores))
+    acumulada = np.zeros(len(valores))
+    if total <= 0:
+        return resultado, participacao, acumulada
+
+    ordem = np.argsort(-valores, kind='stable')
+    participacao = valores / total
+    acumulada_ordenada = np.cumsum(participacao[ordem])
+    anterior = acumulada_ordenada - participacao[ordem]
+    ordenadas = np.where(
+        anterior < LIMITE_A, models.Estoque.CLASSE_A,
+        np.where(anterior < LIMITE_B, models.Estoque.CLASSE_B, models.Estoque.CLASSE_C)
+    )
+    ordenadas[valores[ordem] <= 0] = models.Estoque.CLASSE_C
+    resultado[ordem] = ordenadas
+    acumulada[ordem] = acumulada_ordenada
+    return resultado, participacao, acumulada
+
+
+def itens_alterados(empresa_id, anterior, inicio):
+    inicio_anterior = anterior.calculada_em - timedelta(days=anterior.dias)
+    movimentos = models.Movimento.objects.filter(
+        Q(criado_em__gt=anterior.calculada_em)
+        | Q(criado_em__gte=inicio_anterior, criado_em__lt=inicio),
+        estoque__armazem__empresa=empresa_id,
+        tipo=models.Movimento.SAIDA,
+    ).order_by().values_list('estoque', flat=True).distinct()
+    estoques = models.Estoque.objects.filter(
+        armazem__empresa=empresa_id, atualizado_em__gt=anterior.calculada_em
+    ).values_list('uuid', flat=True)
+    return set(movimentos) | set(estoques)
+
+
+def precisa_classificar(empresa_id, dias):
+    anterior = models.ClassificacaoABC.objects.filter(empresa=empresa_id).first()
+    if anterior is None or anterior.dias != dias or anterior.valores is None:
+        return True
+    return bool(itens_alterados(empresa_id, anterior, timezone.now() - timedelta(days=dias)))
+
+
+@transaction.atomic
+def classifica(empresa_id, dias, incremental=True):
+    agora = timezone.now()
+    inicio = agora - timedelta(days=dias)
+    itens = list(
+        models.Estoque.objects.filter(armazem__empresa=empresa_id).order_by('produto__nome').values(
+            'uuid', 'armazem__nome', 'produto__nome', 'classe'
+        )
+    )
+    anterior = models.ClassificacaoABC.objects.select_for_update().filter(empresa=empresa_id).first()
+    if (
+        incremental and anterior is not None and anterior.dias == dias
+        and anterior.valores is not None
+    ):
+        consumo = {u: Decimal(v) for u, v in anterior.valores.items()}
+        alterados = itens_alterados(empresa_id, anterior, inicio)
+        for estoque in alterados:
+            consumo.pop(str(estoque), None)
+        consumo.update(
+            (str(e), v) for e, v in valores_consumo(empresa_id, inicio, alterados).items()
+        )
+    else:
+        consumo = {str(e): v for e, v in valores_consumo(empresa_id, inicio).items()}
+    consumo = {str(i['uuid']): consumo.get(str(i['uuid']), 0) for i in itens}
+    valores = np.array([float(v) for v in consumo.values()])
+    novas, participacao, acumulada = classes(valores)
+
+    alteradas = {}
+    for item, classe in zip(itens, novas):
+        if item['classe'] != classe:
+            alteradas.setdefault(str(classe), []).append(item['uuid'])
+    for classe, uuids in alteradas.items():
+        models.Estoque.objects.filter(uuid__in=uuids).update(classe=classe, atualizado_em=agora)
+        models.EstoqueResumo.objects.filter(estoque__in=uuids).update(
+            classe=classe, atualizado_em=agora
+        )
+
+    models.ClassificacaoABC.objects.update_or_create(
+        empresa_id=empresa_id, defaults={
+            'dias': dias,
+            'calculada_em': timezone.now(),
+            'valores': {u: str(v) for u, v in consumo.items() if v},
+        }
+    )
+    return [
+        {
+            'estoque_uuid': item['uuid'],
+            'armazem_nome': item['armazem__nome'],
+            'produto_nome': item['produto__nome'],
+            'valor_consumo': round(float(valores[i]), 2),
+            'participacao': round(float(participacao[i]), 4),
+            'participacao_acumulada': round(float(acumulada[i]), 4),
+            'classe': str(novas[i]),
+        }
+        for i, item in enumerate(itens)
+    ], sum(len(u) for u in alteradas.values())
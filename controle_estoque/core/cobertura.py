@@ -0,0 +1,116 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from controle_estoque.core import metricas, models
+
+JANELA_RECENTE = 7
+DIAS_MAXIMO = 365
+
+
+def chave_versao(empresa_id):
+    return f'cobertura:versao:{empresa_id}'
+
+
+def invalida(empresa_id):
+    try:
+        cache.incr(chave_versao(empresa_id))
+    except ValueError:
+        cache.set(chave_versao(empresa_id), 1, None)
+
+
+def cobertura_empresa(empresa_id, dias):
+    versao = cache.get_or_set(chave_versao(empresa_id), 1, None)
+    hoje = timezone.localdate()
+    chave = f'cobertura:{empresa_id}:{versao}:{dias}:{hoje.isoformat()}'
+    resultado = cache.get(chave)
+    metricas.registra_cache('cobertura', resultado is not None)
+    if resultado is None:
+        resultado = calcula(empresa_id, dias, hoje)
+        cache.set(chave, resultado, settings.COBERTURA_CACHE_SEGUNDOS)
+    return resultado
+
+
+def saidas_diarias(empresa_id, inicio, fim):
+    return models.Movimento.objects.filter(
+        estoque__armazem__empresa=empresa_id,
+        tipo=models.Movimento.SAIDA,
+        criado_em__gte=timezone.make_aware(datetime.combine(inicio, time.min)),
+        criado_em__lt=timezone.make_aware(datetime.combine(fim + timedelta(days=1), time.min)),
+    ).annotate(
+        dia=TruncDate('criado_em')
+    ).order_by().values('estoque', 'dia').annotate(
+        total=Sum('quantidade')
+    ).values_list('estoque', 'dia', 'total')
+
+
+def calcula(empresa_id, dias, hoje):
+    itens = list(
+        models.EstoqueResumo.objects.filter(empresa=empresa_id).order_by('produto_nome').values(
+            'estoque_id', 'armazem_id', 'armazem_nome', 'produto_id', 'produto_nome',
+            'produto_unidade_medida', 'quantidade'
+        )
+    )
+    if not itens:
+        return []
+
+    inicio = hoje - timedelta(days=dias - 1)
+    indices = {item['estoque_id']: i for i, item in enumerate(itens)}
+    saidas = [s for s in saidas_diarias(empresa_id, inicio, hoje) if s[0] in indices]
+
+    matriz = np.zeros((len(itens), dias))
+    if saidas:
+        estoques, datas, totais = zip(*saidas)
+        np.add.at(
+            matriz,
+            (
+                np.fromiter((indices[e] for e in estoques), dtype=np.intp, count=len(saidas)),
+                np.fromiter(((d - inicio).days for d in datas), dtype=np.intp, count=len(saidas)),
+            ),
+            np.array(totais, dtype=float),
+        )
+
+    janela = min(JANELA_RECENTE, dias)
+    acumulado = np.concatenate([np.zeros((len(itens), 1)), np.cumsum(matriz, axis=1)], axis=1)
+    moveis = (acumulado[:, janela:] - acumulado[:, :-janela]) / janela
+
+    taxa_media = matriz.mean(axis=1)
+    taxa_recente = moveis[:, -1]
+    taxa_pico = moveis.max(axis=1)
+
+    x = np.arange(dias) - (dias - 1) / 2
+    denominador = (x ** 2).sum()
+    tendencia = matriz @ x / denominador if denominador else np.zeros(len(itens))
+
+    quantidades = np.array([float(i['quantidade']) for i in itens])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cobertura = np.where(taxa_media > 0, quantidades / taxa_media, np.nan)
+
+    return [
+        {
+            'estoque_uuid': item['estoque_id'],
+            'armazem_uuid': item['armazem_id'],
+            'armazem_nome': item['armazem_nome'],
+            'produto_uuid': item['produto_id'],
+            'produto_nome': item['produto_nome'],
+            'produto_unidade_medida': item['produto_unidade_medida'],
+            'quantidade': item['quantidade'],
+            'taxa_media': round(float(taxa_media[i]), 3),
+            'taxa_recente': round(float(taxa_recente[i]), 3),
+            'taxa_pico': round(float(taxa_pico[i]), 3),
+            'tendencia': round(float(tendencia[i]), 4),
+            'dias_cobertura': None if np.isnan(cobertura[i]) else round(float(cobertura[i]), 1),
+        }
+        for i, item in enumerate(itens)
+    ]
+
+
+def ordena(itens):
+    return sorted(
+        itens, key=lambda i: (i['dias_cobertura'] is None, i['dias_cobertura'] or 0, i['produto_nome'])
+    )
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_arquivo_lock = threading.Lock()
+_piores = {}
+
+PADROES = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normaliza(sql):
+    for padrao, substituto in PADROES:
+        sql = padrao.sub(substituto, sql)
+    return sql.strip()
+
+
+def impressao_digital(sql_normalizado):
+    return hashlib.md5(sql_normalizado.encode()).hexdigest()[:12]
+
+
+def plano_de_execucao(conexao, sql, params):
+    prefixo = 'EXPLAIN QUERY PLAN ' if conexao.vendor == 'sqlite' else 'EXPLAIN '
+    _local.explicando = True
+    try:
+        with transaction.atomic(using=conexao.alias), conexao.cursor() as cursor:
+            cursor.execute(prefixo + sql, params)
+            return '\n'.join(' '.join(str(c) for c in linha) for linha in cursor.fetchall())
+    except Exception:
+        logger.exception('Falha ao obter o plano de execução.')
+        return None
+    finally:
+        _local.explicando = False
+
+
+class MonitorConsultas:
+    def __init__(self, conexao, rota):
+        self.conexao = conexao
+        self.rota = rota if callable(rota) else lambda: rota
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'explicando', False):
+            return execute(sql, params, many, context)
+
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            if duracao >= settings.CONSULTAS_LENTAS_LIMITE_MS:
+                self.registra(sql, params, many, duracao)
+
+    def registra(self, sql, params, many, duracao):
+        normalizado = normaliza(sql)
+        digital = impressao_digital(normalizado)
+        registro = {
+            'data': timezone.now().isoformat(),
+            'impressao_digital': digital,
+            'rota': self.rota(),
+            'duracao_ms': round(duracao, 3),
+            'sql': normalizado,
+        }
+        if (
+            settings.CONSULTAS_LENTAS_EXPLAIN and not many
+            and normalizado[:6].upper() == 'SELECT' and duracao > _piores.get(digital, 0)
+        ):
+            _piores[digital] = duracao
+            registro['plano'] = plano_de_execucao(self.conexao, sql, params)
+
+        logger.warning('Consulta lenta (%.1f ms) em %s: %s', duracao, registro['rota'], normalizado)
+        with _arquivo_lock, open(settings.CONSULTAS_LENTAS_ARQUIVO, 'a') as arquivo:
+            arquivo.write(json.dumps(registro) + '\n')
+
+
+def monitora(rota):
+    pilha = ExitStack()
+    for conexao in connections.all():
+        pilha.enter_context(conexao.execute_wrapper(MonitorConsultas(conexao, rota)))
+    return pilha
+
+
+class ConsultasLentasMiddleware:
+    def __init__(self, get_response):
+        if not settings.CONSULTAS_LENTAS_LIMITE_MS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        def rota():
+            match = getattr(request, 'resolver_match', None)
+            return match.route if match is not None else request.path
+
+        with monitora(rota):
+            return self.get_response(request)
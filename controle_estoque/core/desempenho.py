@@ -0,0 +1,132 @@
+import cProfile
+import io
+import pstats
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from ninja.renderers import JSONRenderer
+from ninja_extra import NinjaExtraAPI
+from ninja_jwt.authentication import JWTAuth
+from ninja_jwt.exceptions import AuthenticationFailed, InvalidToken
+
+from controle_estoque.core import limites, metricas
+
+CABECALHO_PERFIL = 'X-Perfil'
+
+
+def registra_tempo(request, nome, duracao):
+    tempos = getattr(request, 'server_timing', None)
+    if tempos is not None:
+        tempos[nome] = tempos.get(nome, 0) + duracao
+
+
+class NinjaExtraAPICacheada(NinjaExtraAPI):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.esquemas_openapi = {}
+
+    def get_openapi_schema(self, *, path_prefix=None, path_params=None):
+        if path_prefix is None:
+            path_prefix = self.get_root_path(path_params or {})
+        if path_prefix not in self.esquemas_openapi:
+            self.esquemas_openapi[path_prefix] = super().get_openapi_schema(path_prefix=path_prefix)
+        return self.esquemas_openapi[path_prefix]
+
+
+class JWTAuthCronometrada(JWTAuth):
+    def authenticate(self, request, token):
+        inicio = time.perf_counter()
+        try:
+            usuario = super().authenticate(request, token)
+        finally:
+            registra_tempo(request, 'auth', time.perf_counter() - inicio)
+        limites.verifica(request)
+        return usuario
+
+
+class JSONRendererCronometrado(JSONRenderer):
+    def render(self, request, data, *, response_status):
+        inicio = time.perf_counter()
+        try:
+            return super().render(request, data, response_status=response_status)
+        finally:
+            registra_tempo(request, 'serializacao', time.perf_counter() - inicio)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
+
+        request.server_timing = {}
+        consultas = 0
+
+        def cronometra_consulta(execute, sql, params, many, context):
+            nonlocal consultas
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                consultas += 1
+                registra_tempo(request, 'db', time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(cronometra_consulta))
+            if CABECALHO_PERFIL in request.headers:
+                response = self.perfila(request)
+            else:
+                response = self.get_response(request)
+        request.server_timing['total'] = time.perf_counter() - inicio
+        metricas.registra_requisicao(request, response, request.server_timing['total'], consultas)
+
+        entradas = []
+        for nome, duracao in request.server_timing.items():
+            entrada = f'{nome};dur={duracao * 1000:.1f}'
+            if nome == 'db':
+                entrada += f';desc="{consultas} consultas"'
+            entradas.append(entrada)
+        response['Server-Timing'] = ', '.join(entradas)
+        return response
+
+    def perfila(self, request):
+        if not self.superusuario(request):
+            return self.get_response(request)
+
+        perfilador = cProfile.Profile()
+        response = perfilador.runcall(self.get_response, request)
+
+        diretorio = Path(settings.PERFIL_DIRETORIO)
+        diretorio.mkdir(parents=True, exist_ok=True)
+        nome = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        perfilador.dump_stats(diretorio / f'{nome}.prof')
+        resumo = io.StringIO()
+        resumo.write(f'{request.method} {request.get_full_path()}\n\n')
+        pstats.Stats(perfilador, stream=resumo).sort_stats('cumulative').print_stats(50)
+        (diretorio / f'{nome}.txt').write_text(resumo.getvalue())
+
+        response['X-Perfil-Relatorio'] = nome
+        return response
+
+    def superusuario(self, request):
+        usuario = getattr(request, 'user', None)
+        if usuario is not None and usuario.is_authenticated:
+            return usuario.is_superuser
+
+        cabecalho = request.headers.get('Authorization', '')
+        if not cabecalho.startswith('Bearer '):
+            return False
+        try:
+            autenticacao = JWTAuth()
+            validado = autenticacao.get_validated_token(cabecalho[7:])
+            return autenticacao.get_user(validado).is_superuser
+        except (InvalidToken, AuthenticationFailed):
+            return False
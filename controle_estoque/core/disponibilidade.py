@@ -0,0 +1,70 @@
+import uuid
+
+from django.db.models import F, Sum
+from ninja.errors import HttpError
+
+MAXIMO_PRODUTOS = 200
+
+
+def interpreta_produtos(produto_id):
+    try:
+        produtos = {uuid.UUID(p.strip()) for p in produto_id.split(',') if p.strip()}
+    except ValueError:
+        raise HttpError(400, 'Identificador de produto inválido.')
+    if not produtos:
+        raise HttpError(400, 'Informe ao menos um produto.')
+    if len(produtos) > MAXIMO_PRODUTOS:
+        raise HttpError(400, f'Informe no máximo {MAXIMO_PRODUTOS} produtos por consulta.')
+    return produtos
+
+
+TOTAIS = {
+    'total_quantidade': Sum('quantidade'),
+    'total_reservado': Sum('reservado'),
+    'total_disponivel': Sum(F('quantidade') - F('reservado')),
+}
+
+
+def disponibilidade(estoques, produtos):
+    estoques = estoques.filter(produto__in=produtos).order_by()
+    por_produto = estoques.values('produto', 'produto__nome').annotate(**TOTAIS).order_by(
+        'produto__nome', 'produto'
+    )
+    por_empresa = estoques.values(
+        'produto', 'armazem__empresa', 'armazem__empresa__nome'
+    ).annotate(**TOTAIS).order_by('armazem__empresa__nome', 'armazem__empresa')
+    por_armazem = estoques.values(
+        'produto', 'armazem__empresa', 'armazem', 'armazem__nome', 'uuid', 'quantidade', 'reservado'
+    ).annotate(disponivel=F('quantidade') - F('reservado')).order_by('armazem__nome')
+
+    armazens = {}
+    for linha in por_armazem:
+        armazens.setdefault((linha['produto'], linha['armazem__empresa']), []).append({
+            'armazem_uuid': linha['armazem'],
+            'armazem_nome': linha['armazem__nome'],
+            'estoque_uuid': linha['uuid'],
+            'quantidade': linha['quantidade'],
+            'reservado': linha['reservado'],
+            'disponivel': linha['disponivel'],
+        })
+    empresas = {}
+    for linha in por_empresa:
+        empresas.setdefault(linha['produto'], []).append({
+            'empresa_uuid': linha['armazem__empresa'],
+            'empresa_nome': linha['armazem__empresa__nome'],
+            'quantidade': linha['total_quantidade'],
+            'reservado': linha['total_reservado'],
+            'disponivel': linha['total_disponivel'],
+            'armazens': armazens[linha['produto'], linha['armazem__empresa']],
+        })
+    return [
+        {
+            'produto_uuid': linha['produto'],
+            'produto_nome': linha['produto__nome'],
+            'quantidade': linha['total_quantidade'],
+            'reservado': linha['total_reservado'],
+            'disponivel': linha['total_disponivel'],
+            'empresas': empresas[linha['produto']],
+        }
+        for linha in por_produto
+    ]
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+TAMANHO_FILA = 100
+CANAL_POSTGRES = 'estoque_eventos'
+
+logger = logging.getLogger(__name__)
+
+
+class Assinatura:
+    def __init__(self, loop, empresas=None, armazem_id=None):
+        self.loop = loop
+        self.fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+        self.empresas = empresas
+        self.armazem_id = armazem_id
+
+    def aceita(self, evento):
+        if self.empresas is not None and evento['empresa_uuid'] not in self.empresas:
+            return False
+        if self.armazem_id is not None and evento['armazem_uuid'] != self.armazem_id:
+            return False
+        return True
+
+    def entrega(self, evento):
+        if self.fila.full():
+            self.fila.get_nowait()
+        self.fila.put_nowait(evento)
+
+
+class BackendLocal:
+
+    def conecta(self, entrega):
+        self.entrega = entrega
+
+    def inicia(self):
+        pass
+
+    def publica(self, evento):
+        self.entrega(evento)
+
+
+class BackendPostgres:
+
+    def conecta(self, entrega):
+        self.entrega = entrega
+        self.escutando = False
+
+    def inicia(self):
+        if not self.escutando:
+            self.escutando = True
+            threading.Thread(target=self.escuta, daemon=True).start()
+
+    def publica(self, evento):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CANAL_POSTGRES, json.dumps(evento)])
+
+    def escuta(self):
+        import psycopg
+
+        parametros = connection.get_connection_params()
+        while True:
+            try:
+                with psycopg.connect(**parametros, autocommit=True) as conexao:
+                    conexao.execute(f'LISTEN {CANAL_POSTGRES}')
+                    for notificacao in conexao.notifies():
+                        self.entrega(json.loads(notificacao.payload))
+            except psycopg.Error:
+                logger.exception('Conexão de eventos com o PostgreSQL perdida.')
+                time.sleep(5)
+
+
+class Broker:
+    def __init__(self, backend):
+        self.assinaturas = set()
+        self.lock = threading.Lock()
+        self.backend = backend
+        self.backend.conecta(self.entrega)
+
+    def assina(self, empresas=None, armazem_id=None):
+        assinatura = Assinatura(asyncio.get_running_loop(), empresas, armazem_id)
+        with self.lock:
+            self.backend.inicia()
+            self.assinaturas.add(assinatura)
+        return assinatura
+
+    def cancela(self, assinatura):
+        with self.lock:
+            self.assinaturas.discard(assinatura)
+
+    def publica(self, evento):
+        self.backend.publica(evento)
+
+    def entrega(self, evento):
+        with self.lock:
+            assinaturas = [a for a in self.assinaturas if a.aceita(evento)]
+        for assinatura in assinaturas:
+            try:
+                assinatura.loop.call_soon_threadsafe(assinatura.entrega, evento)
+            except RuntimeError:
+                self.cancela(assinatura)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = Broker(import_string(settings.ESTOQUE_EVENTOS_BACKEND)())
+    return _broker
+
+
+def evento_estoque(estoque):
+    return {
+        'estoque_uuid': str(estoque.uuid),
+        'empresa_uuid': str(estoque.armazem.empresa_id),
+        'armazem_uuid': str(estoque.armazem_id),
+        'produto_uuid': str(estoque.produto_id),
+        'quantidade': str(estoque.quantidade),
+        'preco': str(estoque.preco),
+        'atualizado_em': estoque.atualizado_em.isoformat(),
+    }
+
+
+def evento_resumo(resumo):
+    return {
+        'estoque_uuid': str(resumo.estoque_id),
+        'empresa_uuid': str(resumo.empresa_id),
+        'armazem_uuid': str(resumo.armazem_id),
+        'produto_uuid': str(resumo.produto_id),
+        'quantidade': str(resumo.quantidade),
+        'preco': str(resumo.preco),
+        'atualizado_em': resumo.atualizado_em.isoformat(),
+    }
+
+
+def publica_apos_commit(eventos):
+    if not eventos:
+        return
+
+    def publica():
+        broker = get_broker()
+        for evento in eventos:
+            broker.publica(evento)
+
+    transaction.on_commit(publica)
@@ -0,0 +1,122 @@
+import csv
+import sys
+import zlib
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.db.models import BooleanField, Value
+from django.utils import timezone
+
+from controle_estoque.core.models import Estoque, Movimento, MovimentoArquivado
+
+TAMANHO_LOTE = 2000
+
+CABECALHO_MOVIMENTOS = [
+    'movimento', 'data', 'tipo', 'quantidade', 'preco', 'empresa', 'armazem_uuid',
+    'armazem', 'estoque_uuid', 'produto_uuid', 'produto', 'unidade_medida', 'marca',
+    'responsavel', 'arquivado'
+]
+CAMPOS_MOVIMENTOS = [
+    'uuid', 'criado_em', 'tipo', 'quantidade', 'preco', 'estoque__armazem__empresa__nome',
+    'estoque__armazem__uuid', 'estoque__armazem__nome', 'estoque__uuid',
+    'estoque__produto__uuid', 'estoque__produto__nome',
+    'estoque__produto__unidade_medida__sigla', 'estoque__produto__marca__nome',
+    'responsavel__usuario__username'
+]
+
+CABECALHO_ESTOQUE = [
+    'estoque_uuid', 'empresa', 'armazem_uuid', 'armazem', 'produto_uuid', 'produto',
+    'unidade_medida', 'marca', 'quantidade', 'preco', 'atualizado_em'
+]
+CAMPOS_ESTOQUE = [
+    'uuid', 'armazem__empresa__nome', 'armazem__uuid', 'armazem__nome', 'produto__uuid',
+    'produto__nome', 'produto__unidade_medida__sigla', 'produto__marca__nome',
+    'quantidade', 'preco', 'atualizado_em'
+]
+
+
+class Eco:
+    def write(self, valor):
+        return valor
+
+
+def filtra_movimentos(queryset, usuario, empresa_id, data_inicial, data_final, arquivado):
+    if empresa_id is not None:
+        queryset = queryset.filter(estoque__armazem__empresa=empresa_id)
+    elif usuario is not None:
+        queryset = queryset.para_usuario(usuario)
+    if data_inicial is not None:
+        queryset = queryset.filter(criado_em__gte=inicio_do_dia(data_inicial))
+    if data_final is not None:
+        queryset = queryset.filter(criado_em__lt=inicio_do_dia(data_final + timedelta(days=1)))
+    return queryset.order_by().annotate(
+        arquivado=Value(arquivado, output_field=BooleanField())
+    ).values_list(*CAMPOS_MOVIMENTOS, 'arquivado')
+
+
+def movimentos(usuario=None, empresa_id=None, data_inicial=None, data_final=None):
+    filtros = (usuario, empresa_id, data_inicial, data_final)
+    ativos = filtra_movimentos(Movimento.objects.filter(consolidado=False), *filtros, False)
+    arquivados = filtra_movimentos(MovimentoArquivado.objects.all(), *filtros, True)
+    return ativos.union(arquivados, all=True).order_by('criado_em')
+
+
+def estoques(usuario=None, empresa_id=None):
+    queryset = Estoque.objects.order_by('armazem__nome', 'produto__nome')
+    if empresa_id is not None:
+        queryset = queryset.filter(armazem__empresa=empresa_id)
+    elif usuario is not None:
+        queryset = queryset.para_usuario(usuario)
+    return queryset.values_list(*CAMPOS_ESTOQUE)
+
+
+def inicio_do_dia(data):
+    return timezone.make_aware(datetime.combine(data, time.min))
+
+
+def linhas_csv(cabecalho, queryset):
+    escritor = csv.writer(Eco())
+    yield escritor.writerow(cabecalho).encode()
+    lote = []
+    for linha in queryset.iterator(chunk_size=TAMANHO_LOTE):
+        lote.append(escritor.writerow(linha))
+        if len(lote) == TAMANHO_LOTE:
+            yield ''.join(lote).encode()
+            lote = []
+    if lote:
+        yield ''.join(lote).encode()
+
+
+async def assincrono(blocos):
+    iterador = iter(blocos)
+    proximo = sync_to_async(next)
+    fim = object()
+    try:
+        while (bloco := await proximo(iterador, fim)) is not fim:
+            yield bloco
+    finally:
+        if hasattr(iterador, 'close'):
+            await sync_to_async(iterador.close)()
+
+
+def compacta(blocos):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for bloco in blocos:
+        compactado = compressor.compress(bloco)
+        if compactado:
+            yield compactado
+    yield compressor.flush()
+
+
+def grava(blocos, caminho=None, compactar=False):
+    if compactar:
+        blocos = compacta(blocos)
+    destino = open(caminho, 'wb') if caminho else sys.stdout.buffer
+    try:
+        for bloco in blocos:
+            destino.write(bloco)
+    finally:
+        if caminho:
+            destino.close()
+        else:
+            destino.flush()
@@ -0,0 +1,91 @@
+from django.db import transaction
+
+from controle_estoque.core import referencias
+from controle_estoque.core.models import Marca, Produto, UnidadeMedida
+
+TAMANHO_LOTE = 1000
+
+
+def chave(valor):
+    return valor.strip().casefold()
+
+
+def _unidades():
+    unidades = {}
+    for unidade in UnidadeMedida.objects.all():
+        unidades.setdefault(chave(unidade.nome), unidade.id)
+        unidades[chave(unidade.sigla)] = unidade.id
+    return unidades
+
+
+def _marcas():
+    return {chave(nome): uuid for uuid, nome in Marca.objects.values_list('uuid', 'nome')}
+
+
+def _resolve_unidades(linhas, unidades):
+    novas = {}
+    for linha in linhas:
+        valor = (linha.get('unidade_medida') or '').strip()
+        if valor and chave(valor) not in unidades and len(valor) <= 3:
+            novas.setdefault(valor.upper(), UnidadeMedida(nome=valor, sigla=valor.upper()))
+    if novas:
+        UnidadeMedida.objects.bulk_create(novas.values(), ignore_conflicts=True)
+        referencias.invalida('unidades_de_medida')
+        unidades.update(_unidades())
+
+
+def _resolve_marcas(linhas, marcas):
+    novas = {}
+    for linha in linhas:
+        valor = (linha.get('marca') or '').strip()
+        if valor and chave(valor) not in marcas and len(valor) <= Marca._meta.get_field('nome').max_length:
+            novas.setdefault(chave(valor), Marca(nome=valor))
+    if novas:
+        Marca.objects.bulk_create(novas.values(), batch_size=TAMANHO_LOTE, ignore_conflicts=True)
+        referencias.invalida('marcas')
+        marcas.update(_marcas())
+
+
+@transaction.atomic
+def importa_produtos(linhas):
+    linhas = list(linhas)
+    unidades = _unidades()
+    marcas = _marcas()
+    _resolve_unidades(linhas, unidades)
+    _resolve_marcas(linhas, marcas)
+
+    existentes = set(Produto.objects.values_list('nome', 'unidade_medida_id', 'marca_id'))
+    nome_maximo = Produto._meta.get_field('nome').max_length
+    novos = []
+    ignorados = 0
+    invalidos = []
+    for numero, linha in enumerate(linhas, start=1):
+        nome = (linha.get('nome') or '').strip()
+        unidade = (linha.get('unidade_medida') or '').strip()
+        marca = (linha.get('marca') or '').strip()
+        if not nome or len(nome) > nome_maximo:
+            invalidos.append({'linha': numero, 'erro': 'Nome do produto ausente ou muito longo.'})
+            continue
+        if chave(unidade) not in unidades:
+            invalidos.append({'linha': numero, 'erro': f'Unidade de medida "{unidade}" não encontrada.'})
+            continue
+        if marca and chave(marca) not in marcas:
+            invalidos.append({'linha': numero, 'erro': 'Nome da marca muito longo.'})
+            continue
+
+        produto = (nome, unidades[chave(unidade)], marcas[chave(marca)] if marca else None)
+        if produto in existentes:
+            ignorados += 1
+            continue
+        existentes.add(produto)
+        novos.append(Produto(nome=produto[0], unidade_medida_id=produto[1], marca_id=produto[2]))
+
+    Produto.objects.bulk_create(novos, batch_size=TAMANHO_LOTE, ignore_conflicts=True)
+    criados = sum(
+        Produto.objects.filter(
+            uuid__in=[p.uuid for p in novos[inicio:inicio + TAMANHO_LOTE]]
+        ).count()
+        for inicio in range(0, len(novos), TAMANHO_LOTE)
+    )
+    ignorados += len(novos) - criados
+    return {'criados': criados, 'ignorados': ignorados, 'invalidos': invalidos}
@@ -0,0 +1,23 @@
+import time
+
+from django.urls import get_resolver
+
+from controle_estoque.core import referencias
+from controle_estoque.core.api import api
+
+
+def aquece():
+    tempos = {}
+
+    inicio = time.perf_counter()
+    get_resolver().reverse_dict
+    tempos['rotas'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    api.get_openapi_schema()
+    tempos['openapi'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    referencias.aquece()
+    tempos['referencias'] = time.perf_counter() - inicio
+    return tempos
@@ -0,0 +1,118 @@
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, When
+from django.utils.crypto import constant_time_compare
+from ninja_extra.exceptions import Throttled
+
+from controle_estoque.core import metricas
+from controle_estoque.core.models import BaldeLimite, Perfil
+
+CABECALHO_ISENCAO = 'X-Limite-Isencao'
+METODOS_LEITURA = ('GET', 'HEAD', 'OPTIONS')
+DURACOES = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+TABELA = BaldeLimite._meta.db_table
+DECORRIDO = (
+    f'CASE WHEN excluded.instante > {TABELA}.instante '
+    f'THEN excluded.instante - {TABELA}.instante ELSE 0 END'
+)
+REPOSTAS = f'{TABELA}.fichas + ({DECORRIDO}) * excluded.reposicao'
+DISPONIVEIS = (
+    f'CASE WHEN {REPOSTAS} > excluded.capacidade THEN excluded.capacidade ELSE {REPOSTAS} END'
+)
+SQL_CONSUMO = f'''
+    INSERT INTO {TABELA} (chave, capacidade, reposicao, fichas, instante, permitido)
+    VALUES {{valores}}
+    ON CONFLICT (chave) DO UPDATE SET
+        capacidade = excluded.capacidade,
+        reposicao = excluded.reposicao,
+        fichas = CASE WHEN {DISPONIVEIS} >= 1 THEN {DISPONIVEIS} - 1 ELSE {DISPONIVEIS} END,
+        instante = excluded.instante,
+        permitido = {DISPONIVEIS} >= 1
+    RETURNING chave, fichas, permitido
+'''
+
+relogio = time.time
+
+
+class LimiteExcedido(Throttled):
+    default_detail = 'Limite de requisições excedido.'
+    extra_detail_singular = 'Tente novamente em {wait} segundo.'
+    extra_detail_plural = 'Tente novamente em {wait} segundos.'
+
+
+def interpreta_taxa(taxa):
+    quantidade, periodo = taxa.split('/')
+    return int(quantidade), DURACOES[periodo.strip()[0]]
+
+
+def classe_rota(request):
+    return 'leitura' if request.method in METODOS_LEITURA else 'escrita'
+
+
+def identificadores(escopo, usuario):
+    if escopo == 'usuario':
+        return [usuario.pk]
+    return Perfil.objects.filter(usuario=usuario).values_list('empresa_id', flat=True)
+
+
+def baldes(request, classe):
+    resultado = {}
+    for escopo, taxa in settings.LIMITES_REQUISICOES.get(classe, {}).items():
+        if not taxa:
+            continue
+        capacidade, periodo = interpreta_taxa(taxa)
+        for identificador in identificadores(escopo, request.user):
+            resultado[f'{classe}:{escopo}:{identificador}'] = (escopo, capacidade, capacidade / periodo)
+    return resultado
+
+
+def consome(baldes):
+    agora = relogio()
+    parametros = []
+    chaves = sorted(baldes)
+    for chave in chaves:
+        _, capacidade, reposicao = baldes[chave]
+        parametros += [chave, capacidade, reposicao, capacidade - 1, agora, capacidade >= 1]
+    valores = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(chaves))
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_CONSUMO.format(valores=valores), parametros)
+        return {chave: (fichas, permitido) for chave, fichas, permitido in cursor.fetchall()}
+
+
+def devolve(chaves):
+    BaldeLimite.objects.filter(chave__in=chaves).update(fichas=Case(
+        When(fichas__gt=F('capacidade') - 1, then=F('capacidade')),
+        default=F('fichas') + 1,
+    ))
+
+
+def isento(request):
+    token = request.headers.get(CABECALHO_ISENCAO, '')
+    return bool(settings.LIMITES_TOKEN_ISENCAO) and constant_time_compare(
+        token, settings.LIMITES_TOKEN_ISENCAO
+    )
+
+
+def verifica(request):
+    if isento(request):
+        return
+    classe = classe_rota(request)
+    limites = baldes(request, classe)
+    if not limites:
+        return
+
+    esperas = []
+    consumidos = []
+    for chave, (fichas, permitido) in consome(limites).items():
+        escopo, _, reposicao = limites[chave]
+        if permitido:
+            consumidos.append(chave)
+            continue
+        metricas.requisicoes_limitadas.labels(escopo, classe).inc()
+        esperas.append((1 - fichas) / reposicao)
+    if esperas:
+        devolve(consumidos)
+        raise LimiteExcedido(max(esperas))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from controle_estoque.core import cobertura
+from controle_estoque.core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula o consumo médio diário e os dias de cobertura de todos os itens de '
+        'estoque, armazenando o resultado no cache usado por /itens_estoque/cobertura.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', help='UUID da empresa, padrão: todas.')
+        parser.add_argument('--dias', type=int, default=90, help='Período de histórico em dias.')
+        parser.add_argument(
+            '--limite', type=float, default=None,
+            help='Lista os itens com cobertura abaixo deste número de dias.'
+        )
+
+    def handle(self, *args, **options):
+        if not 1 <= options['dias'] <= cobertura.DIAS_MAXIMO:
+            raise CommandError(f'O período deve ter entre 1 e {cobertura.DIAS_MAXIMO} dias.')
+
+        empresas = Empresa.objects.order_by('nome')
+        if options['empresa']:
+            empresas = empresas.filter(uuid=options['empresa'])
+
+        for empresa in empresas:
+            cobertura.invalida(empresa.uuid)
+            itens = cobertura.cobertura_empresa(empresa.uuid, options['dias'])
+            sem_consumo = sum(1 for i in itens if i['dias_cobertura'] is None)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{empresa.nome}: {len(itens)} itens, {sem_consumo} sem saídas no período.'
+            ))
+            if options['limite'] is None:
+                continue
+            for item in cobertura.ordena(itens):
+                if item['dias_cobertura'] is None or item['dias_cobertura'] >= options['limite']:
+                    break
+                self.stdout.write(
+                    f"{item['produto_nome']} ({item['armazem_nome']}): "
+                    f"{item['quantidade']} {item['produto_unidade_medida']}, "
+                    f"{item['taxa_media']}/dia, {item['dias_cobertura']} dias"
+                )
@@ -0,0 +1,73 @@
+import csv
+import gzip
+import io
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from controle_estoque.core import referencias
+from controle_estoque.core.models import Municipio
+
+ARQUIVO_PADRAO = Path(__file__).resolve().parents[2] / 'dados' / 'municipios.csv.gz'
+
+
+class Command(BaseCommand):
+    help = (
+        'Carrega ou atualiza a tabela de municípios a partir de um CSV (opcionalmente '
+        'gzip) com as colunas codigo_ibge, nome e uf.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--arquivo', default=str(ARQUIVO_PADRAO), help='Caminho do arquivo CSV.')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        municipios = self.le_arquivo(options['arquivo'])
+        with transaction.atomic():
+            self.vincula_existentes(municipios)
+            Municipio.objects.bulk_create(
+                municipios,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['codigo_ibge'],
+                update_fields=['nome', 'uf', 'ativo', 'atualizado_em'],
+            )
+            referencias.invalida('municipios')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(municipios)} municípios carregados em {time.perf_counter() - inicio:.2f}s.'
+        ))
+
+    def le_arquivo(self, caminho):
+        abre = gzip.open if caminho.endswith('.gz') else open
+        ufs = dict(Municipio.UFS)
+        municipios = []
+        try:
+            with abre(caminho, 'rb') as arquivo:
+                for numero, linha in enumerate(
+                    csv.DictReader(io.TextIOWrapper(arquivo, encoding='utf-8-sig')), start=2
+                ):
+                    if linha['uf'] not in ufs or not linha['nome']:
+                        raise CommandError(f'Linha {numero} inválida: {linha}')
+                    municipios.append(Municipio(
+                        codigo_ibge=int(linha['codigo_ibge']), nome=linha['nome'], uf=linha['uf']
+                    ))
+        except (OSError, KeyError, ValueError) as erro:
+            raise CommandError(f'Não foi possível ler o arquivo de municípios: {erro}')
+        return municipios
+
+    def vincula_existentes(self, municipios):
+        sem_codigo = {
+            (m.nome.casefold(), m.uf): m
+            for m in Municipio.objects.filter(codigo_ibge__isnull=True)
+        }
+        if not sem_codigo:
+            return
+        vinculados = []
+        for municipio in municipios:
+            existente = sem_codigo.pop((municipio.nome.casefold(), municipio.uf), None)
+            if existente is not None:
+                existente.codigo_ibge = municipio.codigo_ibge
+                vinculados.append(existente)
+        Municipio.objects.bulk_update(vinculados, ['codigo_ibge'], batch_size=1000)
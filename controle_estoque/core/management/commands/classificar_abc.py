@@ -0,0 +1,45 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from controle_estoque.core import classificacao
+from controle_estoque.core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        'Classifica os itens de estoque de cada empresa em A, B ou C pelo valor consumido '
+        'no período. Apenas o consumo dos itens alterados desde a última execução é '
+        'recalculado, e empresas sem alterações são ignoradas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', help='UUID da empresa, padrão: todas.')
+        parser.add_argument('--dias', type=int, default=90, help='Período de consumo em dias.')
+        parser.add_argument(
+            '--forcar', action='store_true',
+            help='Recalcula o consumo de todos os itens, mesmo sem alterações.'
+        )
+
+    def handle(self, *args, **options):
+        if not 1 <= options['dias'] <= 365:
+            raise CommandError('O período deve ter entre 1 e 365 dias.')
+
+        empresas = Empresa.objects.order_by('nome')
+        if options['empresa']:
+            empresas = empresas.filter(uuid=options['empresa'])
+
+        for empresa in empresas:
+            if not options['forcar'] and not classificacao.precisa_classificar(
+                empresa.uuid, options['dias']
+            ):
+                self.stdout.write(f'{empresa.nome}: sem alterações.')
+                continue
+            itens, alterados = classificacao.classifica(
+                empresa.uuid, options['dias'], incremental=not options['forcar']
+            )
+            totais = Counter(i['classe'] for i in itens)
+            self.stdout.write(self.style.SUCCESS(
+                f"{empresa.nome}: A={totais['A']} B={totais['B']} C={totais['C']}, "
+                f'{alterados} itens reclassificados.'
+            ))
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from controle_estoque.core.models import Estoque, Movimento, MovimentoArquivado
+
+
+class Command(BaseCommand):
+    help = (
+        'Arquiva os movimentos anteriores à data informada, substituindo-os por um único '
+        'movimento consolidado de saldo de abertura por item de estoque.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--antes', required=True, help='Data limite no formato AAAA-MM-DD.')
+        parser.add_argument('--lote', type=int, default=500, help='Itens de estoque por transação.')
+
+    def handle(self, *args, **options):
+        try:
+            antes = timezone.make_aware(datetime.strptime(options['antes'], '%Y-%m-%d'))
+        except ValueError:
+            raise CommandError('Data inválida, utilize o formato AAAA-MM-DD.')
+
+        estoques = list(
+            Movimento.objects.filter(criado_em__lt=antes, consolidado=False).order_by().values_list(
+                'estoque', flat=True
+            ).distinct()
+        )
+        lote = options['lote']
+        arquivados = 0
+        for inicio in range(0, len(estoques), lote):
+            arquivados += self.compacta(estoques[inicio:inicio + lote], antes)
+            self.stdout.write(f'{min(inicio + lote, len(estoques))}/{len(estoques)} itens compactados.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{arquivados} movimentos arquivados em {len(estoques)} itens de estoque.'
+        ))
+
+    @transaction.atomic
+    def compacta(self, estoques, antes):
+        list(Estoque.objects.select_for_update().filter(uuid__in=estoques).values_list('uuid'))
+        movimentos = Movimento.objects.filter(estoque__in=estoques)
+        saldos_antes = movimentos.saldos()
+
+        antigos = movimentos.filter(criado_em__lt=antes)
+        saldos_abertura = antigos.saldos()
+        datas = dict(
+            antigos.order_by().values('estoque').annotate(data=Max('criado_em')).values_list(
+                'estoque', 'data'
+            )
+        )
+
+        arquivados = MovimentoArquivado.objects.bulk_create(
+            [MovimentoArquivado(**m) for m in antigos.filter(consolidado=False).values(
+                'uuid', 'responsavel_id', 'estoque_id', 'tipo', 'quantidade',
+                'preco', 'ativo', 'criado_em', 'atualizado_em'
+            ).iterator()],
+            batch_size=1000
+        )
+        antigos.delete()
+
+        aberturas = Movimento.objects.bulk_create([
+            Movimento(
+                estoque_id=estoque,
+                tipo=Movimento.ENTRADA if saldo >= 0 else Movimento.SAIDA,
+                quantidade=abs(saldo),
+                consolidado=True,
+            )
+            for estoque, saldo in saldos_abertura.items()
+        ], batch_size=1000)
+        for abertura in aberturas:
+            abertura.criado_em = datas[abertura.estoque_id]
+        Movimento.objects.bulk_update(aberturas, ['criado_em'], batch_size=1000)
+
+        saldos_depois = movimentos.saldos()
+        if saldos_depois != saldos_antes:
+            raise CommandError('Saldos divergentes após a compactação, operação desfeita.')
+        return len(arquivados)
@@ -0,0 +1,57 @@
+import json
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Lista as consultas lentas registradas, agrupadas por impressão digital e rota.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--arquivo', default=settings.CONSULTAS_LENTAS_ARQUIVO)
+        parser.add_argument('--top', type=int, default=20, help='Quantidade de consultas listadas.')
+        parser.add_argument(
+            '--ordem', choices=['total', 'p95', 'quantidade'], default='total',
+            help='Critério de ordenação.'
+        )
+
+    def handle(self, *args, **options):
+        grupos = defaultdict(lambda: {'duracoes': [], 'sql': '', 'plano': None, 'pior': 0})
+        try:
+            with open(options['arquivo']) as arquivo:
+                for linha in arquivo:
+                    registro = json.loads(linha)
+                    grupo = grupos[(registro['impressao_digital'], registro['rota'])]
+                    grupo['duracoes'].append(registro['duracao_ms'])
+                    grupo['sql'] = registro['sql']
+                    if registro.get('plano') and registro['duracao_ms'] >= grupo['pior']:
+                        grupo['pior'] = registro['duracao_ms']
+                        grupo['plano'] = registro['plano']
+        except FileNotFoundError:
+            raise CommandError(f"Arquivo {options['arquivo']} não encontrado.")
+
+        resumo = []
+        for (digital, rota), grupo in grupos.items():
+            duracoes = sorted(grupo['duracoes'])
+            resumo.append({
+                'impressao_digital': digital,
+                'rota': rota,
+                'quantidade': len(duracoes),
+                'total': sum(duracoes),
+                'p95': duracoes[max(math.ceil(len(duracoes) * 0.95) - 1, 0)],
+                'sql': grupo['sql'],
+                'plano': grupo['plano'],
+            })
+        resumo.sort(key=lambda r: r[options['ordem']], reverse=True)
+
+        for item in resumo[:options['top']]:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{item['impressao_digital']}  {item['rota']}  "
+                f"n={item['quantidade']}  total={item['total']:.1f}ms  p95={item['p95']:.1f}ms"
+            ))
+            self.stdout.write(f"  {item['sql']}")
+            if item['plano']:
+                for linha in item['plano'].splitlines():
+                    self.stdout.write(f'    {linha}')
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from controle_estoque.core import particoes
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria antecipadamente as partições mensais de movimentos e, opcionalmente, '
+        'desanexa as partições já compactadas anteriores ao mês informado, transportando '
+        'o saldo delas para o mês seguinte (somente PostgreSQL).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=3, help='Quantidade de meses futuros.')
+        parser.add_argument('--desanexar-antes', help='Mês limite no formato AAAA-MM.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('O particionamento de movimentos está disponível apenas no PostgreSQL.')
+
+        limite_desanexar = None
+        if options['desanexar_antes']:
+            try:
+                limite_desanexar = particoes.inicio_do_mes(
+                    datetime.strptime(options['desanexar_antes'], '%Y-%m')
+                )
+            except ValueError:
+                raise CommandError('Mês inválido, utilize o formato AAAA-MM.')
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            inicio = particoes.inicio_do_mes(timezone.localtime())
+            for _ in range(options['meses'] + 1):
+                if particoes.cria_particao(cursor, inicio):
+                    self.stdout.write(f'Partição {particoes.nome_particao(inicio)} criada.')
+                inicio = particoes.proximo_mes(inicio)
+
+            if limite_desanexar is not None:
+                for nome in sorted(particoes.particoes_existentes(cursor)):
+                    if nome != particoes.PARTICAO_PADRAO and nome < particoes.nome_particao(limite_desanexar):
+                        try:
+                            saldos = particoes.desanexa_particao(cursor, nome)
+                        except ValueError as erro:
+                            raise CommandError(str(erro))
+                        self.stdout.write(
+                            f'Partição {nome} desanexada, {saldos} saldos transportados para o mês seguinte.'
+                        )
+
+        self.stdout.write(self.style.SUCCESS('Partições de movimentos atualizadas.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from controle_estoque.core import tarefas
+
+
+class Command(BaseCommand):
+    help = 'Executa todas as tarefas pendentes e encerra quando a fila estiver vazia.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1)
+
+    def handle(self, *args, **options):
+        sucessos, falhas = tarefas.drena(threads=options['threads'])
+        self.stdout.write(f'{sucessos} tarefas executadas, {falhas} falhas.')
+        if falhas:
+            raise CommandError(f'{falhas} tarefas falharam.')
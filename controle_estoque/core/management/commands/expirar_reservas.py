@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from controle_estoque.core import reservas
+
+
+class Command(BaseCommand):
+    help = 'Expira as reservas vencidas e devolve as quantidades ao saldo disponível.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=reservas.TAMANHO_LOTE)
+
+    def handle(self, *args, **options):
+        total = reservas.expira(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} reservas expiradas.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from controle_estoque.core import exportacao
+
+
+class Command(BaseCommand):
+    help = 'Exporta a posição dos itens de estoque em CSV, opcionalmente compactado com gzip.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', help='UUID da empresa.')
+        parser.add_argument('--saida', help='Arquivo de destino, padrão: saída padrão.')
+        parser.add_argument('--gzip', action='store_true', help='Compacta a saída com gzip.')
+
+    def handle(self, *args, **options):
+        estoques = exportacao.estoques(empresa_id=options['empresa'])
+        blocos = exportacao.linhas_csv(exportacao.CABECALHO_ESTOQUE, estoques)
+        exportacao.grava(blocos, options['saida'], options['gzip'])
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from controle_estoque.core import exportacao
+
+
+class Command(BaseCommand):
+    help = 'Exporta os movimentos de estoque em CSV, opcionalmente compactado com gzip.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', help='UUID da empresa.')
+        parser.add_argument('--de', help='Data inicial no formato AAAA-MM-DD.')
+        parser.add_argument('--ate', help='Data final no formato AAAA-MM-DD.')
+        parser.add_argument('--saida', help='Arquivo de destino, padrão: saída padrão.')
+        parser.add_argument('--gzip', action='store_true', help='Compacta a saída com gzip.')
+
+    def handle(self, *args, **options):
+        try:
+            data_inicial = date.fromisoformat(options['de']) if options['de'] else None
+            data_final = date.fromisoformat(options['ate']) if options['ate'] else None
+        except ValueError:
+            raise CommandError('Data inválida, utilize o formato AAAA-MM-DD.')
+
+        movimentos = exportacao.movimentos(
+            empresa_id=options['empresa'], data_inicial=data_inicial, data_final=data_final
+        )
+        blocos = exportacao.linhas_csv(exportacao.CABECALHO_MOVIMENTOS, movimentos)
+        exportacao.grava(blocos, options['saida'], options['gzip'])
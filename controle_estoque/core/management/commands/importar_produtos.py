@@ -0,0 +1,29 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from controle_estoque.core import importacao
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa produtos de um arquivo CSV com as colunas nome, unidade_medida '
+        '(sigla ou nome) e marca.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV.')
+        parser.add_argument('--delimitador', default=',', help='Delimitador de colunas.')
+
+    def handle(self, *args, **options):
+        with open(options['arquivo'], newline='', encoding='utf-8-sig') as arquivo:
+            resultado = importacao.importa_produtos(
+                csv.DictReader(arquivo, delimiter=options['delimitador'])
+            )
+
+        for invalido in resultado['invalidos']:
+            self.stderr.write(f"Linha {invalido['linha']}: {invalido['erro']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['criados']} produtos criados, {resultado['ignorados']} já existentes, "
+            f"{len(resultado['invalidos'])} linhas inválidas."
+        ))
@@ -0,0 +1,83 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+SCRIPT = '''
+import json
+import time
+
+inicio = time.perf_counter()
+import django
+django.setup()
+tempos = {'django': time.perf_counter() - inicio}
+
+inicio = time.perf_counter()
+from controle_estoque.core.api import api
+tempos['api'] = time.perf_counter() - inicio
+
+inicio = time.perf_counter()
+api.get_openapi_schema()
+tempos['openapi'] = time.perf_counter() - inicio
+print(json.dumps(tempos))
+'''
+
+
+def modulos_lentos(saida, quantidade):
+    modulos = []
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or '|' not in linha:
+            continue
+        _, acumulado, nome = linha[len('import time:'):].split('|')
+        if acumulado.strip().isdigit():
+            modulos.append((int(acumulado), nome.strip()))
+    return sorted(modulos, reverse=True)[:quantidade]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede, em processos novos, o custo de inicialização de um worker: configuração do '
+        'Django, importação de controle_estoque.core.api e geração do esquema OpenAPI.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=5)
+        parser.add_argument(
+            '--limite', type=float, default=2.0,
+            help='Tempo máximo, em segundos, da mediana de importação da API.'
+        )
+        parser.add_argument(
+            '--modulos', type=int, default=0, help='Lista os N módulos de importação mais lenta.'
+        )
+
+    def handle(self, *args, **options):
+        medicoes = []
+        saida_importacao = ''
+        for _ in range(options['repeticoes']):
+            processo = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', SCRIPT],
+                capture_output=True, text=True,
+            )
+            if processo.returncode:
+                raise CommandError(f'Falha ao inicializar a aplicação:\n{processo.stderr[-2000:]}')
+            medicoes.append(json.loads(processo.stdout.strip().splitlines()[-1]))
+            saida_importacao = processo.stderr
+
+        medianas = {etapa: statistics.median(m[etapa] for m in medicoes) for etapa in medicoes[0]}
+        for etapa, mediana in medianas.items():
+            minimo = min(m[etapa] for m in medicoes)
+            self.stdout.write(f'{etapa}: mediana {mediana * 1000:.0f}ms, mínimo {minimo * 1000:.0f}ms')
+
+        for acumulado, nome in modulos_lentos(saida_importacao, options['modulos']):
+            self.stdout.write(f'  {acumulado / 1000:8.1f}ms  {nome}')
+
+        if medianas['api'] > options['limite']:
+            raise CommandError(
+                f'A importação da API levou {medianas["api"]:.2f}s, acima do limite de '
+                f'{options["limite"]:.2f}s.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Importação da API dentro do limite de {options["limite"]:.2f}s.'
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from controle_estoque.core import tarefas
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa continuamente as tarefas em segundo plano pendentes '
+        '(recálculo de saldos, resumos e notificações).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--lote', type=int, default=100, help='Tarefas reservadas por ciclo.')
+        parser.add_argument(
+            '--intervalo', type=float, default=1, help='Espera em segundos quando a fila está vazia.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Processando tarefas com {options['threads']} threads.")
+        try:
+            while True:
+                resultados = tarefas.processa(options['lote'], options['threads'])
+                if resultados:
+                    falhas = len(resultados) - sum(resultados)
+                    self.stdout.write(f'{len(resultados)} tarefas executadas, {falhas} falhas.')
+                else:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Encerrado.')
@@ -0,0 +1,109 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Case, When
+from django.utils import timezone
+
+from controle_estoque.core.models import Armazem, Estoque, EstoqueResumo, Movimento
+
+TAMANHO_LOTE = 1000
+
+
+def inicializa_processo():
+    django.setup()
+
+
+def divergencias_armazem(armazem_id):
+    saldos = Movimento.objects.filter(estoque__armazem=armazem_id).saldos()
+    gravados = Estoque.objects.filter(armazem=armazem_id).values_list('uuid', 'quantidade')
+    return armazem_id, [
+        (estoque, quantidade, saldos.get(estoque, 0))
+        for estoque, quantidade in gravados
+        if quantidade != saldos.get(estoque, 0)
+    ]
+
+
+def divergencias_em_processo(armazem_id):
+    try:
+        return divergencias_armazem(armazem_id)
+    finally:
+        connections.close_all()
+
+
+@transaction.atomic
+def corrige(estoques):
+    list(Estoque.objects.select_for_update().filter(uuid__in=estoques).values_list('uuid'))
+    saldos = Movimento.objects.filter(estoque__in=estoques).saldos()
+    gravados = Estoque.objects.filter(uuid__in=estoques).values_list('uuid', 'quantidade')
+    corrigidos = {e: saldos.get(e, 0) for e, q in gravados if q != saldos.get(e, 0)}
+    if corrigidos:
+        Estoque.objects.filter(uuid__in=corrigidos).update(
+            quantidade=Case(*(When(uuid=e, then=s) for e, s in corrigidos.items())),
+            atualizado_em=timezone.now(),
+        )
+        EstoqueResumo.sincroniza(Estoque.objects.filter(uuid__in=corrigidos), publica=True)
+    return len(corrigidos)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara o saldo gravado de cada item de estoque com a soma dos seus movimentos, '
+        'processando os armazéns em paralelo, e opcionalmente corrige as divergências.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', help='UUID da empresa, padrão: todas.')
+        parser.add_argument(
+            '--processos', type=int, default=os.cpu_count(),
+            help='Processos paralelos; 1 confere os armazéns no próprio processo.'
+        )
+        parser.add_argument(
+            '--corrigir', action='store_true', help='Grava o saldo do razão nos itens divergentes.'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        armazens = Armazem.objects.order_by('uuid')
+        if options['empresa']:
+            armazens = armazens.filter(empresa=options['empresa'])
+        armazens = dict(armazens.values_list('uuid', 'nome'))
+
+        divergencias = []
+        for armazem, itens in self.confere(armazens, options['processos']):
+            for estoque, gravado, razao in itens:
+                self.stdout.write(
+                    f'{armazens[armazem]} / {estoque}: gravado={gravado} razão={razao} '
+                    f'diferença={gravado - razao}'
+                )
+            divergencias.extend(estoque for estoque, _, _ in itens)
+
+        decorrido = time.monotonic() - inicio
+        if not divergencias:
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(armazens)} armazéns conferidos em {decorrido:.1f}s, nenhuma divergência.'
+            ))
+            return
+
+        self.stdout.write(self.style.WARNING(
+            f'{len(divergencias)} itens divergentes em {len(armazens)} armazéns ({decorrido:.1f}s).'
+        ))
+        if options['corrigir']:
+            corrigidos = sum(
+                corrige(divergencias[i:i + TAMANHO_LOTE])
+                for i in range(0, len(divergencias), TAMANHO_LOTE)
+            )
+            self.stdout.write(self.style.SUCCESS(f'{corrigidos} itens corrigidos.'))
+
+    def confere(self, armazens, processos):
+        if processos <= 1:
+            yield from map(divergencias_armazem, armazens)
+            return
+        connections.close_all()
+        with ProcessPoolExecutor(processos, initializer=inicializa_processo) as executor:
+            futuros = [executor.submit(divergencias_em_processo, a) for a in armazens]
+            for futuro in as_completed(futuros):
+                yield futuro.result()
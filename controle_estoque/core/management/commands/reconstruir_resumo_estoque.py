@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from controle_estoque.core.models import Estoque, EstoqueResumo
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói a tabela de leitura EstoqueResumo a partir dos itens de estoque. Necessário '
+        'após alterações em lote que não passam por Estoque.save, como QuerySet.update() em '
+        'itens, produtos, armazéns, marcas ou unidades, ou SQL direto.'
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        EstoqueResumo.objects.all().delete()
+        EstoqueResumo.sincroniza(Estoque.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'{EstoqueResumo.objects.count()} itens de estoque resumidos.'
+        ))
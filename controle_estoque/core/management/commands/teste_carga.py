@@ -0,0 +1,234 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from controle_estoque.core import limites, models
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0
+    return valores[min(int(len(valores) * p), len(valores) - 1)]
+
+
+class Cliente:
+    def __init__(self, url, token=None, isencao=''):
+        self.url = url.rstrip('/')
+        self.token = token
+        self.isencao = isencao
+
+    def requisita(self, metodo, caminho, corpo=None):
+        cabecalhos = {'Content-Type': 'application/json'}
+        if self.token:
+            cabecalhos['Authorization'] = f'Bearer {self.token}'
+        if self.isencao:
+            cabecalhos[limites.CABECALHO_ISENCAO] = self.isencao
+        dados = json.dumps(corpo).encode() if corpo is not None else None
+        requisicao = Request(f'{self.url}{caminho}', data=dados, headers=cabecalhos, method=metodo)
+        try:
+            with urlopen(requisicao, timeout=30) as resposta:
+                return resposta.status, resposta.read()
+        except HTTPError as erro:
+            return erro.code, erro.read()
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera carga concorrente contra um servidor local: cria dados de teste, lança '
+        'movimentos e consulta listas, e informa vazão, latências e consistência dos saldos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000/api')
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--duracao', type=float, default=30, help='Duração em segundos.')
+        parser.add_argument('--armazens', type=int, default=2)
+        parser.add_argument('--produtos', type=int, default=50)
+        parser.add_argument(
+            '--quente', type=float, default=0.3,
+            help='Fração dos movimentos direcionada a um único item (SKU quente).'
+        )
+        parser.add_argument(
+            '--escrita', type=float, default=0.5, help='Fração de requisições de movimento.'
+        )
+        parser.add_argument('--semente', type=int, default=None)
+        parser.add_argument(
+            '--isencao', default=settings.LIMITES_TOKEN_ISENCAO,
+            help='Token enviado em X-Limite-Isencao para ignorar os limites de requisições.'
+        )
+        parser.add_argument(
+            '--manter-dados', action='store_true',
+            help='Não remove os dados de teste criados ao final da execução.'
+        )
+
+    def handle(self, *args, **options):
+        usuario, senha, estoques = self.cria_dados(options)
+        self.stdout.write(f'Usuário de teste: {usuario.username}, {len(estoques)} itens de estoque.')
+        try:
+            self.executa_carga(usuario, senha, estoques, options)
+        finally:
+            if options['manter_dados']:
+                self.stdout.write(f'Dados de teste mantidos (usuário {usuario.username}).')
+            else:
+                self.remove_dados(usuario, estoques)
+                self.stdout.write('Dados de teste removidos.')
+
+    def executa_carga(self, usuario, senha, estoques, options):
+        aleatorio = random.Random(options['semente'])
+        if not options['isencao']:
+            self.stdout.write(self.style.WARNING(
+                'Sem token de isenção: as requisições estão sujeitas aos limites de requisições.'
+            ))
+        cliente = Cliente(options['url'], isencao=options['isencao'])
+        status, corpo = cliente.requisita(
+            'POST', '/token/pair', {'username': usuario.username, 'password': senha}
+        )
+        if status != 200:
+            raise CommandError(f'Falha na autenticação ({status}): {corpo[:200]!r}')
+        cliente.token = json.loads(corpo)['access']
+
+        latencias = defaultdict(list)
+        respostas = defaultdict(lambda: defaultdict(int))
+        saldos_esperados = {e.uuid: e.quantidade for e in estoques}
+        lock = threading.Lock()
+        quente = estoques[0]
+        fim = time.monotonic() + options['duracao']
+
+        def executa(semente):
+            gerador = random.Random(semente)
+            while time.monotonic() < fim:
+                if gerador.random() < options['escrita']:
+                    estoque = quente if gerador.random() < options['quente'] else gerador.choice(estoques)
+                    tipo = gerador.choice([models.Movimento.ENTRADA, models.Movimento.SAIDA])
+                    quantidade = Decimal(gerador.randint(1, 5))
+                    corpo = {'tipo': tipo, 'quantidade': str(quantidade)}
+                    if tipo == models.Movimento.ENTRADA:
+                        corpo['preco'] = '10.00'
+                    operacao = 'movimento_quente' if estoque is quente else 'movimento'
+                    caminho = f'/{estoque.uuid}/movimento/novo'
+                    metodo = 'POST'
+                else:
+                    operacao, caminho = gerador.choice([
+                        ('itens_estoque', '/itens_estoque'),
+                        ('produtos', '/produtos'),
+                        ('armazens', '/armazens'),
+                    ])
+                    metodo, corpo = 'GET', None
+
+                inicio = time.perf_counter()
+                try:
+                    status, _ = cliente.requisita(metodo, caminho, corpo)
+                except URLError:
+                    status = 'conexao'
+                duracao = time.perf_counter() - inicio
+
+                with lock:
+                    latencias[operacao].append(duracao)
+                    respostas[operacao][status] += 1
+                    if metodo == 'POST' and status == 200:
+                        sinal = 1 if tipo == models.Movimento.ENTRADA else -1
+                        saldos_esperados[estoque.uuid] += sinal * quantidade
+
+        inicio = time.monotonic()
+        with ThreadPoolExecutor(options['threads']) as executor:
+            list(executor.map(executa, [aleatorio.random() for _ in range(options['threads'])]))
+        decorrido = time.monotonic() - inicio
+
+        self.relatorio(latencias, respostas, decorrido)
+        self.verifica_saldos(estoques, saldos_esperados)
+
+    @transaction.atomic
+    def cria_dados(self, options):
+        sufixo = uuid.uuid4().hex[:8]
+        senha = uuid.uuid4().hex
+        usuario = User.objects.create_user(f'carga_{sufixo}', password=senha)
+        empresa = models.Empresa.objects.create(nome=f'Carga {sufixo}', cnpj='00000000000000')
+        tipo, _ = models.TipoPerfil.objects.get_or_create(sigla='ADM', defaults={'nome': 'Administrador'})
+        models.Perfil.objects.create(usuario=usuario, empresa=empresa, tipo=tipo)
+        unidade, _ = models.UnidadeMedida.objects.get_or_create(sigla='UN', defaults={'nome': 'Unidade'})
+
+        estoques = []
+        produtos = [
+            models.Produto.objects.create(nome=f'Carga {sufixo} {p}', unidade_medida=unidade)
+            for p in range(options['produtos'])
+        ]
+        for a in range(options['armazens']):
+            armazem = models.Armazem.objects.create(nome=f'Carga {a}', empresa=empresa)
+            for produto in produtos:
+                estoque = models.Estoque(
+                    armazem=armazem, produto=produto, quantidade=Decimal(1000), preco=Decimal(10)
+                )
+                estoque.save()
+                estoques.append(estoque)
+        return usuario, senha, estoques
+
+    @transaction.atomic
+    def remove_dados(self, usuario, estoques):
+        uuids = [e.uuid for e in estoques]
+        produtos = {e.produto_id for e in estoques}
+        empresas = list(models.Perfil.objects.filter(usuario=usuario).values_list('empresa', flat=True))
+        models.Tarefa.objects.filter(chave__in=[f'estoque:{u}' for u in uuids]).delete()
+        models.Reserva.objects.filter(estoque__in=uuids).delete()
+        models.Movimento.objects.filter(estoque__in=uuids).delete()
+        models.MovimentoArquivado.objects.filter(estoque__in=uuids).delete()
+        models.Estoque.objects.filter(uuid__in=uuids).delete()
+        models.Armazem.objects.filter(empresa__in=empresas).delete()
+        models.Produto.objects.filter(uuid__in=produtos).delete()
+        models.Exclusao.objects.filter(
+            modelo=models.Exclusao.PRODUTO, objeto_uuid__in=produtos
+        ).delete()
+        models.Perfil.objects.filter(usuario=usuario).delete()
+        models.Empresa.objects.filter(uuid__in=empresas).delete()
+        usuario.delete()
+
+    def relatorio(self, latencias, respostas, decorrido):
+        total = sum(len(v) for v in latencias.values())
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{total} requisições em {decorrido:.1f}s ({total / decorrido:.1f} req/s)'
+        ))
+        for operacao in sorted(latencias):
+            valores = sorted(latencias[operacao])
+            erros = sum(n for status, n in respostas[operacao].items() if status != 200)
+            self.stdout.write(
+                f'{operacao:<18} n={len(valores):<7} {len(valores) / decorrido:8.1f} req/s  '
+                f'p50={percentil(valores, 0.50) * 1000:7.1f}ms  '
+                f'p95={percentil(valores, 0.95) * 1000:7.1f}ms  '
+                f'p99={percentil(valores, 0.99) * 1000:7.1f}ms  '
+                f'erros={erros / len(valores):.1%} {dict(respostas[operacao])}'
+            )
+
+    def verifica_saldos(self, estoques, saldos_esperados):
+        uuids = [e.uuid for e in estoques]
+        saldos_razao = models.Movimento.objects.filter(estoque__in=uuids).saldos()
+        saldos_gravados = dict(
+            models.Estoque.objects.filter(uuid__in=uuids).values_list('uuid', 'quantidade')
+        )
+        divergentes = [
+            u for u in uuids
+            if not (saldos_gravados[u] == saldos_razao.get(u, 0) == saldos_esperados[u])
+        ]
+        negativos = [u for u in uuids if saldos_gravados[u] < 0]
+
+        if divergentes or negativos:
+            for u in divergentes:
+                self.stdout.write(self.style.ERROR(
+                    f'{u}: gravado={saldos_gravados[u]} razão={saldos_razao.get(u, 0)} '
+                    f'esperado={saldos_esperados[u]}'
+                ))
+            self.stdout.write(self.style.ERROR(
+                f'{len(divergentes)} itens com saldo divergente, {len(negativos)} com saldo negativo.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Saldos consistentes nos {len(uuids)} itens.'))
@@ -0,0 +1,60 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+    multiprocess
+)
+
+duracao_requisicao = Histogram(
+    'estoque_requisicao_duracao_segundos',
+    'Duração das requisições da API por rota.',
+    ['rota', 'metodo', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+consultas_requisicao = Histogram(
+    'estoque_requisicao_consultas_db',
+    'Quantidade de consultas ao banco por requisição.',
+    ['rota'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+consultas_db = Counter(
+    'estoque_consultas_db', 'Consultas executadas no banco por rota.', ['rota']
+)
+cache_acessos = Counter(
+    'estoque_cache_acessos', 'Acessos a caches por resultado (acerto ou falha).', ['cache', 'resultado']
+)
+movimentos = Counter(
+    'estoque_movimentos', 'Movimentos de estoque lançados por tipo.', ['tipo']
+)
+saidas_rejeitadas = Counter(
+    'estoque_saidas_rejeitadas', 'Saídas rejeitadas por quantidade superior ao estocado.'
+)
+itens_criados = Counter(
+    'estoque_itens_criados', 'Itens de estoque criados.'
+)
+requisicoes_limitadas = Counter(
+    'estoque_requisicoes_limitadas',
+    'Requisições rejeitadas por limite de taxa, por escopo e classe de rota.',
+    ['escopo', 'classe']
+)
+
+
+def registra_requisicao(request, response, duracao, consultas):
+    match = getattr(request, 'resolver_match', None)
+    rota = match.route if match is not None else 'desconhecida'
+    duracao_requisicao.labels(rota, request.method, str(response.status_code)).observe(duracao)
+    consultas_requisicao.labels(rota).observe(consultas)
+    consultas_db.labels(rota).inc(consultas)
+
+
+def registra_cache(cache, acerto):
+    cache_acessos.labels(cache, 'acerto' if acerto else 'falha').inc()
+
+
+def exporta():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
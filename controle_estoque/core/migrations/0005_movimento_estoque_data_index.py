@@ -0,0 +1,17 @@
+# Generated by Django 5.0.3 on 2026-10-19 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_marca_nome'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimento',
+            index=models.Index(fields=['estoque', '-criado_em'], name='movimento_estoque_data'),
+        ),
+    ]
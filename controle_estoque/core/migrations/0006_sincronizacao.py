@@ -0,0 +1,50 @@
+# Generated by Django 5.0.3 on 2026-10-19 03:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_movimento_estoque_data_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Exclusao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ativo', models.BooleanField(default=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('modelo', models.CharField(choices=[('armazem', 'Armazém'), ('produto', 'Produto'), ('estoque', 'Estoque')], max_length=20)),
+                ('objeto_uuid', models.UUIDField()),
+            ],
+            options={
+                'verbose_name': 'Exclusão',
+                'verbose_name_plural': 'Exclusões',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='armazem',
+            index=models.Index(fields=['atualizado_em'], name='armazem_atualizado_em'),
+        ),
+        migrations.AddIndex(
+            model_name='estoque',
+            index=models.Index(fields=['atualizado_em'], name='estoque_atualizado_em'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['atualizado_em'], name='produto_atualizado_em'),
+        ),
+        migrations.AddField(
+            model_name='exclusao',
+            name='empresa',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.empresa'),
+        ),
+        migrations.AddIndex(
+            model_name='exclusao',
+            index=models.Index(fields=['modelo', 'criado_em'], name='exclusao_modelo_data'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.3 on 2026-10-19 03:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_sincronizacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimentoArquivado',
+            fields=[
+                ('uuid', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('E', 'Entrada'), ('S', 'Saída')], max_length=1)),
+                ('quantidade', models.DecimalField(decimal_places=3, max_digits=14)),
+                ('preco', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True, verbose_name='Preço')),
+                ('ativo', models.BooleanField(default=True)),
+                ('criado_em', models.DateTimeField()),
+                ('atualizado_em', models.DateTimeField()),
+                ('arquivado_em', models.DateTimeField(auto_now_add=True)),
+                ('estoque', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimentos_arquivados', to='core.estoque')),
+                ('responsavel', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='core.perfil')),
+            ],
+            options={
+                'verbose_name': 'Movimento Arquivado',
+                'verbose_name_plural': 'Movimentos Arquivados',
+                'indexes': [models.Index(fields=['estoque', '-criado_em'], name='arquivado_estoque_data')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from controle_estoque.core import particoes
+
+
+def particiona(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        particoes.particiona(cursor)
+
+
+def desfaz_particionamento(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        particoes.desfaz_particionamento(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_movimento_arquivado'),
+    ]
+
+    operations = [
+        migrations.RunPython(particiona, desfaz_particionamento),
+    ]
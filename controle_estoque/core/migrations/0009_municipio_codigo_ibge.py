@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-19 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_particiona_movimento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='municipio',
+            name='codigo_ibge',
+            field=models.PositiveIntegerField(blank=True, null=True, unique=True, verbose_name='Código IBGE'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.0.3 on 2026-10-19 03:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CAMPOS = {
+    'empresa_id': 'armazem__empresa_id',
+    'armazem_id': 'armazem_id',
+    'armazem_nome': 'armazem__nome',
+    'produto_id': 'produto_id',
+    'produto_nome': 'produto__nome',
+    'produto_unidade_medida': 'produto__unidade_medida__sigla',
+    'produto_marca': 'produto__marca__nome',
+    'quantidade': 'quantidade',
+    'preco': 'preco',
+    'atualizado_em': 'atualizado_em',
+}
+
+
+def popula_resumo(apps, schema_editor):
+    Estoque = apps.get_model('core', 'Estoque')
+    EstoqueResumo = apps.get_model('core', 'EstoqueResumo')
+    linhas = Estoque.objects.values('uuid', *CAMPOS.values()).iterator(chunk_size=1000)
+    lote = []
+    for linha in linhas:
+        resumo = EstoqueResumo(
+            estoque_id=linha['uuid'], **{campo: linha[origem] for campo, origem in CAMPOS.items()}
+        )
+        resumo.produto_marca = resumo.produto_marca or ''
+        lote.append(resumo)
+        if len(lote) == 1000:
+            EstoqueResumo.objects.bulk_create(lote)
+            lote = []
+    EstoqueResumo.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_municipio_codigo_ibge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstoqueResumo',
+            fields=[
+                ('estoque', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumo', serialize=False, to='core.estoque')),
+                ('armazem_nome', models.CharField(blank=True, max_length=50)),
+                ('produto_nome', models.CharField(max_length=255)),
+                ('produto_unidade_medida', models.CharField(max_length=3)),
+                ('produto_marca', models.CharField(blank=True, max_length=255)),
+                ('quantidade', models.DecimalField(decimal_places=3, max_digits=14)),
+                ('preco', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Preço')),
+                ('atualizado_em', models.DateTimeField()),
+                ('armazem', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.armazem')),
+                ('empresa', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.empresa')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.produto')),
+            ],
+            options={
+                'verbose_name': 'Resumo de Estoque',
+                'verbose_name_plural': 'Resumos de Estoque',
+                'indexes': [models.Index(fields=['empresa', 'produto_nome'], include=('armazem', 'armazem_nome', 'produto', 'produto_unidade_medida', 'produto_marca', 'quantidade', 'preco'), name='resumo_empresa_produto'), models.Index(fields=['armazem', 'produto_nome'], name='resumo_armazem_produto')],
+            },
+        ),
+        migrations.RunPython(popula_resumo, migrations.RunPython.noop),
+    ]
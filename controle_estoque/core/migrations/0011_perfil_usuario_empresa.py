@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-19 03:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_estoque_resumo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='perfil',
+            index=models.Index(fields=['usuario', 'empresa'], name='perfil_usuario_empresa'),
+        ),
+    ]
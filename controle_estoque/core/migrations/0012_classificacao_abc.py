@@ -0,0 +1,40 @@
+# Generated by Django 5.0.3 on 2026-10-19 03:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_perfil_usuario_empresa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassificacaoABC',
+            fields=[
+                ('empresa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='classificacao_abc', serialize=False, to='core.empresa')),
+                ('dias', models.PositiveSmallIntegerField()),
+                ('calculada_em', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Classificação ABC',
+                'verbose_name_plural': 'Classificações ABC',
+            },
+        ),
+        migrations.AddField(
+            model_name='estoque',
+            name='classe',
+            field=models.CharField(blank=True, choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=1, verbose_name='Classe ABC'),
+        ),
+        migrations.AddField(
+            model_name='estoqueresumo',
+            name='classe',
+            field=models.CharField(blank=True, choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=1),
+        ),
+        migrations.AddIndex(
+            model_name='estoqueresumo',
+            index=models.Index(fields=['empresa', 'classe', 'produto_nome'], name='resumo_empresa_classe'),
+        ),
+    ]
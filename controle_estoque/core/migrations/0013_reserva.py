@@ -0,0 +1,38 @@
+# Generated by Django 5.0.3 on 2026-10-19 03:55
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_classificacao_abc'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estoque',
+            name='reservado',
+            field=models.DecimalField(decimal_places=3, default=0, editable=False, max_digits=14),
+        ),
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('ativo', models.BooleanField(default=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('quantidade', models.DecimalField(decimal_places=3, max_digits=14)),
+                ('situacao', models.CharField(choices=[('A', 'Ativa'), ('C', 'Confirmada'), ('L', 'Liberada'), ('E', 'Expirada')], default='A', max_length=1, verbose_name='Situação')),
+                ('expira_em', models.DateTimeField()),
+                ('estoque', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservas', to='core.estoque')),
+                ('movimento', models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='reserva', to='core.movimento')),
+                ('responsavel', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='core.perfil')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('situacao', 'A')), fields=['expira_em'], name='reserva_ativa_expira_em'), models.Index(fields=['estoque', 'situacao'], name='reserva_estoque_situacao')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.3 on 2026-10-19 03:57
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_reserva'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarefa',
+            fields=[
+                ('ativo', models.BooleanField(default=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nome', models.CharField(max_length=100)),
+                ('chave', models.CharField(blank=True, max_length=255)),
+                ('argumentos', models.JSONField(default=dict)),
+                ('situacao', models.CharField(choices=[('P', 'Pendente'), ('E', 'Executando'), ('F', 'Falha')], default='P', max_length=1, verbose_name='Situação')),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('max_tentativas', models.PositiveSmallIntegerField(default=5)),
+                ('executar_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('iniciada_em', models.DateTimeField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('situacao', 'P')), fields=['executar_em'], name='tarefa_pendente_executar_em')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tarefa',
+            constraint=models.UniqueConstraint(condition=models.Q(('situacao', 'P'), models.Q(('chave', ''), _negated=True)), fields=('chave',), name='tarefa_pendente_unica'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.3 on 2026-10-19 04:04
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+
+def unifica_duplicados(apps, schema_editor):
+    Estoque = apps.get_model('core', 'Estoque')
+    EstoqueResumo = apps.get_model('core', 'EstoqueResumo')
+    Exclusao = apps.get_model('core', 'Exclusao')
+    relacionados = [
+        apps.get_model('core', modelo) for modelo in ('Movimento', 'MovimentoArquivado', 'Reserva')
+    ]
+    duplicados = Estoque.objects.order_by().values('produto', 'armazem').annotate(
+        itens=Count('uuid')
+    ).filter(itens__gt=1)
+    for chave in duplicados:
+        itens = Estoque.objects.filter(produto=chave['produto'], armazem=chave['armazem'])
+        mantido = itens.select_related('armazem').order_by('criado_em', 'uuid').first()
+        excedentes = list(itens.exclude(pk=mantido.pk).values_list('uuid', flat=True))
+        totais = itens.aggregate(quantidade=Sum('quantidade'), reservado=Sum('reservado'))
+        for modelo in relacionados:
+            modelo.objects.filter(estoque__in=excedentes).update(estoque=mantido)
+        agora = timezone.now()
+        Estoque.objects.filter(pk=mantido.pk).update(atualizado_em=agora, **totais)
+        EstoqueResumo.objects.filter(estoque=mantido).update(
+            quantidade=totais['quantidade'], atualizado_em=agora
+        )
+        Exclusao.objects.bulk_create([
+            Exclusao(modelo='estoque', objeto_uuid=e, empresa_id=mantido.armazem.empresa_id)
+            for e in excedentes
+        ])
+        Estoque.objects.filter(pk__in=excedentes).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_tarefa'),
+    ]
+
+    operations = [
+        migrations.RunPython(unifica_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='estoque',
+            constraint=models.UniqueConstraint(fields=('produto', 'armazem'), name='estoque_produto_armazem'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.3 on 2026-10-19 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_estoque_produto_armazem'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='movimento',
+            name='movimento_estoque_data',
+        ),
+        migrations.AddIndex(
+            model_name='movimento',
+            index=models.Index(fields=['estoque', 'atualizado_em'], name='movimento_estoque_atualizado'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-19 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_movimento_estoque_atualizado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimento',
+            name='consolidado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
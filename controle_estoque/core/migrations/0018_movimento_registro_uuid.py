@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from controle_estoque.core import particoes
+
+
+def cria_registro_uuid(apps, schema_editor):
+    if not particoes.particionada(schema_editor.connection):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        particoes.cria_registro_uuid(cursor)
+
+
+def remove_registro_uuid(apps, schema_editor):
+    if not particoes.particionada(schema_editor.connection):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        particoes.remove_registro_uuid(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_movimento_consolidado'),
+    ]
+
+    operations = [
+        migrations.RunPython(cria_registro_uuid, remove_registro_uuid),
+    ]
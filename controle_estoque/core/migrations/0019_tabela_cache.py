@@ -0,0 +1,17 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def cria_tabela_cache(apps, schema_editor):
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_movimento_registro_uuid'),
+    ]
+
+    operations = [
+        migrations.RunPython(cria_tabela_cache, migrations.RunPython.noop),
+    ]
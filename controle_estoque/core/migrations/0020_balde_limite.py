@@ -0,0 +1,24 @@
+# Generated by Django 5.0.3 on 2026-10-19 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_tabela_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BaldeLimite',
+            fields=[
+                ('chave', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('capacidade', models.FloatField()),
+                ('reposicao', models.FloatField()),
+                ('fichas', models.FloatField()),
+                ('instante', models.FloatField()),
+                ('permitido', models.BooleanField(default=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-19 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_balde_limite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classificacaoabc',
+            name='valores',
+            field=models.JSONField(editable=False, null=True),
+        ),
+    ]
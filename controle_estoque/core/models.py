@@ -1,9 +1,16 @@
 import re
 import uuid
 
-from django.db import models
-from django.db.models import F, Q, Sum, Value
+from django.db import models, transaction
+from django.db.models import Exists, F, OuterRef, Q, Sum, Value
 from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+
+from controle_estoque.core import metricas, referencias, tarefas
+from controle_estoque.core.eventos import evento_estoque, evento_resumo, publica_apos_commit
+
+movimento_registrado = Signal()
 
 
 class ModeloBase(models.Model):
@@ -15,6 +22,25 @@ class ModeloBase(models.Model):
         abstract = True
 
 
+class EscopoEmpresaQuerySet(models.QuerySet):
+    campo_empresa = 'empresa'
+
+    def para_usuario(self, usuario):
+        if usuario.is_superuser:
+            return self
+        return self.filter(Exists(
+            Perfil.objects.filter(usuario=usuario, empresa=OuterRef(self.campo_empresa))
+        ))
+
+
+class EmpresaQuerySet(EscopoEmpresaQuerySet):
+    campo_empresa = 'pk'
+
+
+class EstoqueQuerySet(EscopoEmpresaQuerySet):
+    campo_empresa = 'armazem__empresa'
+
+
 class TipoPerfil(ModeloBase):
     nome = models.CharField(max_length=50)
     sigla = models.CharField(max_length=3)
@@ -32,6 +58,8 @@ class Empresa(ModeloBase):
     nome = models.CharField(max_length=255)
     cnpj = models.CharField(max_length=14)
 
+    objects = EmpresaQuerySet.as_manager()
+
     @property
     def cnpj_formatado(self):
         cnpj_formatado = re.sub(
@@ -51,11 +79,16 @@ class Perfil(ModeloBase):
     empresa = models.ForeignKey('core.Empresa', on_delete=models.PROTECT)
     tipo = models.ForeignKey('core.TipoPerfil', on_delete=models.PROTECT)
 
+    objects = EscopoEmpresaQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.empresa.nome} - {self.usuario.username} - {self.tipo.nome}'
 
     class Meta:
         verbose_name_plural = 'Perfis'
+        indexes = [
+            models.Index(fields=['usuario', 'empresa'], name='perfil_usuario_empresa'),
+        ]
 
 
 class Municipio(ModeloBase):
@@ -89,12 +122,22 @@ class Municipio(ModeloBase):
         ('TO', 'Tocantins'),
     )
 
+    codigo_ibge = models.PositiveIntegerField('Código IBGE', unique=True, null=True, blank=True)
     nome = models.CharField(max_length=255)
     uf = models.CharField(max_length=2, choices=UFS)
 
     def __str__(self):
         return f'{self.nome}/{self.uf}'
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        referencias.invalida('municipios')
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        referencias.invalida('municipios')
+        return resultado
+
 
 class Armazem(ModeloBase):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -108,11 +151,22 @@ class Armazem(ModeloBase):
     )
     cep = models.CharField(max_length=8, blank=True)
 
+    objects = EscopoEmpresaQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.uuid} - {self.empresa.nome} - {self.nome}'
+
+    def save(self, *args, **kwargs):
+        novo_objeto = self._state.adding
+        super().save(*args, **kwargs)
+        if not novo_objeto:
+            EstoqueResumo.sincroniza(Estoque.objects.filter(armazem=self))
     
     class Meta:
         verbose_name_plural = 'Armazéns'
+        indexes = [
+            models.Index(fields=['atualizado_em'], name='armazem_atualizado_em'),
+        ]
 
 
 class UnidadeMedida(ModeloBase):
@@ -121,6 +175,18 @@ class UnidadeMedida(ModeloBase):
 
     def __str__(self):
         return f'{self.nome} ({self.sigla})'
+
+    def save(self, *args, **kwargs):
+        novo_objeto = self._state.adding
+        super().save(*args, **kwargs)
+        referencias.invalida('unidades_de_medida')
+        if not novo_objeto:
+            EstoqueResumo.sincroniza(Estoque.objects.filter(produto__unidade_medida=self))
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        referencias.invalida('unidades_de_medida')
+        return resultado
     
     class Meta:
         verbose_name = 'Unidade de Medida'
@@ -134,6 +200,18 @@ class Marca(ModeloBase):
     def __str__(self):
         return self.nome
 
+    def save(self, *args, **kwargs):
+        novo_objeto = self._state.adding
+        super().save(*args, **kwargs)
+        referencias.invalida('marcas')
+        if not novo_objeto:
+            EstoqueResumo.sincroniza(Estoque.objects.filter(produto__marca=self))
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        referencias.invalida('marcas')
+        return resultado
+
 
 class Produto(ModeloBase):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -143,6 +221,12 @@ class Produto(ModeloBase):
 
     def __str__(self):
         return self.nome
+
+    def save(self, *args, **kwargs):
+        novo_objeto = self._state.adding
+        super().save(*args, **kwargs)
+        if not novo_objeto:
+            EstoqueResumo.sincroniza(Estoque.objects.filter(produto=self))
     
     class Meta:
         constraints = [
@@ -150,22 +234,52 @@ class Produto(ModeloBase):
                 fields=['nome', 'unidade_medida', 'marca'], 
                 name='produto_unico')
         ]
+        indexes = [
+            models.Index(fields=['atualizado_em'], name='produto_atualizado_em'),
+        ]
 
 
 class Estoque(ModeloBase):
+    CLASSE_A = 'A'
+    CLASSE_B = 'B'
+    CLASSE_C = 'C'
+    CLASSES = (
+        (CLASSE_A, 'A'),
+        (CLASSE_B, 'B'),
+        (CLASSE_C, 'C'),
+    )
+
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     armazem = models.ForeignKey('core.Armazem', on_delete=models.PROTECT)
     produto = models.ForeignKey('core.Produto', on_delete=models.PROTECT)
     quantidade = models.DecimalField(max_digits=14, decimal_places=3)
     preco = models.DecimalField('Preço', max_digits=14, decimal_places=2)
+    classe = models.CharField('Classe ABC', max_length=1, choices=CLASSES, blank=True)
+    reservado = models.DecimalField(max_digits=14, decimal_places=3, default=0, editable=False)
+
+    objects = EstoqueQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.uuid} - {self.armazem.nome} - {self.produto.nome}'
     
+    @property
+    def disponivel(self):
+        return self.quantidade - self.reservado
+
     def save(self, *args, **kwargs):
         novo_objeto = self.criado_em is None
+        if not novo_objeto and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'reservado'
+            ]
         super().save(*args, **kwargs)
+        if novo_objeto or not set(kwargs['update_fields']) <= set(EstoqueResumo.CAMPOS_ESTOQUE):
+            EstoqueResumo.sincroniza(Estoque.objects.filter(pk=self.pk), publica=True)
+        else:
+            EstoqueResumo.atualiza(self, kwargs['update_fields'])
         if novo_objeto:
+            transaction.on_commit(metricas.itens_criados.inc)
             self.gera_movimento_inicial()
 
     def gera_movimento_inicial(self):
@@ -175,7 +289,130 @@ class Estoque(ModeloBase):
             quantidade=self.quantidade,
             preco=self.preco
         )
-        movimento.save()
+        movimento.save(atualiza_saldo=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'armazem'], name='estoque_produto_armazem'),
+        ]
+        indexes = [
+            models.Index(fields=['atualizado_em'], name='estoque_atualizado_em'),
+        ]
+
+
+class EstoqueResumo(models.Model):
+    CAMPOS = {
+        'empresa_id': 'armazem__empresa_id',
+        'armazem_id': 'armazem_id',
+        'armazem_nome': 'armazem__nome',
+        'produto_id': 'produto_id',
+        'produto_nome': 'produto__nome',
+        'produto_unidade_medida': 'produto__unidade_medida__sigla',
+        'produto_marca': 'produto__marca__nome',
+        'quantidade': 'quantidade',
+        'preco': 'preco',
+        'classe': 'classe',
+        'atualizado_em': 'atualizado_em',
+    }
+    CAMPOS_ESTOQUE = ('quantidade', 'preco', 'classe', 'reservado', 'atualizado_em')
+
+    estoque = models.OneToOneField(
+        'core.Estoque', on_delete=models.CASCADE, primary_key=True, related_name='resumo'
+    )
+    empresa = models.ForeignKey(
+        'core.Empresa', on_delete=models.CASCADE, related_name='+', db_index=False
+    )
+    armazem = models.ForeignKey(
+        'core.Armazem', on_delete=models.CASCADE, related_name='+', db_index=False
+    )
+    armazem_nome = models.CharField(max_length=50, blank=True)
+    produto = models.ForeignKey('core.Produto', on_delete=models.CASCADE, related_name='+')
+    produto_nome = models.CharField(max_length=255)
+    produto_unidade_medida = models.CharField(max_length=3)
+    produto_marca = models.CharField(max_length=255, blank=True)
+    quantidade = models.DecimalField(max_digits=14, decimal_places=3)
+    preco = models.DecimalField('Preço', max_digits=14, decimal_places=2)
+    classe = models.CharField(max_length=1, choices=Estoque.CLASSES, blank=True)
+    atualizado_em = models.DateTimeField()
+
+    objects = EscopoEmpresaQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.estoque_id} - {self.armazem_nome} - {self.produto_nome}'
+
+    @classmethod
+    def atualiza(cls, estoque, campos):
+        alteracoes = {campo: getattr(estoque, campo) for campo in campos if campo in cls.CAMPOS}
+        if alteracoes:
+            cls.objects.filter(estoque=estoque.pk).update(**alteracoes)
+        if {'quantidade', 'preco'} & set(alteracoes):
+            publica_apos_commit([evento_estoque(estoque)])
+
+    @classmethod
+    def sincroniza(cls, estoques, publica=False):
+        resumos = [
+            cls(
+                estoque_id=linha['uuid'],
+                **{campo: linha[origem] for campo, origem in cls.CAMPOS.items()},
+            )
+            for linha in estoques.order_by().values('uuid', *cls.CAMPOS.values())
+        ]
+        for resumo in resumos:
+            resumo.produto_marca = resumo.produto_marca or ''
+        cls.objects.bulk_create(
+            resumos, batch_size=1000, update_conflicts=True,
+            unique_fields=['estoque'], update_fields=list(cls.CAMPOS)
+        )
+        if publica:
+            publica_apos_commit([evento_resumo(resumo) for resumo in resumos])
+
+    class Meta:
+        verbose_name = 'Resumo de Estoque'
+        verbose_name_plural = 'Resumos de Estoque'
+        indexes = [
+            models.Index(
+                fields=['empresa', 'produto_nome'], name='resumo_empresa_produto',
+                include=[
+                    'armazem', 'armazem_nome', 'produto', 'produto_unidade_medida',
+                    'produto_marca', 'quantidade', 'preco'
+                ]
+            ),
+            models.Index(fields=['armazem', 'produto_nome'], name='resumo_armazem_produto'),
+            models.Index(fields=['empresa', 'classe', 'produto_nome'], name='resumo_empresa_classe'),
+        ]
+
+
+class ClassificacaoABC(models.Model):
+    empresa = models.OneToOneField(
+        'core.Empresa', on_delete=models.CASCADE, primary_key=True, related_name='classificacao_abc'
+    )
+    dias = models.PositiveSmallIntegerField()
+    calculada_em = models.DateTimeField()
+    valores = models.JSONField(null=True, editable=False)
+
+    def __str__(self):
+        return f'{self.empresa_id} - {self.dias} dias - {self.calculada_em:%d/%m/%Y %H:%M}'
+
+    class Meta:
+        verbose_name = 'Classificação ABC'
+        verbose_name_plural = 'Classificações ABC'
+
+
+class MovimentoQuerySet(EscopoEmpresaQuerySet):
+    campo_empresa = 'estoque__armazem__empresa'
+
+    def saldos(self):
+        return dict(
+            self.order_by().values('estoque').annotate(
+                saldo=Coalesce(
+                    Sum('quantidade', filter=Q(tipo=Movimento.ENTRADA)), Value(0),
+                    output_field=models.DecimalField()
+                ) - Coalesce(
+                    Sum('quantidade', filter=Q(tipo=Movimento.SAIDA)), Value(0),
+                    output_field=models.DecimalField()
+                )
+            ).values_list('estoque', 'saldo')
+        )
 
 
 class Movimento(ModeloBase):
@@ -194,22 +431,52 @@ class Movimento(ModeloBase):
     preco = models.DecimalField(
         'Preço', max_digits=14, decimal_places=2, blank=True, null=True
     )
+    consolidado = models.BooleanField(default=False, editable=False)
+
+    objects = MovimentoQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.uuid} - {self.estoque.produto.nome} - {self.get_tipo_display()}: {self.quantidade}'
     
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.atualiza_estoque()
-        if self.preco is not None:
-            self.estoque.preco = self.preco
-            self.estoque.save()
+    def save(self, *args, atualiza_saldo=True, **kwargs):
+        novo_objeto = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not novo_objeto:
+                self.atualiza_estoque(preco=self.preco)
+            elif atualiza_saldo:
+                self.aplica_saldo()
+            tarefas.enfileira(
+                'recalcula_estoque', chave=f'estoque:{self.estoque_id}',
+                estoque_id=str(self.estoque_id)
+            )
+        if novo_objeto:
+            transaction.on_commit(metricas.movimentos.labels(self.tipo).inc)
+        self.publica_alteracao()
 
     def delete(self, *args, **kwargs):
         super().delete(*args, **kwargs)
         self.atualiza_estoque()
+        self.publica_alteracao()
 
-    def atualiza_estoque(self):
+    def publica_alteracao(self):
+        movimento_registrado.send(
+            sender=Movimento, instance=self, empresa_id=self.estoque.armazem.empresa_id
+        )
+
+    def aplica_saldo(self):
+        sinal = 1 if self.tipo == Movimento.ENTRADA else -1
+        alteracoes = {
+            'quantidade': F('quantidade') + sinal * self.quantidade,
+            'atualizado_em': timezone.now(),
+        }
+        if self.preco is not None:
+            alteracoes['preco'] = self.preco
+        Estoque.objects.filter(pk=self.estoque_id).update(**alteracoes)
+        self.estoque.refresh_from_db(fields=['quantidade', 'preco', 'atualizado_em'])
+        EstoqueResumo.atualiza(self.estoque, ['quantidade', 'preco', 'atualizado_em'])
+
+    def atualiza_estoque(self, preco=None):
         quantidade_total = Movimento.objects.filter(
             estoque=self.estoque
         ).aggregate(
@@ -222,4 +489,161 @@ class Movimento(ModeloBase):
             quantidade_total=F('total_entrada') - F('total_saida')
         )['quantidade_total']
         self.estoque.quantidade = quantidade_total
-        self.estoque.save()
+        campos = ['quantidade', 'atualizado_em']
+        if preco is not None:
+            self.estoque.preco = preco
+            campos.append('preco')
+        self.estoque.save(update_fields=campos)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estoque', 'atualizado_em'], name='movimento_estoque_atualizado'),
+        ]
+
+
+class ReservaQuerySet(EscopoEmpresaQuerySet):
+    campo_empresa = 'estoque__armazem__empresa'
+
+
+class Reserva(ModeloBase):
+    ATIVA = 'A'
+    CONFIRMADA = 'C'
+    LIBERADA = 'L'
+    EXPIRADA = 'E'
+    SITUACOES = (
+        (ATIVA, 'Ativa'),
+        (CONFIRMADA, 'Confirmada'),
+        (LIBERADA, 'Liberada'),
+        (EXPIRADA, 'Expirada'),
+    )
+
+    uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    responsavel = models.ForeignKey('core.Perfil', on_delete=models.PROTECT, null=True)
+    estoque = models.ForeignKey('core.Estoque', on_delete=models.PROTECT, related_name='reservas')
+    quantidade = models.DecimalField(max_digits=14, decimal_places=3)
+    situacao = models.CharField('Situação', max_length=1, choices=SITUACOES, default=ATIVA)
+    expira_em = models.DateTimeField()
+    movimento = models.OneToOneField(
+        'core.Movimento', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        related_name='reserva'
+    )
+
+    objects = ReservaQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.uuid} - {self.get_situacao_display()}: {self.quantidade}'
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['expira_em'], name='reserva_ativa_expira_em', condition=Q(situacao='A')
+            ),
+            models.Index(fields=['estoque', 'situacao'], name='reserva_estoque_situacao'),
+        ]
+
+
+class Tarefa(ModeloBase):
+    PENDENTE = 'P'
+    EXECUTANDO = 'E'
+    FALHA = 'F'
+    SITUACOES = (
+        (PENDENTE, 'Pendente'),
+        (EXECUTANDO, 'Executando'),
+        (FALHA, 'Falha'),
+    )
+
+    uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    nome = models.CharField(max_length=100)
+    chave = models.CharField(max_length=255, blank=True)
+    argumentos = models.JSONField(default=dict)
+    situacao = models.CharField('Situação', max_length=1, choices=SITUACOES, default=PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    max_tentativas = models.PositiveSmallIntegerField(default=5)
+    executar_em = models.DateTimeField(default=timezone.now)
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+
+    def __str__(self):
+        return f'{self.nome} {self.chave} - {self.get_situacao_display()}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['chave'], name='tarefa_pendente_unica',
+                condition=Q(situacao='P') & ~Q(chave='')
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['executar_em'], name='tarefa_pendente_executar_em',
+                condition=Q(situacao='P')
+            ),
+        ]
+
+
+class Exclusao(ModeloBase):
+    ARMAZEM = 'armazem'
+    PRODUTO = 'produto'
+    ESTOQUE = 'estoque'
+    MODELOS = (
+        (ARMAZEM, 'Armazém'),
+        (PRODUTO, 'Produto'),
+        (ESTOQUE, 'Estoque'),
+    )
+
+    modelo = models.CharField(max_length=20, choices=MODELOS)
+    objeto_uuid = models.UUIDField()
+    empresa = models.ForeignKey(
+        'core.Empresa', on_delete=models.CASCADE, null=True, blank=True
+    )
+
+    def __str__(self):
+        return f'{self.get_modelo_display()} - {self.objeto_uuid}'
+
+    class Meta:
+        verbose_name = 'Exclusão'
+        verbose_name_plural = 'Exclusões'
+        indexes = [
+            models.Index(fields=['modelo', 'criado_em'], name='exclusao_modelo_data'),
+        ]
+
+
+class MovimentoArquivado(models.Model):
+    uuid = models.UUIDField(primary_key=True, editable=False)
+    responsavel = models.ForeignKey('core.Perfil', on_delete=models.PROTECT, null=True)
+    estoque = models.ForeignKey(
+        'core.Estoque', on_delete=models.PROTECT, related_name='movimentos_arquivados'
+    )
+    tipo = models.CharField(max_length=1, choices=Movimento.TIPOS)
+    quantidade = models.DecimalField(max_digits=14, decimal_places=3)
+    preco = models.DecimalField(
+        'Preço', max_digits=14, decimal_places=2, blank=True, null=True
+    )
+    ativo = models.BooleanField(default=True)
+    criado_em = models.DateTimeField()
+    atualizado_em = models.DateTimeField()
+    arquivado_em = models.DateTimeField(auto_now_add=True)
+
+    objects = MovimentoQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.uuid} - {self.get_tipo_display()}: {self.quantidade}'
+
+    class Meta:
+        verbose_name = 'Movimento Arquivado'
+        verbose_name_plural = 'Movimentos Arquivados'
+        indexes = [
+            models.Index(fields=['estoque', '-criado_em'], name='arquivado_estoque_data'),
+        ]
+
+
+class BaldeLimite(models.Model):
+    chave = models.CharField(max_length=255, primary_key=True)
+    capacidade = models.FloatField()
+    reposicao = models.FloatField()
+    fichas = models.FloatField()
+    instante = models.FloatField()
+    permitido = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f'{self.chave} - {self.fichas:.1f}/{self.capacidade:.0f}'
@@ -0,0 +1,188 @@
+import uuid
+from datetime import datetime
+
+from django.utils import timezone
+
+TABELA = 'core_movimento'
+PARTICAO_PADRAO = f'{TABELA}_padrao'
+REGISTRO_UUID = f'{TABELA}_uuid'
+
+
+def inicio_do_mes(data):
+    return timezone.make_aware(datetime(data.year, data.month, 1))
+
+
+def proximo_mes(data):
+    if data.month == 12:
+        return inicio_do_mes(datetime(data.year + 1, 1, 1))
+    return inicio_do_mes(datetime(data.year, data.month + 1, 1))
+
+
+def nome_particao(inicio):
+    return f'{TABELA}_p{inicio:%Y_%m}'
+
+
+def inicio_particao(nome):
+    return inicio_do_mes(datetime.strptime(nome.removeprefix(f'{TABELA}_p'), '%Y_%m'))
+
+
+def particionada(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABELA])
+        linha = cursor.fetchone()
+    return linha is not None and linha[0] == 'p'
+
+
+def registro_uuid_existe(cursor):
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [REGISTRO_UUID])
+    return cursor.fetchone()[0]
+
+
+def cria_registro_uuid(cursor):
+    cursor.execute(f'CREATE TABLE {REGISTRO_UUID} (uuid uuid PRIMARY KEY)')
+    cursor.execute(f'INSERT INTO {REGISTRO_UUID} (uuid) SELECT uuid FROM {TABELA}')
+    cursor.execute(
+        f'CREATE FUNCTION {REGISTRO_UUID}_atualiza() RETURNS trigger LANGUAGE plpgsql AS $$ '
+        f'BEGIN '
+        f"IF TG_OP <> 'INSERT' THEN DELETE FROM {REGISTRO_UUID} WHERE uuid = OLD.uuid; END IF; "
+        f"IF TG_OP <> 'DELETE' THEN INSERT INTO {REGISTRO_UUID} (uuid) VALUES (NEW.uuid); END IF; "
+        f'RETURN NULL; '
+        f'END $$'
+    )
+    cursor.execute(
+        f'CREATE TRIGGER {REGISTRO_UUID} AFTER INSERT OR DELETE OR UPDATE OF uuid ON {TABELA} '
+        f'FOR EACH ROW EXECUTE FUNCTION {REGISTRO_UUID}_atualiza()'
+    )
+
+
+def remove_registro_uuid(cursor):
+    cursor.execute(f'DROP TRIGGER IF EXISTS {REGISTRO_UUID} ON {TABELA}')
+    cursor.execute(f'DROP FUNCTION IF EXISTS {REGISTRO_UUID}_atualiza()')
+    cursor.execute(f'DROP TABLE IF EXISTS {REGISTRO_UUID}')
+
+
+def particoes_existentes(cursor):
+    cursor.execute(
+        'SELECT c.relname FROM pg_inherits i '
+        'JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = %s::regclass',
+        [TABELA]
+    )
+    return {nome for nome, in cursor.fetchall()}
+
+
+def cria_particao(cursor, inicio):
+    nome = nome_particao(inicio)
+    if nome in particoes_existentes(cursor):
+        return False
+
+    fim = proximo_mes(inicio)
+    cursor.execute(
+        f'CREATE TABLE {nome} (LIKE {TABELA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+    )
+    cursor.execute(
+        f'WITH movidos AS ('
+        f'DELETE FROM {PARTICAO_PADRAO} WHERE criado_em >= %s AND criado_em < %s RETURNING *'
+        f') INSERT INTO {nome} SELECT * FROM movidos',
+        [inicio, fim]
+    )
+    cursor.execute(
+        f"ALTER TABLE {TABELA} ATTACH PARTITION {nome} "
+        f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+    )
+    if registro_uuid_existe(cursor):
+        cursor.execute(f'INSERT INTO {REGISTRO_UUID} (uuid) SELECT uuid FROM {nome}')
+    return True
+
+
+def desanexa_particao(cursor, nome):
+    cursor.execute(f'SELECT 1 FROM {nome} WHERE NOT consolidado LIMIT 1')
+    if cursor.fetchone() is not None:
+        raise ValueError(
+            f'A partição {nome} possui movimentos não compactados, execute '
+            f'compactar_movimentos antes de desanexá-la.'
+        )
+    cursor.execute(
+        f"SELECT estoque_id, SUM(CASE WHEN tipo = 'E' THEN quantidade ELSE -quantidade END) "
+        f'FROM {nome} GROUP BY estoque_id'
+    )
+    saldos = [(estoque, saldo) for estoque, saldo in cursor.fetchall() if saldo]
+
+    cursor.execute(f'ALTER TABLE {TABELA} DETACH PARTITION {nome}')
+    if registro_uuid_existe(cursor):
+        cursor.execute(f'DELETE FROM {REGISTRO_UUID} r USING {nome} p WHERE r.uuid = p.uuid')
+
+    fim = proximo_mes(inicio_particao(nome))
+    if not saldos:
+        return 0
+    cursor.executemany(
+        f'INSERT INTO {TABELA} (uuid, ativo, criado_em, atualizado_em, estoque_id, tipo, '
+        f'quantidade, consolidado) VALUES (%s, true, %s, %s, %s, %s, %s, true)',
+        [
+            (uuid.uuid4(), fim, timezone.now(), estoque, 'E' if saldo > 0 else 'S', abs(saldo))
+            for estoque, saldo in saldos
+        ]
+    )
+    return len(saldos)
+
+
+def _indices_e_chaves(cursor, tabela):
+    cursor.execute(
+        'SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s',
+        [tabela, f'{tabela}_pkey']
+    )
+    indices = [definicao for definicao, in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [tabela]
+    )
+    return indices, cursor.fetchall()
+
+
+def _recria_indices_e_chaves(cursor, indices, chaves):
+    for definicao in indices:
+        cursor.execute(definicao)
+    for nome, definicao in chaves:
+        cursor.execute(f'ALTER TABLE {TABELA} ADD CONSTRAINT {nome} {definicao}')
+
+
+def particiona(cursor, meses_futuros=3):
+    indices, chaves = _indices_e_chaves(cursor, TABELA)
+    cursor.execute(f'ALTER TABLE {TABELA} RENAME TO {TABELA}_antigo')
+    cursor.execute(f'ALTER INDEX {TABELA}_pkey RENAME TO {TABELA}_antigo_pkey')
+    cursor.execute(
+        f'CREATE TABLE {TABELA} (LIKE {TABELA}_antigo INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f'PARTITION BY RANGE (criado_em)'
+    )
+    cursor.execute(f'ALTER TABLE {TABELA} ADD CONSTRAINT {TABELA}_pkey PRIMARY KEY (uuid, criado_em)')
+    cursor.execute(f'CREATE TABLE {PARTICAO_PADRAO} PARTITION OF {TABELA} DEFAULT')
+
+    cursor.execute(f'SELECT MIN(criado_em) FROM {TABELA}_antigo')
+    primeiro, = cursor.fetchone()
+    inicio = inicio_do_mes(timezone.localtime(primeiro) if primeiro else timezone.localtime())
+    limite = timezone.localtime()
+    for _ in range(meses_futuros):
+        limite = proximo_mes(limite)
+    while inicio <= limite:
+        cria_particao(cursor, inicio)
+        inicio = proximo_mes(inicio)
+
+    cursor.execute(f'INSERT INTO {TABELA} SELECT * FROM {TABELA}_antigo')
+    cursor.execute(f'DROP TABLE {TABELA}_antigo')
+    _recria_indices_e_chaves(cursor, indices, chaves)
+
+
+def desfaz_particionamento(cursor):
+    indices, chaves = _indices_e_chaves(cursor, TABELA)
+    cursor.execute(f'ALTER TABLE {TABELA} RENAME TO {TABELA}_particionado')
+    cursor.execute(f'ALTER INDEX {TABELA}_pkey RENAME TO {TABELA}_particionado_pkey')
+    cursor.execute(
+        f'CREATE TABLE {TABELA} (LIKE {TABELA}_particionado INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+    )
+    cursor.execute(f'ALTER TABLE {TABELA} ADD CONSTRAINT {TABELA}_pkey PRIMARY KEY (uuid)')
+    cursor.execute(f'INSERT INTO {TABELA} SELECT * FROM {TABELA}_particionado')
+    cursor.execute(f'DROP TABLE {TABELA}_particionado CASCADE')
+    _recria_indices_e_chaves(cursor, indices, chaves)
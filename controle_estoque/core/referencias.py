@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from controle_estoque.core import metricas, models
+
+
+def consultas():
+    return {
+        'unidades_de_medida': models.UnidadeMedida.objects.order_by('nome'),
+        'marcas': models.Marca.objects.order_by('nome'),
+        'municipios': models.Municipio.objects.order_by('uf', 'nome'),
+    }
+
+
+def chave(nome):
+    return f'referencias:{nome}'
+
+
+def lista(nome):
+    itens = cache.get(chave(nome))
+    metricas.registra_cache('referencias', itens is not None)
+    if itens is None:
+        itens = list(consultas()[nome].values())
+        cache.set(chave(nome), itens, settings.REFERENCIAS_CACHE_SEGUNDOS)
+    return itens
+
+
+def invalida(nome):
+    transaction.on_commit(lambda: cache.delete(chave(nome)))
+
+
+def aquece():
+    for nome, consulta in consultas().items():
+        cache.set(chave(nome), list(consulta.values()), settings.REFERENCIAS_CACHE_SEGUNDOS)
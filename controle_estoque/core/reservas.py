@@ -0,0 +1,103 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+from ninja.errors import HttpError
+
+from controle_estoque.core.models import Estoque, Movimento, Reserva
+
+TAMANHO_LOTE = 1000
+
+
+def _incrementa(estoque_id, quantidade):
+    return Estoque.objects.filter(
+        pk=estoque_id, quantidade__gte=F('reservado') + quantidade
+    ).update(reservado=F('reservado') + quantidade)
+
+
+def _decrementa(quantidades):
+    Estoque.objects.filter(pk__in=quantidades).update(reservado=Case(
+        *(When(pk=e, then=F('reservado') - q) for e, q in sorted(quantidades.items())),
+        default=F('reservado'),
+    ))
+
+
+def _transiciona(reserva, situacao, **filtros):
+    agora = timezone.now()
+    alteradas = Reserva.objects.filter(pk=reserva.pk, situacao=Reserva.ATIVA, **filtros).update(
+        situacao=situacao, atualizado_em=agora
+    )
+    if not alteradas:
+        reserva.refresh_from_db(fields=['situacao', 'expira_em'])
+        if reserva.situacao == Reserva.ATIVA:
+            raise HttpError(400, 'A reserva está expirada.')
+        raise HttpError(400, f'A reserva já está {reserva.get_situacao_display().lower()}.')
+    reserva.situacao = situacao
+    reserva.atualizado_em = agora
+    _decrementa({reserva.estoque_id: reserva.quantidade})
+
+
+@transaction.atomic
+def cria_reserva(estoque, quantidade, minutos, responsavel=None):
+    if quantidade <= 0:
+        raise HttpError(400, 'A quantidade reservada deve ser maior que zero.')
+    if not _incrementa(estoque.pk, quantidade):
+        if not expira(estoque.pk) or not _incrementa(estoque.pk, quantidade):
+            raise HttpError(400, 'A quantidade reservada é superior à disponível.')
+    return Reserva.objects.create(
+        estoque=estoque,
+        responsavel=responsavel,
+        quantidade=quantidade,
+        expira_em=timezone.now() + timedelta(minutes=minutos),
+    )
+
+
+@transaction.atomic
+def confirma(reserva, responsavel=None):
+    _transiciona(reserva, Reserva.CONFIRMADA, expira_em__gt=timezone.now())
+    movimento = Movimento(
+        estoque_id=reserva.estoque_id,
+        tipo=Movimento.SAIDA,
+        quantidade=reserva.quantidade,
+        responsavel=responsavel or reserva.responsavel,
+    )
+    movimento.save()
+    Reserva.objects.filter(pk=reserva.pk).update(movimento=movimento)
+    reserva.movimento = movimento
+    return reserva
+
+
+@transaction.atomic
+def libera(reserva):
+    _transiciona(reserva, Reserva.LIBERADA)
+    return reserva
+
+
+def expira(estoque_id=None, lote=TAMANHO_LOTE):
+    total = 0
+    while True:
+        with transaction.atomic():
+            agora = timezone.now()
+            reservas = Reserva.objects.select_for_update(skip_locked=True).filter(
+                situacao=Reserva.ATIVA, expira_em__lte=agora
+            )
+            if estoque_id is not None:
+                reservas = reservas.filter(estoque=estoque_id)
+            linhas = list(reservas.values_list('uuid', 'estoque_id', 'quantidade')[:lote])
+            if not linhas:
+                return total
+
+            Reserva.objects.filter(pk__in=[uuid for uuid, _, _ in linhas]).update(
+                situacao=Reserva.EXPIRADA, atualizado_em=agora
+            )
+            quantidades = defaultdict(Decimal)
+            for _, estoque, quantidade in linhas:
+                quantidades[estoque] += quantidade
+            _decrementa(quantidades)
+
+        total += len(linhas)
+        if len(linhas) < lote:
+            return total
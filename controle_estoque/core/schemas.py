@@ -1,5 +1,7 @@
 import re
 import uuid
+from datetime import datetime
+from decimal import Decimal
 from typing import Any
 
 from ninja import ModelSchema, Schema
@@ -8,6 +10,8 @@ from pydantic import field_validator, model_validator
 
 from controle_estoque.core import models
 
+TAMANHO_MAXIMO_LOTE = 500
+
 
 class EmpresaSchema(ModelSchema):
     cnpj: str
@@ -31,7 +35,7 @@ class MunicipioSchema(ModelSchema):
     
     class Meta:
         model = models.Municipio
-        fields = ['id', 'nome', 'uf']
+        fields = ['id', 'codigo_ibge', 'nome', 'uf']
 
 
 class ArmazemSchema(ModelSchema):
@@ -142,7 +146,7 @@ class EstoqueSchema(ModelSchema):
 
     class Meta:
         model = models.Estoque
-        fields = ['uuid', 'quantidade', 'preco']
+        fields = ['uuid', 'quantidade', 'preco', 'classe']
 
 
 class EstoqueNovoSchema(ModelSchema):
@@ -166,6 +170,84 @@ class ListaSchema(Schema):
     lista: list
 
 
+class LoteSchema(Schema):
+    ids: list[uuid.UUID]
+
+    @field_validator('ids')
+    @classmethod
+    def valida_tamanho(cls, v: list) -> list:
+        if len(v) > TAMANHO_MAXIMO_LOTE:
+            raise ValueError(f'Informe no máximo {TAMANHO_MAXIMO_LOTE} identificadores.')
+        return v
+
+
+class ListaLoteSchema(ListaSchema):
+    nao_encontrados: list[uuid.UUID]
+
+
+class ClassificacaoNovaSchema(Schema):
+    empresa_id: uuid.UUID
+    dias: int = 90
+
+    @field_validator('dias')
+    @classmethod
+    def valida_dias(cls, v: int) -> int:
+        if not 1 <= v <= 365:
+            raise ValueError('O período deve ter entre 1 e 365 dias.')
+        return v
+
+
+class ItemClassificacaoSchema(Schema):
+    estoque_uuid: uuid.UUID
+    armazem_nome: str
+    produto_nome: str
+    valor_consumo: float
+    participacao: float
+    participacao_acumulada: float
+    classe: str
+
+
+class ClassificacaoSchema(ListaSchema):
+    alterados: int
+
+
+class ReservaNovaSchema(Schema):
+    quantidade: Decimal
+    minutos: int = 30
+
+    @field_validator('minutos')
+    @classmethod
+    def valida_minutos(cls, v: int) -> int:
+        if not 1 <= v <= 1440:
+            raise ValueError('A validade da reserva deve ter entre 1 e 1440 minutos.')
+        return v
+
+
+class ReservaSchema(Schema):
+    uuid: uuid.UUID
+    estoque_uuid: uuid.UUID
+    quantidade: Decimal
+    situacao: str
+    expira_em: datetime
+    movimento_uuid: uuid.UUID | None = None
+    disponivel: Decimal
+
+
+class CoberturaSchema(Schema):
+    estoque_uuid: uuid.UUID
+    armazem_uuid: uuid.UUID
+    armazem_nome: str
+    produto_uuid: uuid.UUID
+    produto_nome: str
+    produto_unidade_medida: str
+    quantidade: Decimal
+    taxa_media: float
+    taxa_recente: float
+    taxa_pico: float
+    tendencia: float
+    dias_cobertura: float | None
+
+
 class PerfilSchema(Schema):
     id: int
     usuario: str
@@ -201,3 +283,54 @@ class MovimentoNovoSchema(ModelSchema):
     class Meta:
         model = models.Movimento
         fields = ['quantidade', 'preco']
+
+
+class AlteracoesSchema(Schema):
+    alterados: list
+    removidos: list[uuid.UUID]
+
+
+class SincronizacaoSchema(Schema):
+    token: str
+    produtos: AlteracoesSchema
+    armazens: AlteracoesSchema
+    itens_estoque: AlteracoesSchema
+
+
+class ProdutoImportacaoSchema(Schema):
+    nome: str
+    unidade_medida: str
+    marca: str | None = None
+
+
+class ImportacaoSchema(Schema):
+    criados: int
+    ignorados: int
+    invalidos: list
+
+
+class DisponibilidadeArmazemSchema(Schema):
+    armazem_uuid: uuid.UUID
+    armazem_nome: str
+    estoque_uuid: uuid.UUID
+    quantidade: Decimal
+    reservado: Decimal
+    disponivel: Decimal
+
+
+class DisponibilidadeEmpresaSchema(Schema):
+    empresa_uuid: uuid.UUID
+    empresa_nome: str
+    quantidade: Decimal
+    reservado: Decimal
+    disponivel: Decimal
+    armazens: list[DisponibilidadeArmazemSchema]
+
+
+class DisponibilidadeSchema(Schema):
+    produto_uuid: uuid.UUID
+    produto_nome: str
+    quantidade: Decimal
+    reservado: Decimal
+    disponivel: Decimal
+    empresas: list[DisponibilidadeEmpresaSchema]
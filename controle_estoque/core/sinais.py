@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from controle_estoque.core import cobertura
+from controle_estoque.core.models import (
+    Armazem, Estoque, Exclusao, Movimento, Produto, movimento_registrado
+)
+
+
+@receiver(post_delete, sender=Armazem)
+def registra_exclusao_armazem(sender, instance, **kwargs):
+    Exclusao.objects.create(
+        modelo=Exclusao.ARMAZEM, objeto_uuid=instance.uuid, empresa_id=instance.empresa_id
+    )
+
+
+@receiver(post_delete, sender=Produto)
+def registra_exclusao_produto(sender, instance, **kwargs):
+    Exclusao.objects.create(modelo=Exclusao.PRODUTO, objeto_uuid=instance.uuid)
+
+
+@receiver(post_delete, sender=Estoque)
+def registra_exclusao_estoque(sender, instance, **kwargs):
+    Exclusao.objects.create(
+        modelo=Exclusao.ESTOQUE, objeto_uuid=instance.uuid, empresa_id=instance.armazem.empresa_id
+    )
+
+
+@receiver(movimento_registrado, sender=Movimento)
+def invalida_cobertura(sender, instance, empresa_id, **kwargs):
+    transaction.on_commit(lambda: cobertura.invalida(empresa_id))
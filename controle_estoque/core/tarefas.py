@@ -0,0 +1,135 @@
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from controle_estoque.core import models
+
+logger = logging.getLogger(__name__)
+
+REGISTRO = {}
+TEMPO_LIMITE = timedelta(minutes=10)
+
+
+def registra(funcao):
+    REGISTRO[funcao.__name__] = funcao
+    return funcao
+
+
+def enfileira(nome, chave='', atraso=0, **argumentos):
+    if settings.TAREFAS_SINCRONAS:
+        transaction.on_commit(lambda: executa_agora(nome, argumentos))
+        return
+    models.Tarefa.objects.bulk_create([
+        models.Tarefa(
+            nome=nome,
+            chave=chave,
+            argumentos=argumentos,
+            executar_em=timezone.now() + timedelta(seconds=atraso),
+        )
+    ], ignore_conflicts=True)
+
+
+def executa_agora(nome, argumentos):
+    with transaction.atomic():
+        REGISTRO[nome](**argumentos)
+
+
+def recupera_travadas():
+    limite = timezone.now() - TEMPO_LIMITE
+    for tarefa in models.Tarefa.objects.filter(
+        situacao=models.Tarefa.EXECUTANDO, iniciada_em__lt=limite
+    ):
+        devolve(tarefa, 'Tempo limite de execução excedido.')
+
+
+def reserva_lote(limite):
+    with transaction.atomic():
+        agora = timezone.now()
+        ids = list(
+            models.Tarefa.objects.select_for_update(skip_locked=True).filter(
+                situacao=models.Tarefa.PENDENTE, executar_em__lte=agora
+            ).order_by('executar_em').values_list('uuid', flat=True)[:limite]
+        )
+        models.Tarefa.objects.filter(uuid__in=ids).update(
+            situacao=models.Tarefa.EXECUTANDO, iniciada_em=agora, tentativas=F('tentativas') + 1
+        )
+    return list(models.Tarefa.objects.filter(uuid__in=ids).order_by('executar_em'))
+
+
+def devolve(tarefa, erro):
+    if tarefa.tentativas >= tarefa.max_tentativas:
+        models.Tarefa.objects.filter(pk=tarefa.pk).update(
+            situacao=models.Tarefa.FALHA, erro=erro, atualizado_em=timezone.now()
+        )
+        return
+    try:
+        with transaction.atomic():
+            models.Tarefa.objects.filter(pk=tarefa.pk).update(
+                situacao=models.Tarefa.PENDENTE,
+                erro=erro,
+                executar_em=timezone.now() + timedelta(seconds=2 ** tarefa.tentativas),
+                atualizado_em=timezone.now(),
+            )
+    except IntegrityError:
+        models.Tarefa.objects.filter(pk=tarefa.pk).delete()
+
+
+def executa(tarefa):
+    try:
+        with transaction.atomic():
+            REGISTRO[tarefa.nome](**tarefa.argumentos)
+    except Exception:
+        logger.exception('Falha na tarefa %s (%s).', tarefa.nome, tarefa.chave)
+        devolve(tarefa, traceback.format_exc())
+        return False
+    models.Tarefa.objects.filter(pk=tarefa.pk).delete()
+    return True
+
+
+def executa_em_thread(tarefa):
+    try:
+        return executa(tarefa)
+    finally:
+        connection.close()
+
+
+def processa(limite=100, threads=1):
+    recupera_travadas()
+    lote = reserva_lote(limite)
+    if threads <= 1:
+        return [executa(t) for t in lote]
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(executa_em_thread, lote))
+
+
+def drena(limite=100, threads=1):
+    sucessos = falhas = 0
+    while True:
+        resultados = processa(limite, threads)
+        if not resultados:
+            return sucessos, falhas
+        sucessos += sum(resultados)
+        falhas += len(resultados) - sum(resultados)
+
+
+@registra
+def recalcula_estoque(estoque_id):
+    estoque = models.Estoque.objects.select_for_update().filter(pk=estoque_id).first()
+    if estoque is None:
+        return
+    saldo = models.Movimento.objects.filter(estoque=estoque_id).saldos().get(estoque.pk, 0)
+    if saldo == estoque.quantidade:
+        return
+    logger.warning(
+        'Saldo divergente em %s: gravado %s, razão %s.', estoque_id, estoque.quantidade, saldo
+    )
+    models.Estoque.objects.filter(pk=estoque_id).update(
+        quantidade=saldo, atualizado_em=timezone.now()
+    )
+    models.EstoqueResumo.sincroniza(models.Estoque.objects.filter(pk=estoque_id), publica=True)
@@ -1,3 +1,1423 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import tempfile
+import uuid
+import warnings
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from ninja_jwt.tokens import RefreshToken
+from prometheus_client import REGISTRY
+
+from controle_estoque.core import (
+    classificacao, cobertura, consultas, eventos, exportacao, importacao, inicializacao, limites,
+    models, particoes, reservas, schemas, tarefas, verificacoes
+)
+
+ORCAMENTO_CONSULTAS = 15
+
+
+class AdminOrcamentoConsultasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superusuario = User.objects.create_superuser('admin', password='senha')
+        tipo = models.TipoPerfil.objects.create(nome='Administrador', sigla='ADM')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        municipio = models.Municipio.objects.create(nome='Santos', uf='SP')
+        for e in range(3):
+            empresa = models.Empresa.objects.create(nome=f'Empresa {e}', cnpj='12345678000199')
+            usuario = User.objects.create_user(f'usuario{e}')
+            models.Perfil.objects.create(usuario=usuario, empresa=empresa, tipo=tipo)
+            for a in range(3):
+                armazem = models.Armazem.objects.create(
+                    nome=f'Armazém {e}.{a}', empresa=empresa, municipio=municipio
+                )
+                for p in range(3):
+                    marca, _ = models.Marca.objects.get_or_create(nome=f'Marca {p}')
+                    produto, _ = models.Produto.objects.get_or_create(
+                        nome=f'Produto {p}', unidade_medida=unidade, marca=marca
+                    )
+                    estoque = models.Estoque.objects.create(
+                        armazem=armazem, produto=produto,
+                        quantidade=Decimal('10'), preco=Decimal('1.50')
+                    )
+                    for _ in range(3):
+                        models.Movimento(
+                            estoque=estoque, tipo=models.Movimento.SAIDA,
+                            quantidade=Decimal('1')
+                        ).save()
+
+    def setUp(self):
+        self.client.force_login(self.superusuario)
+
+    def assertOrcamento(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertLessEqual(len(consultas), ORCAMENTO_CONSULTAS, url)
+
+    def test_listas(self):
+        for modelo in admin.site._registry:
+            if modelo._meta.app_label != 'core':
+                continue
+            with self.subTest(modelo=modelo.__name__):
+                self.assertOrcamento(
+                    reverse(f'admin:core_{modelo._meta.model_name}_changelist')
+                )
+
+    def test_formularios_de_edicao(self):
+        for modelo in admin.site._registry:
+            if modelo._meta.app_label != 'core':
+                continue
+            with self.subTest(modelo=modelo.__name__):
+                objeto = modelo.objects.first()
+                self.assertOrcamento(
+                    reverse(f'admin:core_{modelo._meta.model_name}_change', args=[objeto.pk])
+                )
+
+
+    def test_movimentos_somente_leitura(self):
+        movimento = models.Movimento.objects.first()
+        total = models.Movimento.objects.count()
+        self.client.post(reverse('admin:core_movimento_changelist'), {
+            'action': 'delete_selected', '_selected_action': [movimento.pk], 'post': 'yes'
+        })
+        response = self.client.post(
+            reverse('admin:core_movimento_delete', args=[movimento.pk]), {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(models.Movimento.objects.count(), total)
+
+class EscopoEmpresaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tipo = models.TipoPerfil.objects.create(nome='Administrador', sigla='ADM')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        produto = models.Produto.objects.create(nome='Produto', unidade_medida=unidade)
+        cls.usuario = User.objects.create_user('usuario')
+        cls.empresas = []
+        for e in range(3):
+            empresa = models.Empresa.objects.create(nome=f'Empresa {e}', cnpj='12345678000199')
+            cls.empresas.append(empresa)
+            colega = User.objects.create_user(f'colega{e}')
+            models.Perfil.objects.create(usuario=colega, empresa=empresa, tipo=tipo)
+            if e < 2:
+                models.Perfil.objects.create(usuario=cls.usuario, empresa=empresa, tipo=tipo)
+            for a in range(2):
+                armazem = models.Armazem.objects.create(nome=f'Armazém {e}.{a}', empresa=empresa)
+                models.Estoque.objects.create(
+                    armazem=armazem, produto=produto, quantidade=Decimal('10'), preco=Decimal('1')
+                )
+
+    def setUp(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def consulta(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response.json(), [c['sql'].upper() for c in consultas]
+
+    def test_listas_filtram_por_exists_sem_distinct(self):
+        esperado = {'/api/armazens': 4, '/api/itens_estoque': 4, '/api/empresas': 2, '/api/perfis': 4}
+        for url, quantidade in esperado.items():
+            with self.subTest(url=url):
+                dados, consultas = self.consulta(url)
+                self.assertEqual(dados['quantidade'], quantidade)
+                self.assertTrue(any('EXISTS' in c for c in consultas))
+                self.assertFalse(any('DISTINCT' in c for c in consultas))
+
+    def test_sincronizacao_e_exportacao(self):
+        dados, consultas = self.consulta('/api/sync')
+        self.assertEqual(len(dados['armazens']['alterados']), 4)
+        self.assertEqual(len(dados['itens_estoque']['alterados']), 4)
+        self.assertFalse(any('DISTINCT' in c for c in consultas))
+
+        response = self.client.get('/api/exportar/estoque')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 5)
+
+    def test_superusuario_nao_filtra(self):
+        superusuario = User.objects.create_superuser('admin')
+        self.assertEqual(models.Armazem.objects.para_usuario(superusuario).count(), 6)
+        sql = str(models.Estoque.objects.para_usuario(superusuario).query).upper()
+        self.assertNotIn('EXISTS', sql)
+
+    def test_plano_usa_indice_de_perfil(self):
+        querysets = [
+            models.Empresa.objects.para_usuario(self.usuario),
+            models.Armazem.objects.para_usuario(self.usuario),
+            models.Estoque.objects.para_usuario(self.usuario),
+            models.EstoqueResumo.objects.para_usuario(self.usuario),
+            models.Perfil.objects.para_usuario(self.usuario),
+            models.Movimento.objects.para_usuario(self.usuario),
+        ]
+        for queryset in querysets:
+            with self.subTest(modelo=queryset.model.__name__):
+                plano = queryset.explain()
+                self.assertIn('perfil_usuario_empresa', plano)
+                self.assertNotIn('TEMP B-TREE FOR DISTINCT', plano.upper())
+
+
+class InicializacaoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        cls.usuario = User.objects.create_user('usuario')
+
+    def setUp(self):
+        cache.clear()
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def test_aquecimento_carrega_referencias_e_openapi(self):
+        inicializacao.aquece()
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get('/api/unidades_de_medida')
+        self.assertEqual(response.json()['quantidade'], 1)
+        self.assertFalse(any('core_unidademedida' in c['sql'] for c in consultas))
+        self.assertIs(inicializacao.api.get_openapi_schema(), inicializacao.api.get_openapi_schema())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Marca.objects.create(nome='Marca')
+        self.assertEqual(self.client.get('/api/marcas').json()['quantidade'], 1)
+
+    def test_cache_local_gera_aviso_de_implantacao(self):
+        self.assertEqual(verificacoes.cache_compartilhado(None), [])
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with self.settings(CACHES=local):
+            avisos = verificacoes.cache_compartilhado(None)
+        self.assertEqual([a.id for a in avisos], ['core.W001'])
+
+    def test_medicao_da_inicializacao_informa_tempos(self):
+        saida = StringIO()
+        limite = float(os.environ.get('INICIALIZACAO_LIMITE_SEGUNDOS', 'inf'))
+        call_command('medir_inicializacao', repeticoes=1, limite=limite, stdout=saida)
+        for etapa in ('django', 'api', 'openapi'):
+            self.assertIn(f'{etapa}: mediana', saida.getvalue())
+        self.assertIn('dentro do limite', saida.getvalue())
+
+
+class ExclusaoTests(TestCase):
+
+    def test_exclusao_em_lote_registra_exclusoes(self):
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        armazens = [
+            models.Armazem.objects.create(nome=f'Armazém {a}', empresa=empresa) for a in range(2)
+        ]
+        produtos = [
+            models.Produto.objects.create(nome=f'Produto {p}', unidade_medida=unidade)
+            for p in range(2)
+        ]
+        estoque = models.Estoque.objects.create(
+            armazem=armazens[0], produto=produtos[0], quantidade=Decimal('0'), preco=Decimal('1')
+        )
+        estoque.movimentos.all().delete()
+
+        models.Estoque.objects.all().delete()
+        models.Armazem.objects.all().delete()
+        models.Produto.objects.all().delete()
+
+        exclusoes = models.Exclusao.objects.values_list('modelo', 'objeto_uuid', 'empresa_id')
+        self.assertCountEqual(exclusoes, [
+            (models.Exclusao.ESTOQUE, estoque.uuid, empresa.uuid),
+            *((models.Exclusao.ARMAZEM, a.uuid, empresa.uuid) for a in armazens),
+            *((models.Exclusao.PRODUTO, p.uuid, None) for p in produtos),
+        ])
+
+
+class CompactacaoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        armazem = models.Armazem.objects.create(nome='Armazém', empresa=empresa)
+        produto = models.Produto.objects.create(nome='Produto', unidade_medida=unidade)
+        cls.estoque = models.Estoque.objects.create(
+            armazem=armazem, produto=produto, quantidade=Decimal('100'), preco=Decimal('1')
+        )
+        datas = {
+            '2025-01-05': [('S', '10'), ('S', '5'), ('E', '20')],
+            '2025-02-10': [('S', '7'), ('S', '3')],
+            '2025-03-15': [('S', '1')],
+        }
+        models.Movimento.objects.filter(estoque=cls.estoque).update(
+            criado_em=timezone.make_aware(datetime(2024, 12, 31))
+        )
+        for data, movimentos in datas.items():
+            for tipo, quantidade in movimentos:
+                movimento = models.Movimento(
+                    estoque=cls.estoque, tipo=tipo, quantidade=Decimal(quantidade)
+                )
+                movimento.save()
+                models.Movimento.objects.filter(pk=movimento.pk).update(
+                    criado_em=timezone.make_aware(datetime.fromisoformat(data))
+                )
+        cls.usuario = User.objects.create_superuser('admin')
+
+    def test_consolida_saldo_de_abertura_e_exporta_arquivados(self):
+        call_command('compactar_movimentos', antes='2025-03-01', stdout=StringIO())
+
+        abertura = models.Movimento.objects.get(consolidado=True)
+        self.assertEqual(
+            (abertura.criado_em.date().isoformat(), abertura.tipo, abertura.quantidade),
+            ('2025-02-10', 'E', Decimal('95'))
+        )
+        self.assertEqual(models.Movimento.objects.filter(consolidado=False).count(), 1)
+        self.assertEqual(models.MovimentoArquivado.objects.count(), 6)
+        self.estoque.refresh_from_db()
+        self.assertEqual(self.estoque.quantidade, Decimal('94'))
+
+        call_command('compactar_movimentos', antes='2025-04-01', stdout=StringIO())
+        abertura = models.Movimento.objects.get(consolidado=True)
+        self.assertEqual(
+            (abertura.criado_em.date().isoformat(), abertura.tipo, abertura.quantidade),
+            ('2025-03-15', 'E', Decimal('94'))
+        )
+        self.assertEqual(models.Movimento.objects.filter(consolidado=False).count(), 0)
+
+        token = RefreshToken.for_user(self.usuario).access_token
+        response = self.client.get(
+            '/api/exportar/movimentos', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        linhas = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(linhas), 7)
+        saldo = sum(
+            Decimal(l['quantidade']) * (1 if l['tipo'] == 'E' else -1) for l in linhas
+        )
+        self.assertEqual(saldo, self.estoque.quantidade)
+
+
+class ParticoesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        armazem = models.Armazem.objects.create(nome='Armazém', empresa=empresa)
+        produto = models.Produto.objects.create(nome='Produto', unidade_medida=unidade)
+        cls.estoque = models.Estoque.objects.create(
+            armazem=armazem, produto=produto, quantidade=Decimal('50'), preco=Decimal('1')
+        )
+        movimento = models.Movimento(
+            estoque=cls.estoque, tipo=models.Movimento.SAIDA, quantidade=Decimal('20')
+        )
+        movimento.save()
+        models.Movimento.objects.update(criado_em=timezone.make_aware(datetime(2025, 1, 10)))
+
+    @skipIf(connection.vendor == 'postgresql', 'Verifica o comportamento sem particionamento.')
+    def test_sem_particionamento_nao_altera_tabela(self):
+        self.assertFalse(particoes.particionada(connection))
+        with self.assertRaisesMessage(CommandError, 'apenas no PostgreSQL'):
+            call_command('criar_particoes', desanexar_antes='2025-02', stdout=StringIO())
+        self.assertEqual(models.Movimento.objects.count(), 2)
+
+    def test_recusa_desanexar_particao_nao_compactada(self):
+        nome = particoes.nome_particao(particoes.inicio_do_mes(datetime(2025, 1, 1)))
+        with connection.cursor() as cursor:
+            if particoes.particionada(connection):
+                particoes.cria_particao(cursor, particoes.inicio_do_mes(datetime(2025, 1, 1)))
+            else:
+                cursor.execute(f'CREATE TABLE {nome} AS SELECT * FROM {particoes.TABELA}')
+            with self.assertRaisesMessage(ValueError, 'não compactados'):
+                particoes.desanexa_particao(cursor, nome)
+        self.assertEqual(models.Movimento.objects.count(), 2)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Particionamento disponível apenas no PostgreSQL.')
+    def test_desanexa_particao_compactada_preservando_saldo(self):
+        with connection.cursor() as cursor:
+            particoes.cria_particao(cursor, particoes.inicio_do_mes(datetime(2025, 1, 1)))
+        call_command('compactar_movimentos', antes='2025-02-01', stdout=StringIO())
+        call_command('criar_particoes', desanexar_antes='2025-02', stdout=StringIO())
+
+        self.assertEqual(models.Movimento.objects.saldos(), {self.estoque.pk: Decimal('30')})
+        transportado = models.Movimento.objects.get()
+        self.assertTrue(transportado.consolidado)
+        self.assertEqual(
+            transportado.criado_em, particoes.inicio_do_mes(datetime(2025, 2, 1))
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT uuid FROM {particoes.REGISTRO_UUID}')
+            self.assertEqual([u for u, in cursor.fetchall()], [transportado.pk])
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                cursor.execute(
+                    f'INSERT INTO {particoes.TABELA} SELECT * FROM {particoes.TABELA}'
+                )
+
+
+class ResumoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        armazem = models.Armazem.objects.create(nome='Armazém', empresa=empresa)
+        produto = models.Produto.objects.create(nome='Produto', unidade_medida=unidade)
+        cls.estoque = models.Estoque.objects.create(
+            armazem=armazem, produto=produto, quantidade=Decimal('10'), preco=Decimal('1')
+        )
+
+    def test_edicao_de_movimento_atualiza_resumo_uma_vez(self):
+        movimento = models.Movimento.objects.get(estoque=self.estoque)
+        movimento.quantidade = Decimal('12')
+        movimento.preco = Decimal('2')
+        with CaptureQueriesContext(connection) as consultas:
+            movimento.save()
+        sql = [c['sql'].upper() for c in consultas]
+        self.assertEqual(len([c for c in sql if 'UPDATE "CORE_ESTOQUE"' in c]), 1)
+        self.assertEqual(len([c for c in sql if 'CORE_ESTOQUERESUMO' in c]), 1)
+        self.assertFalse(any('CORE_ESTOQUERESUMO' in c and 'JOIN' in c for c in sql))
+
+        resumo = models.EstoqueResumo.objects.get(estoque=self.estoque)
+        self.assertEqual((resumo.quantidade, resumo.preco), (Decimal('12'), Decimal('2')))
+
+    def test_movimento_invalida_cobertura_apos_commit(self):
+        empresa_id = self.estoque.armazem.empresa_id
+        cache.set(cobertura.chave_versao(empresa_id), 1, None)
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Movimento(
+                estoque=self.estoque, tipo=models.Movimento.SAIDA, quantidade=Decimal('1')
+            ).save()
+        self.assertEqual(cache.get(cobertura.chave_versao(empresa_id)), 2)
+
+
+class MovimentoNovoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tipo = models.TipoPerfil.objects.create(nome='Administrador', sigla='ADM')
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        armazem = models.Armazem.objects.create(nome='Armazém', empresa=empresa)
+        produto = models.Produto.objects.create(nome='Produto', unidade_medida=unidade)
+        cls.usuario = User.objects.create_user('usuario')
+        models.Perfil.objects.create(usuario=cls.usuario, empresa=empresa, tipo=tipo)
+        cls.estoque = models.Estoque.objects.create(
+            armazem=armazem, produto=produto, quantidade=Decimal('10'), preco=Decimal('1')
+        )
+
+    def setUp(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def saida(self, quantidade):
+        return self.client.post(
+            f'/api/{self.estoque.pk}/movimento/novo',
+            {'tipo': models.Movimento.SAIDA, 'quantidade': quantidade},
+            content_type='application/json',
+        )
+
+    def test_saida_expira_reservas_vencidas_antes_de_validar(self):
+        reserva = reservas.cria_reserva(self.estoque, Decimal('8'), 10)
+        self.assertEqual(self.saida('5').status_code, 400)
+
+        models.Reserva.objects.filter(pk=reserva.pk).update(
+            expira_em=timezone.now() - timedelta(minutes=1)
+        )
+        response = self.saida('5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(str(response.json()['quantidade'])), Decimal('5'))
+        reserva.refresh_from_db()
+        self.assertEqual(reserva.situacao, models.Reserva.EXPIRADA)
+        self.estoque.refresh_from_db()
+        self.assertEqual((self.estoque.quantidade, self.estoque.reservado), (Decimal('5'), Decimal('0')))
+
+
+class TarefasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        armazem = models.Armazem.objects.create(nome='Armazém', empresa=empresa)
+        produto = models.Produto.objects.create(nome='Produto', unidade_medida=unidade)
+        cls.estoque = models.Estoque.objects.create(
+            armazem=armazem, produto=produto, quantidade=Decimal('10'), preco=Decimal('1')
+        )
+        models.Tarefa.objects.all().delete()
+        tipo = models.TipoPerfil.objects.create(nome='Administrador', sigla='ADM')
+        cls.usuario = User.objects.create_user('usuario')
+        models.Perfil.objects.create(usuario=cls.usuario, empresa=empresa, tipo=tipo)
+
+    def saida(self, quantidade):
+        models.Movimento(
+            estoque=self.estoque, tipo=models.Movimento.SAIDA, quantidade=Decimal(quantidade)
+        ).save()
+
+    def test_saida_atualiza_resumo_sem_aguardar_tarefa(self):
+        self.saida('3')
+        self.assertEqual(
+            models.EstoqueResumo.objects.get(estoque=self.estoque).quantidade, Decimal('7')
+        )
+
+    def test_enfileira_uma_tarefa_pendente_por_item(self):
+        self.saida('1')
+        self.saida('2')
+        tarefa = models.Tarefa.objects.get()
+        self.assertEqual(
+            (tarefa.nome, tarefa.chave, tarefa.situacao, tarefa.argumentos),
+            ('recalcula_estoque', f'estoque:{self.estoque.pk}', models.Tarefa.PENDENTE,
+             {'estoque_id': str(self.estoque.pk)})
+        )
+
+    def test_drena_corrige_saldo_divergente(self):
+        self.saida('4')
+        models.Estoque.objects.filter(pk=self.estoque.pk).update(quantidade=Decimal('99'))
+        models.EstoqueResumo.objects.filter(estoque=self.estoque).update(quantidade=Decimal('99'))
+
+        with self.assertLogs(tarefas.logger, 'WARNING'):
+            self.assertEqual(tarefas.drena(), (1, 0))
+        self.assertFalse(models.Tarefa.objects.exists())
+        self.estoque.refresh_from_db()
+        self.assertEqual(self.estoque.quantidade, Decimal('6'))
+        self.assertEqual(
+            models.EstoqueResumo.objects.get(estoque=self.estoque).quantidade, Decimal('6')
+        )
+
+    def test_correcao_do_saldo_altera_etag_e_publica_evento(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        url = f'/api/estoque/{self.estoque.pk}'
+        self.saida('4')
+        models.Estoque.objects.filter(pk=self.estoque.pk).update(quantidade=Decimal('99'))
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        broker = mock.Mock()
+        with mock.patch.object(eventos, 'get_broker', return_value=broker):
+            with self.captureOnCommitCallbacks(execute=True), self.assertLogs(tarefas.logger):
+                tarefas.drena()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(str(response.json()['quantidade'])), Decimal('6'))
+        self.assertEqual(
+            [c.args[0]['quantidade'] for c in broker.publica.call_args_list], ['6.000']
+        )
+
+    def test_saldo_correto_nao_altera_o_item(self):
+        self.saida('4')
+        self.estoque.refresh_from_db()
+        atualizado_em = self.estoque.atualizado_em
+        self.assertEqual(tarefas.drena(), (1, 0))
+        self.estoque.refresh_from_db()
+        self.assertEqual(self.estoque.atualizado_em, atualizado_em)
+
+    def test_falha_reagenda_ate_o_limite_de_tentativas(self):
+        def falha():
+            raise RuntimeError('erro')
+
+        tarefas.REGISTRO['falha'] = falha
+        self.addCleanup(tarefas.REGISTRO.pop, 'falha')
+        tarefas.enfileira('falha', chave='falha')
+        models.Tarefa.objects.update(max_tentativas=2)
+
+        with self.assertLogs(tarefas.logger, 'ERROR'):
+            self.assertEqual(tarefas.processa(), [False])
+        tarefa = models.Tarefa.objects.get()
+        self.assertEqual((tarefa.situacao, tarefa.tentativas), (models.Tarefa.PENDENTE, 1))
+        self.assertIn('RuntimeError', tarefa.erro)
+        self.assertGreater(tarefa.executar_em, timezone.now())
+        self.assertEqual(tarefas.processa(), [])
+
+        models.Tarefa.objects.update(executar_em=timezone.now())
+        with self.assertLogs(tarefas.logger, 'ERROR'):
+            self.assertEqual(tarefas.processa(), [False])
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.situacao, tarefa.tentativas), (models.Tarefa.FALHA, 2))
+
+
+class TarefasSincronasTests(TransactionTestCase):
+
+    @override_settings(TAREFAS_SINCRONAS=True)
+    def test_execucao_sincrona_apos_commit_usa_transacao(self):
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        armazem = models.Armazem.objects.create(nome='Armazém', empresa=empresa)
+        produto = models.Produto.objects.create(nome='Produto', unidade_medida=unidade)
+        estoque = models.Estoque.objects.create(
+            armazem=armazem, produto=produto, quantidade=Decimal('10'), preco=Decimal('1')
+        )
+        models.Movimento(
+            estoque=estoque, tipo=models.Movimento.SAIDA, quantidade=Decimal('4')
+        ).save()
+
+        self.assertFalse(models.Tarefa.objects.exists())
+        self.assertEqual(
+            models.EstoqueResumo.objects.get(estoque=estoque).quantidade, Decimal('6')
+        )
+
+
+@override_settings(
+    LIMITES_REQUISICOES={'leitura': {'usuario': '2/min', 'empresa': '100/min'}},
+    LIMITES_TOKEN_ISENCAO='isento',
+)
+class LimitesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('usuario')
+        tipo = models.TipoPerfil.objects.create(nome='Administrador', sigla='ADM')
+        for e in range(2):
+            empresa = models.Empresa.objects.create(nome=f'Empresa {e}', cnpj='12345678000199')
+            models.Perfil.objects.create(usuario=cls.usuario, empresa=empresa, tipo=tipo)
+
+    def setUp(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def test_excedente_recebe_429_com_retry_after(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/armazens').status_code, 200)
+        response = self.client.get('/api/armazens')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 30)
+
+    def test_balde_repoe_fichas_com_o_tempo_e_rejeicao_nao_consome_empresa(self):
+        agora = 1_000_000.0
+        with mock.patch.object(limites, 'relogio', lambda: agora):
+            for _ in range(2):
+                self.assertEqual(self.client.get('/api/armazens').status_code, 200)
+            response = self.client.get('/api/armazens')
+            self.assertEqual((response.status_code, response['Retry-After']), (429, '30'))
+        self.assertEqual(
+            set(models.BaldeLimite.objects.filter(chave__contains='empresa').values_list(
+                'fichas', flat=True
+            )),
+            {98.0}
+        )
+
+        agora += 30
+        with mock.patch.object(limites, 'relogio', lambda: agora):
+            self.assertEqual(self.client.get('/api/armazens').status_code, 200)
+            self.assertEqual(self.client.get('/api/armazens').status_code, 429)
+
+    def test_verificacao_usa_uma_consulta_por_requisicao(self):
+        self.client.get('/api/armazens')
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get('/api/armazens').status_code, 200)
+        sql = [c['sql'] for c in consultas]
+        self.assertEqual(len([c for c in sql if models.BaldeLimite._meta.db_table in c]), 1)
+        self.assertFalse(any('core_cache' in c for c in sql))
+
+    def test_token_de_isencao_ignora_limites(self):
+        for _ in range(3):
+            response = self.client.get('/api/armazens', HTTP_X_LIMITE_ISENCAO='isento')
+            self.assertEqual(response.status_code, 200)
+        for _ in range(2):
+            response = self.client.get('/api/armazens', HTTP_X_LIMITE_ISENCAO='outro')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/armazens').status_code, 429)
+
+
+class ExportacaoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tipo = models.TipoPerfil.objects.create(nome='Administrador', sigla='ADM')
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        armazem = models.Armazem.objects.create(nome='Armazém', empresa=empresa)
+        cls.usuario = User.objects.create_user('usuario')
+        models.Perfil.objects.create(usuario=cls.usuario, empresa=empresa, tipo=tipo)
+        for p in range(5):
+            produto = models.Produto.objects.create(nome=f'Produto {p}', unidade_medida=unidade)
+            models.Estoque.objects.create(
+                armazem=armazem, produto=produto, quantidade=Decimal('10'), preco=Decimal('1')
+            )
+        cls.outra = models.Empresa.objects.create(nome='Outra', cnpj='12345678000199')
+        models.Estoque.objects.create(
+            armazem=models.Armazem.objects.create(nome='Outro', empresa=cls.outra),
+            produto=produto, quantidade=Decimal('10'), preco=Decimal('1')
+        )
+        models.Movimento.objects.update(criado_em=timezone.make_aware(datetime(2025, 1, 10)))
+        models.Movimento.objects.filter(estoque__produto__nome='Produto 0').update(
+            criado_em=timezone.make_aware(datetime(2025, 2, 10))
+        )
+
+    def setUp(self):
+        self.token = str(RefreshToken.for_user(self.usuario).access_token)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {self.token}'
+
+    def linhas(self, conteudo):
+        return list(csv.DictReader(StringIO(conteudo.decode())))
+
+    @mock.patch.object(exportacao, 'TAMANHO_LOTE', 2)
+    def test_exportacao_transmite_em_blocos_apenas_empresas_do_usuario(self):
+        response = self.client.get('/api/exportar/estoque')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="estoque.csv"')
+        blocos = list(response.streaming_content)
+        self.assertEqual([bloco.count(b'\n') for bloco in blocos], [1, 2, 2, 1])
+
+        linhas = self.linhas(b''.join(blocos))
+        self.assertEqual(list(linhas[0]), exportacao.CABECALHO_ESTOQUE)
+        self.assertEqual({l['empresa'] for l in linhas}, {'Empresa'})
+        self.assertEqual(len(linhas), 5)
+
+    def test_exportacao_compactada_e_filtros(self):
+        response = self.client.get(
+            '/api/exportar/movimentos?compactar=true&data_inicial=2025-02-01&data_final=2025-02-28'
+        )
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        linhas = self.linhas(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual([l['produto'] for l in linhas], ['Produto 0'])
+
+        response = self.client.get(f'/api/exportar/estoque?empresa_id={self.outra.pk}')
+        self.assertEqual(response.status_code, 401)
+
+    def test_comando_grava_arquivo_compactado(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'estoque.csv.gz')
+            call_command('exportar_estoque', saida=caminho, gzip=True)
+            with gzip.open(caminho) as arquivo:
+                linhas = self.linhas(arquivo.read())
+        self.assertEqual(len(linhas), 6)
+        self.assertEqual(sum(Decimal(l['quantidade']) for l in linhas), Decimal('60'))
+
+    @mock.patch.object(exportacao, 'TAMANHO_LOTE', 2)
+    async def test_exportacao_transmite_em_blocos_sob_asgi(self):
+        with warnings.catch_warnings(record=True) as avisos:
+            warnings.simplefilter('always')
+            response = await self.async_client.get(
+                '/api/exportar/estoque', headers={'Authorization': f'Bearer {self.token}'}
+            )
+            self.assertTrue(response.is_async)
+            blocos = [bloco async for bloco in response.streaming_content]
+        self.assertFalse([a for a in avisos if 'StreamingHttpResponse' in str(a.message)])
+        self.assertEqual([bloco.count(b'\n') for bloco in blocos], [1, 2, 2, 1])
+
+
+class EventosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tipo = models.TipoPerfil.objects.create(nome='Administrador', sigla='ADM')
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        armazem = models.Armazem.objects.create(nome='Armazém', empresa=empresa)
+        produto = models.Produto.objects.create(nome='Produto', unidade_medida=unidade)
+        cls.usuario = User.objects.create_user('usuario')
+        models.Perfil.objects.create(usuario=cls.usuario, empresa=empresa, tipo=tipo)
+        cls.estoque = models.Estoque.objects.create(
+            armazem=armazem, produto=produto, quantidade=Decimal('10'), preco=Decimal('1')
+        )
+
+    def setUp(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        broker = mock.Mock()
+        patcher = mock.patch.object(eventos, 'get_broker', return_value=broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.publicados = lambda: [c.args[0] for c in broker.publica.call_args_list]
+
+    def test_edicao_pela_api_publica_evento(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/estoque/{self.estoque.pk}', {'preco': '2.50'},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(e['estoque_uuid'], e['preco']) for e in self.publicados()],
+            [(str(self.estoque.pk), '2.50')]
+        )
+
+    def test_movimento_publica_um_evento_com_o_saldo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Movimento(
+                estoque=self.estoque, tipo=models.Movimento.SAIDA, quantidade=Decimal('4')
+            ).save()
+        self.assertEqual([e['quantidade'] for e in self.publicados()], ['6.000'])
+
+    def test_backend_local_gera_aviso_de_implantacao(self):
+        local = 'controle_estoque.core.eventos.BackendLocal'
+        with self.settings(ESTOQUE_EVENTOS_BACKEND=local):
+            avisos = verificacoes.eventos_compartilhados(None)
+        self.assertEqual([a.id for a in avisos], ['core.W002'])
+
+
+class ReconciliacaoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        produto = models.Produto.objects.create(nome='Produto', unidade_medida=unidade)
+        cls.estoques = []
+        for a in range(2):
+            armazem = models.Armazem.objects.create(nome=f'Armazém {a}', empresa=empresa)
+            estoque = models.Estoque.objects.create(
+                armazem=armazem, produto=produto, quantidade=Decimal('10'), preco=Decimal('1')
+            )
+            models.Movimento(
+                estoque=estoque, tipo=models.Movimento.SAIDA, quantidade=Decimal('4')
+            ).save()
+            cls.estoques.append(estoque)
+        models.Estoque.objects.filter(pk=cls.estoques[0].pk).update(quantidade=Decimal('99'))
+
+    def reconcilia(self, **opcoes):
+        saida = StringIO()
+        call_command('reconciliar_estoque', processos=1, stdout=saida, **opcoes)
+        return saida.getvalue()
+
+    def test_relata_divergencias_sem_corrigir(self):
+        saida = self.reconcilia()
+        self.assertRegex(
+            saida, rf'Armazém 0 / {self.estoques[0].pk}: gravado=99(\.0+)? razão=6(\.0+)? '
+            rf'diferença=93(\.0+)?'
+        )
+        self.assertNotIn(str(self.estoques[1].pk), saida)
+        self.assertIn('1 itens divergentes em 2 armazéns', saida)
+        self.assertEqual(
+            models.Estoque.objects.get(pk=self.estoques[0].pk).quantidade, Decimal('99')
+        )
+
+    def test_corrige_saldo_atualizado_em_resumo_e_evento(self):
+        antes = models.Estoque.objects.get(pk=self.estoques[0].pk).atualizado_em
+        broker = mock.Mock()
+        with mock.patch.object(eventos, 'get_broker', return_value=broker):
+            with self.captureOnCommitCallbacks(execute=True):
+                saida = self.reconcilia(corrigir=True)
+        self.assertIn('1 itens corrigidos', saida)
+
+        estoque = models.Estoque.objects.get(pk=self.estoques[0].pk)
+        self.assertEqual(estoque.quantidade, Decimal('6'))
+        self.assertGreater(estoque.atualizado_em, antes)
+        resumo = models.EstoqueResumo.objects.get(estoque=estoque)
+        self.assertEqual((resumo.quantidade, resumo.atualizado_em), (Decimal('6'), estoque.atualizado_em))
+        self.assertEqual(
+            [c.args[0]['estoque_uuid'] for c in broker.publica.call_args_list], [str(estoque.pk)]
+        )
+        self.assertIn('nenhuma divergência', self.reconcilia())
+
+
+class DisponibilidadeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tipo = models.TipoPerfil.objects.create(nome='Administrador', sigla='ADM')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        cls.usuario = User.objects.create_user('usuario')
+        cls.produtos = [
+            models.Produto.objects.create(nome=f'Produto {p}', unidade_medida=unidade)
+            for p in 'AB'
+        ]
+        cls.empresas = []
+        for e, armazens in enumerate([2, 1, 1]):
+            empresa = models.Empresa.objects.create(nome=f'Empresa {e}', cnpj='12345678000199')
+            cls.empresas.append(empresa)
+            if e < 2:
+                models.Perfil.objects.create(usuario=cls.usuario, empresa=empresa, tipo=tipo)
+            for a in range(armazens):
+                armazem = models.Armazem.objects.create(nome=f'Armazém {e}.{a}', empresa=empresa)
+                models.Estoque.objects.create(
+                    armazem=armazem, produto=cls.produtos[0],
+                    quantidade=Decimal(10 * (a + 1)), preco=Decimal('1')
+                )
+        cls.reserva = reservas.cria_reserva(
+            models.Estoque.objects.filter(armazem__nome='Armazém 0.1').get(), Decimal('5'), 10
+        )
+
+    def setUp(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def test_totais_por_produto_e_empresa_agrupados_no_banco(self):
+        ids = ','.join(str(p.pk) for p in self.produtos)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(f'/api/produtos/disponibilidade?produto_id={ids}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len([c for c in consultas if 'SUM(' in c['sql'].upper() and 'GROUP BY' in c['sql'].upper()]),
+            2
+        )
+
+        dados = response.json()
+        self.assertEqual(dados['quantidade'], 1)
+        produto = dados['lista'][0]
+        totais = lambda d: tuple(Decimal(str(d[c])) for c in ('quantidade', 'reservado', 'disponivel'))
+        self.assertEqual(totais(produto), (Decimal('40'), Decimal('5'), Decimal('35')))
+        self.assertEqual(
+            [(e['empresa_nome'], totais(e), [a['armazem_nome'] for a in e['armazens']])
+             for e in produto['empresas']],
+            [('Empresa 0', (Decimal('30'), Decimal('5'), Decimal('25')), ['Armazém 0.0', 'Armazém 0.1']),
+             ('Empresa 1', (Decimal('10'), Decimal('0'), Decimal('10')), ['Armazém 1.0'])]
+        )
+
+    def test_filtro_por_empresa(self):
+        response = self.client.get(
+            f'/api/produtos/disponibilidade?produto_id={self.produtos[0].pk}'
+            f'&empresa_id={self.empresas[1].pk}'
+        )
+        produto = response.json()['lista'][0]
+        self.assertEqual([e['empresa_nome'] for e in produto['empresas']], ['Empresa 1'])
+        self.assertEqual(Decimal(str(produto['disponivel'])), Decimal('10'))
+
+
+class TesteCargaTests(LiveServerTestCase):
+
+    def executa(self, **opcoes):
+        saida = StringIO()
+        call_command(
+            'teste_carga', url=f'{self.live_server_url}/api', threads=1, duracao=0.5,
+            armazens=1, produtos=2, semente=1, stdout=saida, **opcoes
+        )
+        return saida.getvalue()
+
+    def test_remove_dados_de_teste_ao_final(self):
+        saida = self.executa()
+        self.assertIn('Dados de teste removidos.', saida)
+        self.assertFalse(User.objects.filter(username__startswith='carga_').exists())
+        self.assertFalse(models.Empresa.objects.filter(nome__startswith='Carga').exists())
+        self.assertFalse(models.Produto.objects.filter(nome__startswith='Carga').exists())
+        self.assertFalse(models.Estoque.objects.exists())
+        self.assertFalse(models.Movimento.objects.exists())
+
+    def test_manter_dados(self):
+        saida = self.executa(manter_dados=True)
+        self.assertIn('Dados de teste mantidos', saida)
+        self.assertEqual(models.Estoque.objects.count(), 2)
+        self.assertTrue(User.objects.filter(username__startswith='carga_').exists())
+
+
+class ClassificacaoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        armazem = models.Armazem.objects.create(nome='Armazém', empresa=cls.empresa)
+        cls.estoques = []
+        for nome, saida in [('A', '80'), ('B', '15'), ('C', '5')]:
+            produto = models.Produto.objects.create(nome=f'Produto {nome}', unidade_medida=unidade)
+            estoque = models.Estoque.objects.create(
+                armazem=armazem, produto=produto, quantidade=Decimal('100'), preco=Decimal('1')
+            )
+            cls.saida(estoque, saida)
+            cls.estoques.append(estoque)
+
+    @staticmethod
+    def saida(estoque, quantidade):
+        movimento = models.Movimento(
+            estoque=estoque, tipo=models.Movimento.SAIDA, quantidade=Decimal(quantidade)
+        )
+        movimento.save()
+        return movimento
+
+    def classifica(self, **opcoes):
+        with mock.patch.object(
+            classificacao, 'valores_consumo', wraps=classificacao.valores_consumo
+        ) as consumo:
+            itens, _ = classificacao.classifica(self.empresa.uuid, 90, **opcoes)
+        return {i['produto_nome'][-1]: i['classe'] for i in itens}, consumo.call_args.args[2:]
+
+    def test_recalcula_apenas_itens_alterados(self):
+        classes, estoques = self.classifica()
+        self.assertEqual(classes, {'A': 'A', 'B': 'B', 'C': 'C'})
+        self.assertEqual(estoques, ())
+        self.assertFalse(classificacao.precisa_classificar(self.empresa.uuid, 90))
+
+        self.saida(self.estoques[2], '90')
+        self.assertTrue(classificacao.precisa_classificar(self.empresa.uuid, 90))
+        classes, estoques = self.classifica()
+        self.assertEqual(classes, {'A': 'A', 'B': 'B', 'C': 'A'})
+        self.assertEqual(estoques, ({self.estoques[2].uuid},))
+        self.assertEqual(self.classifica(incremental=False)[0], classes)
+
+    def test_movimento_fora_da_janela_reclassifica_item(self):
+        self.classifica()
+        anterior = timezone.now() - timedelta(days=10)
+        models.ClassificacaoABC.objects.update(calculada_em=anterior)
+        models.Estoque.objects.update(atualizado_em=anterior - timedelta(days=1))
+        models.Movimento.objects.update(criado_em=anterior - timedelta(days=1))
+        models.Movimento.objects.filter(estoque=self.estoques[0], tipo=models.Movimento.SAIDA).update(
+            criado_em=timezone.now() - timedelta(days=95)
+        )
+
+        self.assertTrue(classificacao.precisa_classificar(self.empresa.uuid, 90))
+        classes, estoques = self.classifica()
+        self.assertEqual(estoques, ({self.estoques[0].uuid},))
+        self.assertEqual(classes, {'A': 'C', 'B': 'A', 'C': 'A'})
+
+
+class CondicionalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        cls.marca = models.Marca.objects.create(nome='Marca')
+        produto = models.Produto.objects.create(
+            nome='Produto', unidade_medida=unidade, marca=cls.marca
+        )
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        armazem = models.Armazem.objects.create(nome='Armazém', empresa=empresa)
+        cls.estoque = models.Estoque.objects.create(
+            armazem=armazem, produto=produto, quantidade=Decimal('10'), preco=Decimal('1')
+        )
+        cls.urls = {
+            'marca': f'/api/marca/{cls.marca.pk}',
+            'produto': f'/api/produto/{produto.pk}',
+            'armazem': f'/api/armazem/{armazem.pk}',
+            'estoque': f'/api/estoque/{cls.estoque.pk}',
+        }
+
+    def setUp(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def test_responde_304_com_etag_ou_data(self):
+        for nome, url in self.urls.items():
+            with self.subTest(nome):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+                nao_modificado = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(nao_modificado.status_code, 304)
+                self.assertEqual(nao_modificado['ETag'], etag)
+                self.assertEqual(nao_modificado.content, b'')
+                self.assertEqual(
+                    self.client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                    ).status_code,
+                    304
+                )
+
+    def test_alteracao_da_marca_revalida_marca_e_produto(self):
+        etags = {n: self.client.get(self.urls[n])['ETag'] for n in ('marca', 'produto')}
+        response = self.client.patch(
+            self.urls['marca'], {'nome': 'Marca nova'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        for nome, etag in etags.items():
+            with self.subTest(nome):
+                response = self.client.get(self.urls[nome], HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_estoque_304_nao_consulta_movimentos_e_novo_movimento_revalida(self):
+        url = self.urls['estoque']
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(
+            [c['sql'] for c in consultas if c['sql'].startswith('SELECT')
+             and 'FROM "core_movimento"' in c['sql']],
+            []
+        )
+
+        response = self.client.post(
+            f'/api/{self.estoque.pk}/movimento/novo',
+            {'tipo': 'S', 'quantidade': '1'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['movimentos']), 2)
+
+
+class ImportacaoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin')
+        cls.unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        cls.marca = models.Marca.objects.create(nome='Marca')
+        models.Produto.objects.create(nome='Produto 1', unidade_medida=cls.unidade, marca=cls.marca)
+
+    def test_importa_com_dedupe_e_resumo(self):
+        linhas = [
+            {'nome': 'Produto 1', 'unidade_medida': 'UN', 'marca': 'Marca'},
+            {'nome': 'Produto 2', 'unidade_medida': 'unidade', 'marca': ' marca '},
+            {'nome': 'Produto 2', 'unidade_medida': 'un', 'marca': 'MARCA'},
+            {'nome': 'Produto 3', 'unidade_medida': 'kg', 'marca': 'Nova'},
+            {'nome': '', 'unidade_medida': 'UN'},
+            {'nome': 'Produto 4', 'unidade_medida': 'Caixa grande'},
+        ]
+        token = RefreshToken.for_user(self.usuario).access_token
+        response = self.client.post(
+            '/api/produtos/importar', linhas, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        self.assertEqual(response.status_code, 200)
+        resultado = response.json()
+        self.assertEqual((resultado['criados'], resultado['ignorados']), (2, 2))
+        self.assertEqual([i['linha'] for i in resultado['invalidos']], [5, 6])
+
+        produto = models.Produto.objects.get(nome='Produto 2')
+        self.assertEqual((produto.unidade_medida, produto.marca), (self.unidade, self.marca))
+        produto = models.Produto.objects.select_related('unidade_medida', 'marca').get(nome='Produto 3')
+        self.assertEqual((produto.unidade_medida.sigla, produto.marca.nome), ('KG', 'Nova'))
+
+    def test_consultas_nao_dependem_do_numero_de_linhas(self):
+        def consultas(quantidade, prefixo):
+            linhas = [
+                {'nome': f'{prefixo} {i}', 'unidade_medida': 'UN', 'marca': 'Marca'}
+                for i in range(quantidade)
+            ]
+            with CaptureQueriesContext(connection) as capturadas:
+                resultado = importacao.importa_produtos(linhas)
+            self.assertEqual(resultado['criados'], quantidade)
+            return len(capturadas)
+
+        self.assertEqual(consultas(5, 'Poucos'), consultas(100, 'Muitos'))
+
+    def test_comando_importa_arquivo(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'produtos.csv')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write('nome;unidade_medida;marca\nProduto 1;UN;Marca\nProduto 5;UN;\n;UN;\n')
+            saida, erros = StringIO(), StringIO()
+            call_command('importar_produtos', caminho, delimitador=';', stdout=saida, stderr=erros)
+        self.assertIn('1 produtos criados, 1 já existentes, 1 linhas inválidas.', saida.getvalue())
+        self.assertIn('Linha 3:', erros.getvalue())
+        self.assertIsNone(models.Produto.objects.get(nome='Produto 5').marca)
+
+
+class MunicipiosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('usuario')
+        cls.santos = models.Municipio.objects.create(nome='SANTOS', uf='SP')
+
+    def carrega(self, **opcoes):
+        saida = StringIO()
+        call_command('carregar_municipios', stdout=saida, **opcoes)
+        return saida.getvalue()
+
+    def test_carrega_arquivo_padrao_de_forma_idempotente(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        self.assertEqual(self.client.get('/api/municipios').json()['quantidade'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIn('5571 municípios carregados', self.carrega())
+        self.assertEqual(models.Municipio.objects.count(), 5571)
+        self.santos.refresh_from_db()
+        self.assertEqual((self.santos.codigo_ibge, self.santos.nome), (3548500, 'Santos'))
+        self.assertEqual(self.client.get('/api/municipios').json()['quantidade'], 5571)
+
+        self.carrega()
+        self.assertEqual(models.Municipio.objects.count(), 5571)
+        self.assertFalse(models.Municipio.objects.filter(codigo_ibge__isnull=True).exists())
+
+    def test_atualiza_pelo_codigo_e_rejeita_arquivo_invalido(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'municipios.csv')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write('codigo_ibge,nome,uf\n3548500,Santos,SP\n3509502,Campinas,SP\n')
+            self.carrega(arquivo=caminho)
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write('codigo_ibge,nome,uf\n3509502,Campinas (SP),SP\n')
+            self.carrega(arquivo=caminho)
+            self.assertEqual(
+                list(models.Municipio.objects.order_by('codigo_ibge').values_list('nome', flat=True)),
+                ['Campinas (SP)', 'Santos']
+            )
+
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write('codigo_ibge,nome,uf\n3550308,São Paulo,SP\n1,Inválido,XX\n')
+            with self.assertRaisesMessage(CommandError, 'Linha 3 inválida'):
+                self.carrega(arquivo=caminho)
+        self.assertEqual(models.Municipio.objects.count(), 2)
+
+
+class DesempenhoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superusuario = User.objects.create_superuser('admin')
+        cls.usuario = User.objects.create_user('usuario')
+
+    def get(self, usuario, **cabecalhos):
+        token = RefreshToken.for_user(usuario).access_token
+        return self.client.get(
+            '/api/armazens', headers={'Authorization': f'Bearer {token}', **cabecalhos}
+        )
+
+    def test_server_timing_nas_respostas_da_api(self):
+        response = self.get(self.usuario)
+        entradas = dict(e.split(';', 1) for e in response['Server-Timing'].split(', '))
+        self.assertEqual(set(entradas), {'auth', 'db', 'serializacao', 'total'})
+        self.assertRegex(entradas['db'], r'^dur=[\d.]+;desc="\d+ consultas"$')
+        self.assertFalse(self.client.get('/admin/login/').has_header('Server-Timing'))
+
+    def test_perfil_apenas_para_superusuario(self):
+        with tempfile.TemporaryDirectory() as diretorio, override_settings(PERFIL_DIRETORIO=diretorio):
+            response = self.get(self.usuario, **{'X-Perfil': '1'})
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('X-Perfil-Relatorio'))
+            self.assertEqual(os.listdir(diretorio), [])
+
+            response = self.get(self.superusuario, **{'X-Perfil': '1'})
+            self.assertEqual(response.status_code, 200)
+            nome = response['X-Perfil-Relatorio']
+            self.assertEqual(sorted(os.listdir(diretorio)), [f'{nome}.prof', f'{nome}.txt'])
+            with open(os.path.join(diretorio, f'{nome}.txt')) as relatorio:
+                self.assertTrue(relatorio.read().startswith('GET /api/armazens'))
+
+
+class MetricasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin')
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        armazem = models.Armazem.objects.create(nome='Armazém', empresa=empresa)
+        produto = models.Produto.objects.create(nome='Produto', unidade_medida=unidade)
+        cls.estoque = models.Estoque.objects.create(
+            armazem=armazem, produto=produto, quantidade=Decimal('10'), preco=Decimal('1')
+        )
+
+    def setUp(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def amostra(self, nome, **rotulos):
+        return REGISTRY.get_sample_value(nome, rotulos) or 0
+
+    def movimenta(self, tipo, quantidade):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                f'/api/{self.estoque.pk}/movimento/novo',
+                {'tipo': tipo, 'quantidade': quantidade, 'preco': '2.00'},
+                content_type='application/json'
+            )
+
+    def test_contadores_de_negocio_e_latencia_por_rota(self):
+        entradas = self.amostra('estoque_movimentos_total', tipo='E')
+        rejeitadas = self.amostra('estoque_saidas_rejeitadas_total')
+        rota = {'rota': 'api/<estoque_id>/movimento/novo', 'metodo': 'POST', 'status': '200'}
+        requisicoes = self.amostra('estoque_requisicao_duracao_segundos_count', **rota)
+
+        self.assertEqual(self.movimenta('E', '5').status_code, 200)
+        self.assertEqual(self.movimenta('S', '50').status_code, 400)
+
+        self.assertEqual(self.amostra('estoque_movimentos_total', tipo='E'), entradas + 1)
+        self.assertEqual(self.amostra('estoque_saidas_rejeitadas_total'), rejeitadas + 1)
+        self.assertEqual(
+            self.amostra('estoque_requisicao_duracao_segundos_count', **rota), requisicoes + 1
+        )
+
+    def test_endpoint_exige_token(self):
+        self.assertEqual(self.client.get('/api/metricas').status_code, 403)
+        with override_settings(METRICAS_TOKEN='segredo'):
+            self.assertEqual(self.client.get('/api/metricas').status_code, 403)
+            response = self.client.get('/api/metricas', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'estoque_movimentos_total', response.content)
+
+
+class ConsultasLentasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin')
+
+    def test_impressao_digital_ignora_literais(self):
+        sql = consultas.normaliza(
+            "SELECT *  FROM t WHERE a = 'x''y' AND b IN (1, 2, 3) AND c = %s AND d = 4.5"
+        )
+        self.assertEqual(sql, 'SELECT * FROM t WHERE a = ? AND b IN (...) AND c = ? AND d = ?')
+        outra = consultas.normaliza("SELECT * FROM t WHERE a = 'z' AND b IN (7) AND c = %s AND d = 1")
+        self.assertEqual(consultas.impressao_digital(sql), consultas.impressao_digital(outra))
+
+    @mock.patch.dict(consultas._piores, clear=True)
+    def test_registra_consultas_lentas_com_plano(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'lentas.jsonl')
+            with override_settings(
+                CONSULTAS_LENTAS_LIMITE_MS=1e-9, CONSULTAS_LENTAS_ARQUIVO=caminho,
+                CONSULTAS_LENTAS_EXPLAIN=True
+            ), self.assertLogs('controle_estoque.core.consultas', 'WARNING'):
+                response = self.client.get(
+                    '/api/armazens', HTTP_AUTHORIZATION=f'Bearer {token}'
+                )
+            self.assertEqual(response.status_code, 200)
+            with open(caminho) as arquivo:
+                registros = [json.loads(linha) for linha in arquivo]
+
+        self.assertTrue(registros)
+        self.assertEqual({r['rota'] for r in registros}, {'api/armazens'})
+        selecao = next(r for r in registros if 'FROM "core_armazem"' in r['sql'])
+        self.assertRegex(selecao['impressao_digital'], r'^[0-9a-f]{12}$')
+        self.assertTrue(selecao['plano'])
+
+    def test_comando_agrupa_por_impressao_digital_e_rota(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'lentas.jsonl')
+            with open(caminho, 'w') as arquivo:
+                for digital, rota, duracao in [
+                    ('aaa', 'api/armazens', 10), ('aaa', 'api/armazens', 30),
+                    ('bbb', 'api/produtos', 25), ('aaa', 'api/produtos', 1),
+                ]:
+                    arquivo.write(json.dumps({
+                        'impressao_digital': digital, 'rota': rota,
+                        'duracao_ms': duracao, 'sql': f'SELECT {digital}',
+                    }) + '\n')
+            saida = StringIO()
+            call_command('consultas_lentas', arquivo=caminho, top=2, stdout=saida)
+        linhas = [l for l in saida.getvalue().splitlines() if not l.startswith(' ')]
+        self.assertEqual(len(linhas), 2)
+        self.assertIn('aaa  api/armazens  n=2  total=40.0ms  p95=30.0ms', linhas[0])
+        self.assertIn('bbb  api/produtos  n=1', linhas[1])
+
+        with self.assertRaisesMessage(CommandError, 'não encontrado'):
+            call_command('consultas_lentas', arquivo=caminho, stdout=StringIO())
+
+
+class LoteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tipo = models.TipoPerfil.objects.create(nome='Administrador', sigla='ADM')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        cls.usuario = User.objects.create_user('usuario')
+        cls.produtos = [
+            models.Produto.objects.create(nome=f'Produto {p}', unidade_medida=unidade)
+            for p in range(3)
+        ]
+        cls.armazens, cls.estoques = [], []
+        for e in range(2):
+            empresa = models.Empresa.objects.create(nome=f'Empresa {e}', cnpj='12345678000199')
+            if e == 0:
+                models.Perfil.objects.create(usuario=cls.usuario, empresa=empresa, tipo=tipo)
+            armazem = models.Armazem.objects.create(nome=f'Armazém {e}', empresa=empresa)
+            cls.armazens.append(armazem)
+            for produto in cls.produtos:
+                cls.estoques.append(models.Estoque.objects.create(
+                    armazem=armazem, produto=produto, quantidade=Decimal('1'), preco=Decimal('1')
+                ))
+        cls.inexistente = uuid.uuid4()
+
+    def setUp(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def lote(self, caminho, ids):
+        response = self.client.post(
+            f'/api/{caminho}/lote', {'ids': [str(i) for i in ids]}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        return [i['uuid'] for i in dados['lista']], dados['nao_encontrados']
+
+    def test_mantem_ordem_e_lista_ausentes_e_de_outras_empresas(self):
+        proprio, outro = self.estoques[2], self.estoques[3]
+        ids = [proprio.pk, outro.pk, self.inexistente, self.estoques[0].pk, proprio.pk]
+        self.assertEqual(
+            self.lote('itens_estoque', ids),
+            ([str(proprio.pk), str(self.estoques[0].pk)],
+             [str(outro.pk), str(self.inexistente)])
+        )
+        self.assertEqual(
+            self.lote('armazens', [self.armazens[1].pk, self.armazens[0].pk]),
+            ([str(self.armazens[0].pk)], [str(self.armazens[1].pk)])
+        )
+        self.assertEqual(
+            self.lote('produtos', [self.produtos[2].pk, self.inexistente, self.produtos[0].pk]),
+            ([str(self.produtos[2].pk), str(self.produtos[0].pk)], [str(self.inexistente)])
+        )
+
+    def test_consultas_nao_dependem_do_numero_de_ids(self):
+        def consultas(estoques):
+            with CaptureQueriesContext(connection) as capturadas:
+                self.lote('itens_estoque', [e.pk for e in estoques])
+            return len(capturadas)
+
+        self.assertEqual(consultas(self.estoques[:1]), consultas(self.estoques))
+
+    def test_limita_tamanho_do_lote(self):
+        ids = [str(uuid.uuid4()) for _ in range(schemas.TAMANHO_MAXIMO_LOTE + 1)]
+        response = self.client.post(
+            '/api/produtos/lote', {'ids': ids}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 422)
+
+
+class CamposTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin')
+        unidade = models.UnidadeMedida.objects.create(nome='Unidade', sigla='UN')
+        cls.produto = models.Produto.objects.create(nome='Produto', unidade_medida=unidade)
+        empresa = models.Empresa.objects.create(nome='Empresa', cnpj='12345678000199')
+        municipio = models.Municipio.objects.create(nome='Santos', uf='SP')
+        cls.armazem = models.Armazem.objects.create(
+            nome='Armazém', empresa=empresa, municipio=municipio
+        )
+        cls.estoque = models.Estoque.objects.create(
+            armazem=cls.armazem, produto=cls.produto, quantidade=Decimal('10'), preco=Decimal('1')
+        )
+
+    def setUp(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, ' '.join(c['sql'] for c in consultas)
+
+    def test_lista_retorna_e_seleciona_apenas_os_campos_pedidos(self):
+        response, sql = self.get('/api/itens_estoque?fields=uuid,produto_nome,quantidade')
+        self.assertEqual(
+            response.json()['lista'],
+            [{'uuid': str(self.estoque.pk), 'produto_nome': 'Produto', 'quantidade': '10.000'}]
+        )
+        self.assertNotIn('"preco"', sql)
+        self.assertNotIn('"armazem_nome"', sql)
+
+    def test_detalhes_com_campos(self):
+        response, sql = self.get(f'/api/produto/{self.produto.pk}?fields=nome,marca')
+        self.assertEqual(response.json(), {'nome': 'Produto', 'marca': ''})
+        self.assertNotIn('"core_unidademedida"."sigla"', sql)
+
+        response, _ = self.get(f'/api/armazem/{self.armazem.pk}?fields=municipio')
+        self.assertEqual(response.json(), {'municipio': 'Santos/SP'})
+
+        response, sql = self.get(f'/api/estoque/{self.estoque.pk}?fields=quantidade')
+        self.assertEqual(response.json(), {'quantidade': '10.000'})
+        self.assertNotIn('FROM "core_movimento"', sql)
+        response, _ = self.get(f'/api/estoque/{self.estoque.pk}?fields=movimentos')
+        self.assertEqual([m['tipo'] for m in response.json()['movimentos']], ['E'])
+
+    def test_etag_depende_dos_campos_e_campo_invalido(self):
+        url = f'/api/estoque/{self.estoque.pk}'
+        etag = self.client.get(f'{url}?fields=quantidade')['ETag']
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+        self.assertEqual(
+            self.client.get(f'{url}?fields=quantidade', HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        response = self.client.get('/api/itens_estoque?fields=uuid,senha')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Campos inválidos: senha.', response.json()['detail'])
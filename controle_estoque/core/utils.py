@@ -1,5 +1,10 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from ninja.errors import AuthenticationError
 
+from controle_estoque.core import metricas
 from controle_estoque.core.models import Perfil
 
 
@@ -13,3 +18,35 @@ def valida_permissao_empresa(usuario, empresa):
     ).exists()
     if not perfis_usuario:
         raise AuthenticationError()
+
+
+def empresas_permitidas(usuario, empresas):
+    if usuario.is_superuser:
+        return set(empresas)
+
+    return set(
+        Perfil.objects.filter(
+            usuario=usuario,
+            empresa__in=empresas
+        ).values_list('empresa', flat=True)
+    )
+
+
+def resposta_condicional(request, response, identificador, *datas):
+    ultima_alteracao = max(d for d in datas if d is not None)
+    versao = f'{identificador}:{ultima_alteracao.isoformat()}'
+    etag = quote_etag(hashlib.md5(versao.encode()).hexdigest())
+    last_modified = int(ultima_alteracao.timestamp())
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+
+    nao_modificado = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    metricas.registra_cache('validacao_condicional', nao_modificado is not None)
+    if nao_modificado is not None:
+        for cabecalho in ('ETag', 'Last-Modified', 'Cache-Control'):
+            nao_modificado[cabecalho] = response[cabecalho]
+    return nao_modificado
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+CACHES_LOCAIS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def cache_compartilhado(app_configs, **kwargs):
+    if settings.CACHES['default']['BACKEND'] not in CACHES_LOCAIS:
+        return []
+    return [
+        Warning(
+            'O cache padrão é local a cada processo.',
+            hint=(
+                'Invalidações de referências e da cobertura não são compartilhadas entre os '
+                'workers. Use DatabaseCache, RedisCache ou PyMemcacheCache.'
+            ),
+            id='core.W001',
+        )
+    ]
+
+
+@register(deploy=True)
+def eventos_compartilhados(app_configs, **kwargs):
+    if settings.ESTOQUE_EVENTOS_BACKEND != 'controle_estoque.core.eventos.BackendLocal':
+        return []
+    return [
+        Warning(
+            'Os eventos de estoque são entregues apenas dentro de cada processo.',
+            hint=(
+                'Com mais de um worker, assinantes de /api/eventos/estoque não recebem alterações '
+                'feitas em outros workers. Use BackendPostgres.'
+            ),
+            id='core.W002',
+        )
+    ]
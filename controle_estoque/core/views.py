@@ -1,3 +1,76 @@
-from django.shortcuts import render
+import asyncio
+import json
+import uuid
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from ninja.errors import AuthenticationError
+from ninja_jwt.authentication import JWTAuth
+from ninja_jwt.exceptions import AuthenticationFailed, InvalidToken
+
+from controle_estoque.core.eventos import get_broker
+from controle_estoque.core.models import Perfil
+from controle_estoque.core.utils import valida_permissao_empresa
+
+INTERVALO_PING = 15
+
+
+def autentica(request):
+    cabecalho = request.headers.get('Authorization', '')
+    token = cabecalho[7:] if cabecalho.startswith('Bearer ') else request.GET.get('token')
+    if not token:
+        raise AuthenticationError()
+    try:
+        return JWTAuth().authenticate(request, token)
+    except (InvalidToken, AuthenticationFailed):
+        raise AuthenticationError()
+
+
+def empresas_assinatura(usuario, empresa_id):
+    if empresa_id is not None:
+        valida_permissao_empresa(usuario, empresa_id)
+        return {empresa_id}
+    if usuario.is_superuser:
+        return None
+    return {
+        str(e) for e in Perfil.objects.filter(usuario=usuario).values_list('empresa_id', flat=True)
+    }
+
+
+async def eventos_estoque(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Disponível apenas na aplicação ASGI.'}, status=501)
+
+    try:
+        empresa_id = str(uuid.UUID(request.GET['empresa_id'])) if 'empresa_id' in request.GET else None
+        armazem_id = str(uuid.UUID(request.GET['armazem_id'])) if 'armazem_id' in request.GET else None
+    except ValueError:
+        return JsonResponse({'detail': 'Identificador inválido.'}, status=400)
+
+    try:
+        usuario = await sync_to_async(autentica)(request)
+        empresas = await sync_to_async(empresas_assinatura)(usuario, empresa_id)
+    except AuthenticationError:
+        return JsonResponse({'detail': 'Unauthorized'}, status=401)
+
+    broker = get_broker()
+    assinatura = broker.assina(empresas, armazem_id)
+
+    async def transmite():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    evento = await asyncio.wait_for(assinatura.fila.get(), INTERVALO_PING)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                yield f'event: estoque\ndata: {json.dumps(evento)}\n\n'
+        finally:
+            broker.cancela(assinatura)
+
+    response = StreamingHttpResponse(transmite(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
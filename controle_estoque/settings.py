@@ -34,6 +34,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'controle_estoque.core.desempenho.ServerTimingMiddleware',
+    'controle_estoque.core.consultas.ConsultasLentasMiddleware',
 ]
 
 ROOT_URLCONF = 'controle_estoque.urls'
@@ -119,3 +121,48 @@ NINJA_JWT = {
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': config('CACHE_LOCATION', default='core_cache'),
+    }
+}
+
+LIMITES_REQUISICOES = {
+    'leitura': {
+        'usuario': config('LIMITE_LEITURA_USUARIO', default='600/min'),
+        'empresa': config('LIMITE_LEITURA_EMPRESA', default='3000/min'),
+    },
+    'escrita': {
+        'usuario': config('LIMITE_ESCRITA_USUARIO', default='120/min'),
+        'empresa': config('LIMITE_ESCRITA_EMPRESA', default='600/min'),
+    },
+}
+
+LIMITES_TOKEN_ISENCAO = config('LIMITES_TOKEN_ISENCAO', default='')
+
+ESTOQUE_EVENTOS_BACKEND = config(
+    'ESTOQUE_EVENTOS_BACKEND',
+    default='controle_estoque.core.eventos.BackendPostgres'
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+    else 'controle_estoque.core.eventos.BackendLocal'
+)
+
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+
+PERFIL_DIRETORIO = config('PERFIL_DIRETORIO', default=os.path.join(BASE_DIR, 'perfis'))
+
+CONSULTAS_LENTAS_LIMITE_MS = config('CONSULTAS_LENTAS_LIMITE_MS', default=0, cast=float)
+CONSULTAS_LENTAS_ARQUIVO = config(
+    'CONSULTAS_LENTAS_ARQUIVO', default=os.path.join(BASE_DIR, 'consultas_lentas.jsonl')
+)
+CONSULTAS_LENTAS_EXPLAIN = config('CONSULTAS_LENTAS_EXPLAIN', default=False, cast=bool)
+
+COBERTURA_CACHE_SEGUNDOS = config('COBERTURA_CACHE_SEGUNDOS', default=300, cast=int)
+
+REFERENCIAS_CACHE_SEGUNDOS = config('REFERENCIAS_CACHE_SEGUNDOS', default=300, cast=int)
+
+TAREFAS_SINCRONAS = config('TAREFAS_SINCRONAS', default=False, cast=bool)
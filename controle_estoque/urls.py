@@ -1,9 +1,11 @@
 from django.contrib import admin
 from django.urls import path
 
+from controle_estoque.core import views
 from controle_estoque.core.api import api
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/eventos/estoque', views.eventos_estoque),
     path('api/', api.urls),
 ]
@@ -0,0 +1,38 @@
+import multiprocessing
+import os
+
+import decouple
+
+wsgi_app = 'controle_estoque.asgi:application'
+worker_class = 'uvicorn.workers.UvicornWorker'
+bind = decouple.config('GUNICORN_BIND', default='0.0.0.0:8000')
+workers = decouple.config('GUNICORN_WORKERS', default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+max_requests = decouple.config('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = decouple.config('GUNICORN_MAX_REQUESTS_JITTER', default=100, cast=int)
+preload_app = True
+accesslog = '-'
+
+
+def when_ready(server):
+    from django.db import connections
+
+    from controle_estoque.core import inicializacao
+
+    try:
+        tempos = inicializacao.aquece()
+    except Exception:
+        server.log.exception('Falha ao aquecer a aplicação.')
+        return
+    finally:
+        connections.close_all()
+    server.log.info(
+        'Aplicação aquecida: %s.', ', '.join(f'{nome} {t * 1000:.0f}ms' for nome, t in tempos.items())
+    )
+
+
+def child_exit(server, worker):
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)